@@ -1,40 +1,136 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User, Server, ServerMember, Unit, Resource, AssignmentGroup, GroupMember
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import F
+from django.utils import timezone
+from django.utils.functional import cached_property
+from .models import User, Server, ServerMember, Unit, Resource, AssignmentGroup, GroupMember, Job
 
 # Register your models here.
 
+# Membership, resource and group tables run to millions of rows, so every admin here:
+# - joins the rows its list_display shows (list_select_related), instead of a query per row
+# - picks users, servers, units and groups with autocomplete widgets, not <select>s of every row
+# - searches only columns with a trigram index on Postgres (migration 0010), so icontains is indexed
+# - never runs an exact COUNT(*) over a whole table (EstimatedCountPaginator)
+
+# Counted exactly up to this many rows. Past it, an unfiltered list shows the planner's
+# estimate (Postgres) and a filtered or searched one shows this number.
+EXACT_COUNT_LIMIT = 100_000
+
+
+class EstimatedCountPaginator(Paginator):
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if not queryset.query.has_filters() and connection.vendor == 'postgresql':
+            # Kept current by autovacuum; -1 when the table was never analyzed
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                               [queryset.model._meta.db_table])
+                estimate = cursor.fetchone()[0]
+            if estimate > EXACT_COUNT_LIMIT:
+                return estimate
+        # SELECT COUNT(*) FROM (... LIMIT n): stops reading after n rows
+        return queryset[:EXACT_COUNT_LIMIT].count()
+
+
+class LargeTableAdminMixin:
+    paginator = EstimatedCountPaginator
+    # Or the changelist counts the whole table again for "N results (M total)"
+    show_full_result_count = False
+
+
 # 1. Register the Custom User Model
-admin.site.register(User, UserAdmin)
+@admin.register(User)
+class TaskTideUserAdmin(LargeTableAdminMixin, UserAdmin):
+    list_display = ('username', 'registration_number', 'email', 'role', 'is_staff')
+    list_filter = ('role', 'is_staff', 'is_superuser', 'is_active')
+    # Also what the autocomplete widgets of the other admins search
+    search_fields = ('username', 'registration_number', 'email')
 
 # 2. Register the Server Model
 # FIX: Use 'admin.ModelAdmin', NOT 'admin.site.ModelAdmin'
 @admin.register(Server)
-class ServerAdmin(admin.ModelAdmin):
+class ServerAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('name', 'join_code', 'created_by', 'created_at')
+    list_select_related = ('created_by',)
     readonly_fields = ('join_code', 'id')
+    search_fields = ('name', '=join_code')
+    autocomplete_fields = ('created_by',)
+    ordering = ('name',)
 
 # 3. Register the ServerMember Model
 # FIX: Use 'admin.ModelAdmin', NOT 'admin.site.ModelAdmin'
 @admin.register(ServerMember)
-class ServerMemberAdmin(admin.ModelAdmin):
+class ServerMemberAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('user', 'server', 'joined_at')
+    list_select_related = ('user', 'server')
+    # User columns only: an OR across two tables cannot use either table's index.
+    # One server's members: ?server__id__exact=<id>
+    search_fields = ('user__username', 'user__registration_number')
+    autocomplete_fields = ('user', 'server')
     
 @admin.register(Unit)
-class UnitAdmin(admin.ModelAdmin):
+class UnitAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('code', 'name', 'server', 'created_by')
+    list_select_related = ('server', 'created_by')
+    search_fields = ('code', 'name')
+    autocomplete_fields = ('server', 'created_by')
+    ordering = ('code',)
 
 @admin.register(Resource)
-class ResourceAdmin(admin.ModelAdmin):
+class ResourceAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('title', 'unit', 'resource_type', 'uploaded_by')
+    list_select_related = ('unit', 'uploaded_by')
+    list_filter = ('resource_type',)
+    search_fields = ('title',)
+    autocomplete_fields = ('unit', 'uploaded_by')
     
 # --- Assignment Group Admin ---
 @admin.register(AssignmentGroup)
-class AssignmentGroupAdmin(admin.ModelAdmin):
+class AssignmentGroupAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     # Shows the group name, which unit it belongs to, and the max limit
-    list_display = ('name', 'unit', 'max_members', 'created_by')
+    list_display = ('name', 'unit', 'member_count', 'max_members', 'created_by')
+    list_select_related = ('unit', 'created_by')
+    search_fields = ('name',)
+    autocomplete_fields = ('unit', 'created_by')
+    ordering = ('name',)
 
 # --- Group Member Admin (See who joined) ---
 @admin.register(GroupMember)
-class GroupMemberAdmin(admin.ModelAdmin):
-    list_display = ('user', 'group', 'joined_at')
\ No newline at end of file
+class GroupMemberAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ('user', 'group', 'joined_at')
+    # A group's name includes its unit's code
+    list_select_related = ('user', 'group__unit')
+    search_fields = ('user__username', 'user__registration_number')
+    autocomplete_fields = ('user', 'group')
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Members added/moved by hand still take a seat (JoinGroupView does this for API joins)
+        if change and 'group' in form.changed_data:
+            AssignmentGroup.objects.filter(pk=form.initial['group'], member_count__gt=0).update(
+                member_count=F('member_count') - 1, updated_at=timezone.now()
+            )
+        if not change or 'group' in form.changed_data:
+            AssignmentGroup.objects.filter(pk=obj.group_id).update(
+                member_count=F('member_count') + 1, updated_at=timezone.now()
+            )
+
+# --- Background Jobs (see api/jobs.py) ---
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'attempts', 'run_at', 'locked_by')
+    list_filter = ('status', 'kind')
+    readonly_fields = ('last_error',)
+    actions = ['retry']
+
+    @admin.action(description="Retry selected jobs now")
+    def retry(self, request, queryset):
+        queryset.filter(status=Job.Status.FAILED).update(
+            status=Job.Status.QUEUED, attempts=0, run_at=timezone.now(), last_error=''
+        )
@@ -0,0 +1,212 @@
+import base64
+import json
+import uuid
+from functools import wraps
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.db.models import Prefetch
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .authentication import user_cache
+from .events import feed_available, stream_events
+from .join_codes import add_member, aresolve_join_code
+from .models import User, Server, Unit, Resource, AssignmentGroup, GroupMember
+from .permissions import ahas_server_access
+from .serializers import ServerSerializer, UnitSerializer, ResourceSerializer, AssignmentGroupSerializer
+
+# Async (ASGI) versions of the hot read endpoints and join-server. Under an ASGI server a
+# request waiting on the database no longer pins a worker: the event loop keeps serving others.
+# Same payloads as the DRF views; pagination uses its own keyset cursor (forward only).
+# The per-server change feed (section 3) lives here too: it only makes sense on ASGI.
+
+
+# --- 1. Helpers ---
+def json_response(data, status=200):
+    return JsonResponse(data, status=status, encoder=DjangoJSONEncoder, safe=False)
+
+
+async def authenticate(request):
+    # JWT only. Decoding is pure CPU; the User is loaded only for tokens without role claims.
+    parts = request.headers.get('Authorization', '').split()
+    if len(parts) != 2 or parts[0] not in api_settings.AUTH_HEADER_TYPES:
+        return None
+    try:
+        token = AccessToken(parts[1])
+    except TokenError:
+        return None
+    if 'role' in token:
+        return TokenUser(token)
+    user_id = str(token[api_settings.USER_ID_CLAIM])
+    user = user_cache.get(user_id) or await User.objects.filter(pk=user_id).afirst()
+    if user is None or not user.is_active:
+        return None
+    user_cache.set(user_id, user)
+    return user
+
+
+def jwt_required(view):
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        request.user = await authenticate(request)
+        if request.user is None:
+            return json_response({"detail": "Authentication credentials were not provided."}, status=401)
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def not_found():
+    return json_response({"detail": "Not found."}, status=404)
+
+
+def query_token(view):
+    # EventSource cannot set headers: let it pass the access token as ?access_token=
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        token = request.GET.get('access_token')
+        if token and 'HTTP_AUTHORIZATION' not in request.META:
+            request.META['HTTP_AUTHORIZATION'] = f"Bearer {token}"
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def _encode_cursor(timestamp, pk):
+    return base64.urlsafe_b64encode(f"{timestamp.isoformat()}|{pk}".encode()).decode()
+
+
+def _decode_cursor(cursor):
+    try:
+        timestamp, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return parse_datetime(timestamp), uuid.UUID(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+async def keyset_page(request, queryset, time_field, serializer_class):
+    # Same (time, id) ordering and indexes as the DRF CursorPagination classes
+    try:
+        page_size = min(max(int(request.GET.get('page_size', 50)), 1), 200)
+    except ValueError:
+        page_size = 50
+
+    cursor = _decode_cursor(request.GET['cursor']) if 'cursor' in request.GET else None
+    if cursor and cursor[0]:
+        timestamp, pk = cursor
+        queryset = queryset.filter(
+            models.Q(**{f'{time_field}__lt': timestamp}) | models.Q(**{time_field: timestamp, 'id__lt': pk})
+        )
+
+    rows = [obj async for obj in queryset.order_by(f'-{time_field}', '-id')[:page_size + 1]]
+    next_url = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        params = request.GET.copy()
+        params['cursor'] = _encode_cursor(getattr(rows[-1], time_field), rows[-1].pk)
+        next_url = request.build_absolute_uri(f"{request.path}?{urlencode(params)}")
+
+    # Serializing is CPU only: everything it touches was fetched above
+    results = serializer_class(rows, many=True, context={'request': request}).data
+    return {"next": next_url, "previous": None, "results": results}
+
+
+# --- 2. Async Views ---
+@require_GET
+@jwt_required
+async def server_list(request):
+    queryset = Server.objects.filter(
+        models.Q(created_by_id=request.user.pk) | models.Q(members__user_id=request.user.pk)
+    ).distinct()
+    return json_response(await keyset_page(request, queryset, 'created_at', ServerSerializer))
+
+
+@csrf_exempt  # Bearer tokens only, no cookies to forge
+@require_POST
+@jwt_required
+async def join_server(request):
+    try:
+        code = json.loads(request.body or b'{}').get('join_code')
+    except (ValueError, AttributeError):
+        code = None
+
+    server = await aresolve_join_code(code)
+    if server is None:
+        return json_response({"error": "Invalid join code"}, status=404)
+    server_id, name = server
+
+    # Same single INSERT ... ON CONFLICT DO NOTHING as JoinServerView (raw SQL has no async API)
+    if not await sync_to_async(add_member)(server_id, request.user.pk):
+        return json_response({"message": "You are already in this server"})
+    return json_response({"message": f"Successfully joined {name}"}, status=201)
+
+
+@require_GET
+@jwt_required
+async def unit_list(request):
+    server_id = request.GET.get('server_id')
+    if server_id and not await ahas_server_access(request.user, 'server', server_id):
+        return not_found()
+    queryset = Unit.objects.filter(server_id=server_id) if server_id else Unit.objects.none()
+    return json_response(await keyset_page(request, queryset, 'created_at', UnitSerializer))
+
+
+@require_GET
+@jwt_required
+async def resource_list(request):
+    unit_id = request.GET.get('unit_id')
+    if unit_id and not await ahas_server_access(request.user, 'unit', unit_id):
+        return not_found()
+    queryset = Resource.objects.filter(unit_id=unit_id).select_related('uploaded_by', 'blob') if unit_id else Resource.objects.none()
+    return json_response(await keyset_page(request, queryset, 'uploaded_at', ResourceSerializer))
+
+
+@require_GET
+@jwt_required
+async def group_list(request):
+    unit_id = request.GET.get('unit_id')
+    if unit_id and not await ahas_server_access(request.user, 'unit', unit_id):
+        return not_found()
+    if unit_id:
+        queryset = AssignmentGroup.objects.filter(unit_id=unit_id).prefetch_related(
+            Prefetch('members', queryset=GroupMember.objects.select_related('user'))
+        )
+    else:
+        queryset = AssignmentGroup.objects.none()
+    return json_response(await keyset_page(request, queryset, 'created_at', AssignmentGroupSerializer))
+
+
+# --- 3. Change Feed (Server-Sent Events) ---
+@require_GET
+@query_token
+@jwt_required
+async def server_events(request, pk):
+    # Under WSGI the endless response would hold a sync worker for as long as the tab is open
+    if not isinstance(request, ASGIRequest):
+        return json_response({"error": "The change feed is only served under ASGI."}, status=503)
+    if not feed_available():
+        return json_response(
+            {"error": "The change feed is off: it needs a shared EVENT_BROKER or EVENT_FEED_SINGLE_PROCESS=1."},
+            status=503
+        )
+    if not await ahas_server_access(request.user, 'server', pk):
+        return not_found()
+
+    try:
+        last_id = int(request.headers.get('Last-Event-ID') or request.GET['last_event_id'])
+    except (KeyError, ValueError):
+        last_id = None
+
+    # An idle stream is one parked coroutine and an empty queue, not a worker
+    response = StreamingHttpResponse(stream_events(pk, last_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx must not buffer the stream
+    return response
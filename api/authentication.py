@@ -0,0 +1,79 @@
+import threading
+import time
+from collections import OrderedDict
+
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+
+# --- 1. Per-Process User Cache ---
+class UserCache:
+    # Bounded LRU with a TTL. Saves/deletes in this process invalidate immediately
+    # (see api/signals.py); other processes see changes once the TTL runs out.
+
+    def __init__(self, max_size=2048, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            user, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return user
+
+    def set(self, user_id, user):
+        with self._lock:
+            self._entries[user_id] = (user, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(str(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache()
+
+
+# --- 2. Authentication Class ---
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    Reads (GET/HEAD/OPTIONS) get a TokenUser built from the token's claims: no query.
+    Writes get the real User, from the per-process cache when possible.
+    Tokens are issued with the claims by TaskTideTokenObtainPairSerializer.
+    """
+
+    def authenticate(self, request):
+        # A fresh authenticator is created for every request, so this is safe to keep on self
+        self.read_only = request.method in SAFE_METHODS
+        return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        # Tokens issued before the claims were added still go through the database
+        if self.read_only and 'role' in validated_token:
+            return TokenUser(validated_token)
+
+        user_id = str(validated_token.get(api_settings.USER_ID_CLAIM))
+        user = user_cache.get(user_id)
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(user_id, user)
+        elif api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        return user
@@ -0,0 +1,134 @@
+import hashlib
+import time
+import uuid
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+from .routers import on_primary
+
+# Every cached list belongs to a scope: the endpoint plus the parent it is filtered by
+# ('servers' per user, 'units' per server, 'resources' and 'groups' per unit). Writing a row
+# bumps its scope's version, which changes every cache key in that scope at once (old entries
+# simply expire). A version is the time of the last write in nanoseconds, so it doubles as
+# the list's Last-Modified.
+CACHE_SCOPES = ('servers', 'units', 'resources', 'groups')
+
+
+# --- 1. Versions ---
+def _version_key(scope, parent_id):
+    return f"api:v:{scope}:{parent_id}"
+
+
+def get_version(scope, parent_id):
+    key = _version_key(scope, parent_id)
+    version = cache.get(key)
+    if version is None:
+        # An evicted version restarts from "now", so it can never match an old cached page
+        version = time.time_ns()
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+def _set_versions(keys):
+    now = time.time_ns()
+    cache.set_many({key: now for key in keys}, timeout=None)
+
+
+def bump_version(scope, parent_id):
+    bump_versions(scope, [parent_id])
+
+
+def bump_versions(scope, parent_ids):
+    # Moved now and again on commit: a read in between sees the old rows (the write is not
+    # committed yet) and would cache them under the new version. For bulk writes this is
+    # one round trip to the cache instead of one per row.
+    keys = [_version_key(scope, parent_id) for parent_id in parent_ids]
+    if keys:
+        _set_versions(keys)
+        transaction.on_commit(lambda: _set_versions(keys))
+
+
+# --- 2. Hit / Miss Counters ---
+def _count(scope, outcome):
+    key = f"api:stats:{scope}:{outcome}"
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+
+def cache_stats():
+    keys = [f"api:stats:{scope}:{outcome}" for scope in CACHE_SCOPES for outcome in ('hit', 'miss')]
+    counters = cache.get_many(keys)
+    stats = {}
+    for scope in CACHE_SCOPES:
+        hits = counters.get(f"api:stats:{scope}:hit", 0)
+        misses = counters.get(f"api:stats:{scope}:miss", 0)
+        stats[scope] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / (hits + misses), 3) if hits + misses else None,
+        }
+    return stats
+
+
+# --- 3. View Mixin ---
+class VersionedListCacheMixin:
+    # Set on the view: the scope name and the query param holding the parent id
+    cache_scope = None
+    cache_parent_param = None
+
+    def get_cache_versions(self):
+        # The (scope, id) pairs whose versions identify this list, or None to skip caching
+        try:
+            parent_id = uuid.UUID(self.request.query_params.get(self.cache_parent_param, ''))
+        except ValueError:
+            return None
+        return [(self.cache_scope, parent_id)]
+
+    def list(self, request, *args, **kwargs):
+        scopes = self.get_cache_versions() if settings.API_LIST_CACHE else None
+        if scopes is None:
+            return super().list(request, *args, **kwargs)
+
+        versions = [get_version(scope, parent_id) for scope, parent_id in scopes]
+        # The full URL is part of the key: it carries the cursor, page size and host (for 'next' links)
+        tag = hashlib.md5(f"{scopes}{versions}{request.build_absolute_uri()}".encode()).hexdigest()
+        etag = quote_etag(tag)
+        last_modified = max(versions) // 1_000_000_000
+
+        # CONDITIONAL GET: a client that already has this version gets a 304, with no DB or serializer work
+        not_modified = get_conditional_response(request._request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return self.add_validators(not_modified, etag, last_modified)
+
+        key = f"api:list:{self.cache_scope}:{tag}"
+        data = cache.get(key)
+        if data is not None:
+            _count(self.cache_scope, 'hit')
+            return self.add_validators(Response(data), etag, last_modified)
+
+        _count(self.cache_scope, 'miss')
+        # Written moments ago: a replica may not have it yet, and a stale page cached under the
+        # new version would be served to everyone until the next write
+        fresh = time.time_ns() - max(versions) < settings.REPLICA_PIN_SECONDS * 1_000_000_000
+        with on_primary() if fresh else nullcontext():
+            response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, timeout=settings.API_LIST_CACHE_TIMEOUT)
+            self.add_validators(response, etag, last_modified)
+        return response
+
+    def add_validators(self, response, etag, last_modified):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        # Clients may keep the body but must revalidate (cheaply, via 304) before reusing it
+        response['Cache-Control'] = 'private, no-cache'
+        return response
@@ -0,0 +1,137 @@
+import hashlib
+import random
+import time
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from .join_codes import allocate_join_codes
+from .models import User, Server, ServerMember, Unit, Blob, Resource, AssignmentGroup, GroupMember, blob_path
+
+# Synthetic campus for 'manage.py bench'. Every name starts with this prefix so a bench
+# database can be recognised (and is never seeded twice).
+BENCH_PREFIX = 'bench-'
+BENCH_PASSWORD = 'bench-pass-123'
+INSERT_BATCH_SIZE = 2000
+
+# Sizes at --scale 1: 2,000 servers, 200k memberships, 200k resources, 200k group members
+CAMPUS_SIZES = {
+    'students': 20000,
+    'reps': 200,
+    'servers': 2000,
+    'servers_per_student': 10,
+    'units_per_server': 5,
+    'resources_per_unit': 20,
+    'groups_per_unit': 4,
+    'group_size': 5,
+}
+
+
+# --- 1. Helpers ---
+def _insert(model, rows):
+    # Streams `rows` into bulk INSERTs, so the full table is never held in memory
+    rows, total = iter(rows), 0
+    while batch := list(islice(rows, INSERT_BATCH_SIZE)):
+        model.objects.bulk_create(batch)
+        total += len(batch)
+    return total
+
+
+def campus_exists():
+    return User.objects.filter(username__startswith=BENCH_PREFIX).exists()
+
+
+def campus_sizes(scale):
+    sizes = dict(CAMPUS_SIZES)
+    for key in ('students', 'reps', 'servers'):
+        sizes[key] = max(1, round(CAMPUS_SIZES[key] * scale))
+    return sizes
+
+
+# --- 2. Seeding ---
+def seed_campus(scale=1.0, seed=0, log=print):
+    """
+    Bulk-inserts a campus of `campus_sizes(scale)`: students, class reps, a staff admin, servers
+    with members, units, resources and full assignment groups. Returns the row counts.
+    """
+    sizes = campus_sizes(scale)
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    counts = {}
+    # Everyone shares one hash: hashing 20k passwords would dominate the seeding time
+    password = make_password(BENCH_PASSWORD)
+
+    with transaction.atomic():
+        students = [
+            User(username=f'{BENCH_PREFIX}student-{i}', registration_number=f'BENCH/{i:06d}', password=password)
+            for i in range(sizes['students'])
+        ]
+        reps = [
+            User(username=f'{BENCH_PREFIX}rep-{i}', role=User.Role.CLASS_REP, password=password)
+            for i in range(sizes['reps'])
+        ]
+        admin = User(username=f'{BENCH_PREFIX}admin', role=User.Role.ADMIN, is_staff=True, password=password)
+        counts['users'] = _insert(User, [*students, *reps, admin])
+
+        # One counter upsert for every code, instead of one per Server()
+        servers = [
+            Server(name=f'{BENCH_PREFIX}Class {i}', join_code=code, created_by=reps[i % len(reps)])
+            for i, code in enumerate(allocate_join_codes(sizes['servers']))
+        ]
+        counts['servers'] = _insert(Server, servers)
+
+        # Each student joins a few random classes; keep each server's roster for the groups below
+        rosters = {server.pk: [] for server in servers}
+        def memberships():
+            for student in students:
+                for server in rng.sample(servers, min(sizes['servers_per_student'], len(servers))):
+                    rosters[server.pk].append(student.pk)
+                    yield ServerMember(server=server, user=student)
+        counts['server_members'] = _insert(ServerMember, memberships())
+        log(f"  users, servers and memberships: {time.perf_counter() - started:.1f}s")
+
+        units = [
+            Unit(server=server, name=f'Unit {n}', code=f'U{n:03d}', created_by=server.created_by)
+            for server in servers for n in range(sizes['units_per_server'])
+        ]
+        counts['units'] = _insert(Unit, units)
+
+        # One small shared file: downloads are benchmarked, storage is not
+        content = b'%PDF-1.4\n' + bytes(rng.getrandbits(8) for _ in range(64 * 1024))
+        sha256 = hashlib.sha256(content).hexdigest()
+        name = blob_path(sha256, '.pdf')
+        if not default_storage.exists(name):
+            name = default_storage.save(name, ContentFile(content))
+        blob, _ = Blob.objects.get_or_create(sha256=sha256, defaults={'file': name, 'size': len(content)})
+        counts['resources'] = _insert(Resource, (
+            Resource(unit=unit, title=f'Lecture {n}', file=blob.file.name, blob=blob, uploaded_by_id=unit.created_by_id)
+            for unit in units for n in range(sizes['resources_per_unit'])
+        ))
+        log(f"  units and resources: {time.perf_counter() - started:.1f}s")
+
+        groups, seats = [], []
+        for unit in units:
+            roster = rosters[unit.server_id]
+            picked = rng.sample(roster, min(len(roster), sizes['groups_per_unit'] * sizes['group_size']))
+            for n in range(sizes['groups_per_unit']):
+                members = picked[n * sizes['group_size']:(n + 1) * sizes['group_size']]
+                group = AssignmentGroup(
+                    unit=unit, name=f'Group {n + 1}', max_members=sizes['group_size'] + 1,
+                    member_count=len(members), created_by_id=unit.created_by_id,
+                )
+                groups.append(group)
+                seats.append(members)
+        counts['groups'] = _insert(AssignmentGroup, groups)
+        counts['group_members'] = _insert(GroupMember, (
+            GroupMember(group=group, user_id=user_id) for group, members in zip(groups, seats) for user_id in members
+        ))
+        log(f"  groups and members: {time.perf_counter() - started:.1f}s")
+
+    # bulk_create skips the signals that move list cache versions
+    cache.clear()
+    counts['seconds'] = round(time.perf_counter() - started, 1)
+    return counts
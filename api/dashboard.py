@@ -0,0 +1,105 @@
+from django.db import models
+from django.db.models.functions import Coalesce
+
+from .models import Server, ServerMember, Unit, Resource, AssignmentGroup
+from .readers import reader_for
+from .serializers import DashboardServerSerializer, DashboardUnitSerializer, DashboardGroupSerializer
+
+# The app's home screen in one call: the user's servers, each with its units, each unit with
+# its resource and group counts and the groups the user is in. One query per level (3 at most)
+# whatever the number of servers or rows: counts are annotations, and rows are nested in Python.
+# '?fields=' trims the tree; a level or count nobody asked for is not queried at all.
+
+CHILDREN = {'servers': 'units', 'units': 'groups'}
+COUNTS = {
+    'member_count': (ServerMember, 'server'),
+    'unit_count': (Unit, 'server'),
+    'resource_count': (Resource, 'unit'),
+    'group_count': (AssignmentGroup, 'unit'),
+}
+
+
+# --- 1. Field Selection ---
+def _readers():
+    return {
+        'servers': reader_for(DashboardServerSerializer),
+        'units': reader_for(DashboardUnitSerializer),
+        'groups': reader_for(DashboardGroupSerializer),
+    }
+
+
+def _known(level):
+    return [name for name, _, _ in _readers()[level].fields] + [CHILDREN.get(level)]
+
+
+def parse_fields(param):
+    """
+    '?fields=name,units.code,units.groups.name' -> {'name': {}, 'units': {'code': {}, 'groups': {'name': {}}}}.
+    An empty branch selects everything below it; no parameter selects the whole tree.
+    Raises ValueError on a field that does not exist.
+    """
+    selection = {}
+    for path in filter(None, (part.strip() for part in (param or '').split(','))):
+        level, branch = 'servers', selection
+        for name in path.split('.'):
+            if level is None or name not in _known(level):
+                raise ValueError(f"Unknown field '{path}'")
+            branch = branch.setdefault(name, {})
+            level = CHILDREN.get(level) if name == CHILDREN.get(level) else None
+    return selection
+
+
+def _select(level, selection):
+    # (reader for the selected fields, selection below this level or None if it is not wanted)
+    reader, child = _readers()[level], CHILDREN.get(level)
+    if not selection:
+        return reader, {} if child else None
+    return reader.only(selection), selection.get(child) if child else None
+
+
+def _count(name):
+    # A correlated COUNT per row: two JOINs to count two relations would multiply each other.
+    # Each one is an index range scan on the foreign key.
+    model, fk = COUNTS[name]
+    counted = model.objects.filter(**{fk: models.OuterRef('pk')}).order_by().values(fk)
+    return Coalesce(models.Subquery(counted.annotate(n=models.Count('*')).values('n')), 0)
+
+
+def _annotated(queryset, reader):
+    return queryset.annotate(**{name: _count(name) for name, _, _ in reader.fields if name in COUNTS})
+
+
+# --- 2. Building the Tree ---
+def build_dashboard(user, selection, context):
+    # By id: on GETs `user` is the JWT's TokenUser, not a User row
+    server_reader, unit_selection = _select('servers', selection)
+    joined = ServerMember.objects.filter(user_id=user.pk).values('server_id')
+    servers = Server.objects.filter(models.Q(created_by_id=user.pk) | models.Q(pk__in=joined)).order_by('name')
+    values = list(server_reader.values(_annotated(servers, server_reader), 'id'))
+    rows = server_reader.rows(values, context)
+    if unit_selection is None:
+        return {'servers': rows}
+
+    unit_reader, group_selection = _select('units', unit_selection)
+    units = Unit.objects.filter(server_id__in=[row['id'] for row in values]).order_by('code')
+    unit_values = list(unit_reader.values(_annotated(units, unit_reader), 'id', 'server_id'))
+    unit_rows = unit_reader.rows(unit_values, context)
+    units_of = {row['id']: [] for row in values}
+    for raw, row in zip(unit_values, unit_rows):
+        units_of[raw['server_id']].append(row)
+
+    if group_selection is not None:
+        group_reader, _ = _select('groups', group_selection)
+        groups = AssignmentGroup.objects.filter(
+            members__user_id=user.pk, unit_id__in=[raw['id'] for raw in unit_values]
+        ).order_by('name')
+        group_values = list(group_reader.values(groups, 'unit_id'))
+        groups_of = {raw['id']: [] for raw in unit_values}
+        for raw, row in zip(group_values, group_reader.rows(group_values, context)):
+            groups_of[raw['unit_id']].append(row)
+        for raw, row in zip(unit_values, unit_rows):
+            row['groups'] = groups_of[raw['id']]
+
+    for raw, row in zip(values, rows):
+        row['units'] = units_of[raw['id']]
+    return {'servers': rows}
@@ -0,0 +1,134 @@
+import os
+import re
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.http import content_disposition_header, http_date, parse_etags, quote_etag
+from django.utils.text import get_valid_filename
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+# --- 1. Range Requests ---
+def parse_range(header, size):
+    """
+    Returns (start, end) for a single 'bytes=' range, inclusive of both ends.
+    Returns None when the header should be ignored (missing or multi-range),
+    and raises ValueError when the range cannot be satisfied.
+    """
+    match = RANGE_RE.match(header.replace(' ', '')) if header else None
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        raise ValueError("empty range")
+    if not first:
+        # 'bytes=-500' means the last 500 bytes
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("range not satisfiable")
+    return start, end
+
+
+class RangeFile:
+    # Exposes only [start, start + length) of an open file. fileno() stays available, so
+    # gunicorn still uses sendfile(): it starts at the current position and stops at Content-Length.
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.remaining = length
+        file.seek(start)
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        size = self.remaining if size < 0 else min(size, self.remaining)
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+# --- 2. Building the Response ---
+def resource_etag(resource):
+    # Blob-backed files are named by their content hash; older files fall back to name + size
+    if resource.blob_id:
+        return quote_etag(resource.blob_id)
+    return quote_etag(f"{resource.file.name}-{resource.file.size}")
+
+
+def offload_response(resource, filename):
+    # Let the front proxy stream the file, so no gunicorn worker is tied up (it also handles Range)
+    mode = settings.RESOURCE_DOWNLOAD_OFFLOAD
+    response = HttpResponse(content_type='application/octet-stream')
+    if mode == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = settings.RESOURCE_DOWNLOAD_ACCEL_PREFIX + resource.file.name
+    else:
+        response['X-Sendfile'] = resource.file.path
+    # Let nginx/Apache pick the type from the file instead of our placeholder
+    del response['Content-Type']
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+    return response
+
+
+def file_response(resource, filename, range_header):
+    resource.file.open('rb')
+    size = resource.file.size
+    try:
+        byte_range = parse_range(range_header, size)
+    except ValueError:
+        resource.file.close()
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f"bytes */{size}"
+        return response
+
+    if byte_range is None:
+        # Whole file: FileResponse hands the open file to wsgi.file_wrapper (sendfile)
+        return FileResponse(resource.file.file, as_attachment=True, filename=filename)
+
+    start, end = byte_range
+    length = end - start + 1
+    response = FileResponse(
+        RangeFile(resource.file.file, start, length), as_attachment=True, filename=filename, status=206
+    )
+    response['Content-Length'] = str(length)
+    response['Content-Range'] = f"bytes {start}-{end}/{size}"
+    return response
+
+
+def download_filename(resource):
+    # Blob paths are hashes; give the browser the title with the original extension
+    extension = os.path.splitext(resource.file.name)[1]
+    return get_valid_filename(resource.title) + extension if resource.title.strip() else os.path.basename(resource.file.name)
+
+
+def download_response(request, resource):
+    etag = resource_etag(resource)
+    filename = download_filename(resource)
+    client_etags = parse_etags(request.headers.get('If-None-Match', ''))
+
+    if etag in client_etags or '*' in client_etags:
+        response = HttpResponse(status=304)
+    elif settings.RESOURCE_DOWNLOAD_OFFLOAD:
+        response = offload_response(resource, filename)
+    else:
+        range_header = request.headers.get('Range')
+        # If-Range: only honour the range if the client's copy is still current
+        if range_header and request.headers.get('If-Range', etag) != etag:
+            range_header = None
+        response = file_response(resource, filename, range_header)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(resource.uploaded_at.timestamp())
+    response['Accept-Ranges'] = 'bytes'
+    # Authenticated content: browsers may cache it, shared proxies must not
+    response['Cache-Control'] = 'private, max-age=86400'
+    return response
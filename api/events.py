@@ -0,0 +1,170 @@
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+# Change feed for /api/servers/<id>/events/ (Server-Sent Events). Model signals publish small
+# events per server; each open stream is a subscriber with a bounded queue. Every server keeps
+# its last EVENT_REPLAY_SIZE events so a reconnecting client sends Last-Event-ID and misses nothing.
+# Event ids are nanosecond timestamps, so they keep increasing across restarts.
+
+
+# --- 1. Subscriptions ---
+class Subscription:
+    """One open stream. Lives on an event loop; publishers hand it events from any thread."""
+
+    def __init__(self, server_id, maxsize):
+        self.server_id = server_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def deliver(self, event):
+        # Runs on the subscriber's loop. A client too slow to drain its queue is cut off
+        # (None ends the stream) and catches up from the replay buffer when it reconnects.
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+    async def get(self):
+        return await self.queue.get()
+
+
+# --- 2. In-Process Broker ---
+class InProcessBroker:
+    # Only sees events published in its own process: run everything on one ASGI worker
+    # process (any number of connections), or plug in a shared broker with EVENT_BROKER.
+    shared = False
+
+    def __init__(self, replay_size=None, queue_size=None):
+        self.replay_size = replay_size or settings.EVENT_REPLAY_SIZE
+        self.queue_size = queue_size or settings.EVENT_SUBSCRIBER_QUEUE_SIZE
+        self._lock = threading.Lock()
+        self._history = {}
+        self._subscribers = {}
+        # Ids at or below these may be missing: anything before this process started,
+        # and per server the newest event pushed out of the buffer
+        self._started_at = time.time_ns()
+        self._evicted = {}
+        self._last_id = 0
+
+    def _next_id(self):
+        self._last_id = max(self._last_id + 1, time.time_ns())
+        return self._last_id
+
+    def publish(self, server_id, kind, data):
+        with self._lock:
+            event = {'id': self._next_id(), 'event': kind, 'data': data}
+            history = self._history.setdefault(server_id, deque(maxlen=self.replay_size))
+            if len(history) == history.maxlen:
+                self._evicted[server_id] = history[0]['id']
+            history.append(event)
+            subscribers = list(self._subscribers.get(server_id, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                self.unsubscribe(subscription)  # Its loop is gone
+        return event
+
+    def replay(self, server_id, last_id):
+        """
+        Events after `last_id`, oldest first, and whether that is complete
+        (False if some were already pushed out of the buffer).
+        """
+        with self._lock:
+            history = list(self._history.get(server_id, ()))
+            complete = last_id >= max(self._started_at, self._evicted.get(server_id, 0))
+        return [event for event in history if event['id'] > last_id], complete
+
+    def subscribe(self, server_id):
+        subscription = Subscription(server_id, self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(server_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.server_id, set())
+            subscribers.discard(subscription)
+            if not subscribers:
+                self._subscribers.pop(subscription.server_id, None)
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        _broker = import_string(settings.EVENT_BROKER)()
+    return _broker
+
+
+def feed_available():
+    # A stream must see every write: either the broker spans processes, or there is one process
+    return getattr(get_broker(), 'shared', False) or settings.EVENT_FEED_SINGLE_PROCESS
+
+
+def publish_on_commit(server_id, kind, data):
+    # Only announce rows that were actually committed
+    transaction.on_commit(lambda: get_broker().publish(server_id, kind, data))
+
+
+# --- 3. Wire Format ---
+def format_event(event):
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+
+
+async def stream_events(server_id, last_id=None, heartbeat=None):
+    """
+    The body of one SSE response: replay whatever the client missed since `last_id`
+    (a fresh client has loaded the lists already, so gets none), then live events.
+    Subscribes before replaying so nothing published in between is lost.
+    """
+    broker = get_broker()
+    heartbeat = heartbeat or settings.EVENT_HEARTBEAT_SECONDS
+    subscription = broker.subscribe(server_id)
+    try:
+        yield f"retry: {settings.EVENT_RETRY_MS}\n\n"
+        if last_id is None:
+            last_id = 0  # Only what is queued from here on
+        else:
+            missed, complete = broker.replay(server_id, last_id)
+            if not complete:
+                # Too far behind for the buffer: tell the client to reload its lists
+                yield format_event({'id': last_id, 'event': 'reset', 'data': {}})
+            for event in missed:
+                last_id = event['id']
+                yield format_event(event)
+
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                # A comment line keeps proxies from closing an idle connection
+                yield ": keepalive\n\n"
+                continue
+            if event is None:
+                return
+            if event['id'] <= last_id:
+                continue  # Already sent during the replay
+            last_id = event['id']
+            yield format_event(event)
+    finally:
+        broker.unsubscribe(subscription)
@@ -0,0 +1,84 @@
+import math
+import random
+
+from django.db import models
+
+from .cache import bump_version
+from .events import publish_on_commit
+from .models import User, ServerMember, AssignmentGroup, GroupMember
+
+
+# --- 1. Picking the students ---
+def ungrouped_student_ids(unit, registration_numbers=None):
+    """
+    Returns (user ids to group, registration numbers matching no member of the unit's server).
+    Default pool is every student in the unit's server. Anyone already in a group for this
+    unit keeps their group and is left out.
+    """
+    already_grouped = GroupMember.objects.filter(group__unit=unit).values('user_id')
+    members = ServerMember.objects.filter(server_id=unit.server_id)
+    if registration_numbers is None:
+        candidates = members.filter(user__role=User.Role.STUDENT).exclude(
+            user_id__in=already_grouped
+        ).order_by('user__username').values_list('user_id', flat=True)
+        return list(candidates), []
+
+    # One query: the members named in the list, each flagged if already grouped
+    rows = members.filter(user__registration_number__in=registration_numbers).annotate(
+        grouped=models.Exists(already_grouped.filter(user_id=models.OuterRef('user_id')))
+    ).order_by('user__username').values_list('user__registration_number', 'user_id', 'grouped')
+    found, user_ids = set(), []
+    for registration_number, user_id, grouped in rows:
+        found.add(registration_number)
+        if not grouped:
+            user_ids.append(user_id)
+    return user_ids, list(dict.fromkeys(reg for reg in registration_numbers if reg not in found))
+
+
+# --- 2. Building the groups ---
+def allocate_groups(unit, user_ids, group_size, created_by, name_prefix='Group', shuffle=False):
+    """
+    Splits `user_ids` into ceil(n / group_size) groups whose sizes differ by at most one.
+    Everything is written with two bulk INSERTs; run it inside a transaction that holds
+    the unit's row lock since `user_ids` were picked.
+    """
+    if not user_ids:
+        return []
+    if shuffle:
+        user_ids = random.sample(user_ids, len(user_ids))
+
+    group_total = math.ceil(len(user_ids) / group_size)
+    # Continue numbering after any groups the Class Rep already made by hand
+    offset = AssignmentGroup.objects.filter(unit=unit).count()
+
+    # Round-robin dealing keeps the groups balanced (e.g. 11 students / size 5 -> 4, 4, 3)
+    seats = [user_ids[i::group_total] for i in range(group_total)]
+    groups = [
+        AssignmentGroup(
+            unit=unit,
+            name=f"{name_prefix} {offset + i + 1}",
+            max_members=group_size,
+            member_count=len(members),
+            created_by=created_by,
+        )
+        for i, members in enumerate(seats)
+    ]
+    AssignmentGroup.objects.bulk_create(groups)
+    GroupMember.objects.bulk_create(
+        GroupMember(group=group, user_id=user_id)
+        for group, members in zip(groups, seats)
+        for user_id in members
+    )
+    # bulk_create skips model signals, so invalidate the cached group list and announce the
+    # groups and their members here (the same events as api/signals.py)
+    bump_version('groups', unit.pk)
+    for group, members in zip(groups, seats):
+        publish_on_commit(unit.server_id, 'group.created', {
+            'id': group.id, 'unit': unit.pk, 'name': group.name,
+            'max_members': group.max_members, 'member_count': group.member_count,
+        })
+        for user_id in members:
+            publish_on_commit(unit.server_id, 'group.member_joined', {
+                'group': group.id, 'unit': unit.pk, 'user': user_id,
+            })
+    return groups
@@ -0,0 +1,63 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+# This module is imported by pool workers before Django is set up,
+# so it must not import models (or anything that does) at the top level.
+
+# Passwords are sent to the workers in chunks to keep pickling overhead low
+HASH_CHUNK_SIZE = 16
+# Pool workers run at lower CPU priority so interactive requests on the same box win
+WORKER_NICENESS = 10
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# --- 1. Worker Side ---
+def _init_worker(settings_module):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+    if hasattr(os, 'nice'):
+        os.nice(WORKER_NICENESS)
+
+
+def _hash_chunk(passwords):
+    from django.contrib.auth.hashers import make_password
+    return [make_password(password) for password in passwords]
+
+
+# --- 2. Caller Side ---
+def get_pool(workers):
+    # One long-lived pool per process: spawning workers (and importing Django in them) costs
+    # far more than a few hashes, so it is paid once. Only register_cohort uses it; web workers
+    # hash in the request thread (see BulkRegisterView), or a host would run a pool per worker.
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                # 'spawn', not 'fork': forking a threaded web worker can deadlock the child
+                mp_context=get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'tasktide.settings'),),
+            )
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+
+def hash_passwords(passwords, workers, chunk_size=HASH_CHUNK_SIZE):
+    # PBKDF2 is pure CPU: with more than one worker the chunks are hashed in parallel processes
+    chunks = [passwords[i:i + chunk_size] for i in range(0, len(passwords), chunk_size)]
+    if workers <= 1 or len(chunks) <= 1:
+        return [hashed for chunk in chunks for hashed in _hash_chunk(chunk)]
+    return [hashed for chunk in get_pool(workers).map(_hash_chunk, chunks) for hashed in chunk]
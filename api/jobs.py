@@ -0,0 +1,188 @@
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .metrics import registry
+from .models import Job
+
+logger = logging.getLogger('api.jobs')
+
+# Background jobs in a database table, run by 'manage.py runworker'. Enqueueing is a plain INSERT,
+# so a job commits or rolls back together with the rows it is about, and no broker is needed.
+# Workers claim a job with a lease; if a worker dies mid-job, the lease runs out and another
+# worker retries it. Handlers can therefore run more than once per job and must be idempotent.
+
+# Handler per job kind; it gets the payload as keyword arguments
+HANDLERS = {
+    'process_resource': 'api.processing.process_resource',
+}
+CLAIM_CANDIDATES = 10  # Rows tried per claim where SKIP LOCKED is unavailable (SQLite)
+
+
+# --- 1. Enqueue ---
+def enqueue(kind, delay=0, max_attempts=None, **payload):
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind '{kind}'")
+    return Job.objects.create(
+        kind=kind, payload=payload,
+        run_at=timezone.now() + timedelta(seconds=delay),
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+    )
+
+
+# --- 2. Claiming ---
+def _kinds_at_limit(now):
+    # JOB_CONCURRENCY_LIMITS caps the running jobs of a kind across all workers. It is checked
+    # when claiming, so two workers claiming at the same instant can overshoot it by one.
+    limits = settings.JOB_CONCURRENCY_LIMITS
+    if not limits:
+        return []
+    running = (
+        Job.objects.filter(kind__in=limits, status=Job.Status.RUNNING, locked_until__gte=now)
+        .values('kind').annotate(running=Count('id')).values_list('kind', 'running')
+    )
+    return [kind for kind, count in running if count >= limits[kind]]
+
+
+def _claimable(now, kinds=None):
+    # Due jobs, and running jobs whose worker let the lease run out
+    queryset = Job.objects.filter(
+        Q(status=Job.Status.QUEUED, run_at__lte=now) | Q(status=Job.Status.RUNNING, locked_until__lt=now)
+    )
+    if kinds:
+        queryset = queryset.filter(kind__in=kinds)
+    full = _kinds_at_limit(now)
+    if full:
+        queryset = queryset.exclude(kind__in=full)
+    return queryset.order_by('run_at', 'id')
+
+
+def claim(worker_id, kinds=None):
+    """The next due job, now leased to `worker_id`, or None."""
+    now = timezone.now()
+    take = {
+        'status': Job.Status.RUNNING, 'locked_by': worker_id, 'attempts': F('attempts') + 1,
+        'locked_until': now + timedelta(seconds=settings.JOB_LEASE_SECONDS),
+    }
+    claimable = _claimable(now, kinds)
+    if connection.features.has_select_for_update_skip_locked:
+        # Postgres: workers skip each other's locked rows instead of queueing behind them
+        with transaction.atomic():
+            job = claimable.select_for_update(skip_locked=True).first()
+            if job is None:
+                return None
+            Job.objects.filter(pk=job.pk).update(**take)
+    else:
+        # Conditional UPDATE: of two workers racing for the same row, exactly one changes it
+        for pk in claimable.values_list('pk', flat=True)[:CLAIM_CANDIDATES]:
+            if _claimable(now, kinds).filter(pk=pk).update(**take):
+                break
+        else:
+            return None
+        job = Job(pk=pk)
+    job.refresh_from_db()
+    return job
+
+
+# --- 3. Running ---
+def _retry_or_fail(job, error):
+    owned = Job.objects.filter(pk=job.pk, locked_by=job.locked_by)
+    if job.attempts >= job.max_attempts:
+        owned.update(status=Job.Status.FAILED, last_error=error, locked_by='', locked_until=None)
+        logger.error("%s failed after %s attempts:\n%s", job, job.attempts, error)
+        return 'failed'
+    # Exponential backoff: 10s, 20s, 40s, ... up to JOB_RETRY_MAX_SECONDS
+    delay = min(settings.JOB_RETRY_BASE_SECONDS * 2 ** (job.attempts - 1), settings.JOB_RETRY_MAX_SECONDS)
+    owned.update(
+        status=Job.Status.QUEUED, run_at=timezone.now() + timedelta(seconds=delay),
+        last_error=error, locked_by='', locked_until=None,
+    )
+    logger.warning("%s failed (attempt %s of %s), retrying in %ss", job, job.attempts, job.max_attempts, delay)
+    return 'retried'
+
+
+def run_job(job):
+    """Runs a claimed job. Returns 'done', 'retried' or 'failed'."""
+    labels = {'kind': job.kind}
+    # Time from due to started: how far behind the workers are
+    registry.observe('tasktide_job_wait_seconds', labels, max(0.0, (timezone.now() - job.run_at).total_seconds()))
+    started = time.perf_counter()
+    if job.attempts > job.max_attempts:
+        # Its last attempt lost its lease (the worker died or hung): don't start another
+        outcome = _retry_or_fail(job, job.last_error or "Lease expired on the last attempt")
+    else:
+        try:
+            import_string(HANDLERS[job.kind])(**job.payload)
+        except Exception:
+            outcome = _retry_or_fail(job, traceback.format_exc())
+        else:
+            Job.objects.filter(pk=job.pk, locked_by=job.locked_by).delete()
+            outcome = 'done'
+    registry.observe('tasktide_job_duration_seconds', labels, time.perf_counter() - started)
+    registry.inc('tasktide_jobs_total', {**labels, 'outcome': outcome})
+    registry.flush()
+    return outcome
+
+
+def run_pending(worker_id='inline', kinds=None):
+    """Runs due jobs in this thread until none are left. Returns how many ran."""
+    count = 0
+    while (job := claim(worker_id, kinds)) is not None:
+        run_job(job)
+        count += 1
+    return count
+
+
+# --- 4. Worker ---
+class Worker:
+    # `concurrency` threads, each claiming and running one job at a time. Jobs mostly wait on
+    # storage and the database; run more worker processes for CPU-heavy kinds.
+
+    def __init__(self, concurrency=1, kinds=None, poll_seconds=None):
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self.concurrency = concurrency
+        self.kinds = kinds
+        self.poll_seconds = settings.JOB_POLL_SECONDS if poll_seconds is None else poll_seconds
+        self.stopping = threading.Event()
+
+    def _loop(self, number):
+        worker_id = f"{self.name}:{number}"
+        while not self.stopping.is_set():
+            close_old_connections()
+            try:
+                job = claim(worker_id, self.kinds)
+            except DatabaseError:
+                logger.exception("Worker %s could not claim a job", worker_id)
+                job = None
+            if job is None:
+                self.stopping.wait(self.poll_seconds)
+                continue
+            run_job(job)
+        connection.close()
+
+    def run(self):
+        threads = [
+            threading.Thread(target=self._loop, args=(number,), name=f"runworker-{number}", daemon=True)
+            for number in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        # Short joins keep the main thread free to handle SIGTERM/SIGINT (see stop())
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(0.5)
+        registry.flush(force=True)
+
+    def stop(self):
+        # Running jobs finish; nothing new is claimed
+        self.stopping.set()
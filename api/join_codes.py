@@ -0,0 +1,149 @@
+import re
+import string
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models.signals import post_save
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+
+from .models import Counter, Server, ServerMember
+
+# Join codes are 6 characters of A-Z and 0-9: about 2.18 billion of them.
+# - Allocation: each server takes the next number from a counter and a keyed permutation turns
+#   it into a code. Distinct numbers give distinct codes, so nothing is retried on the unique
+#   constraint, and the codes look random: they don't count the servers or hint at their neighbours.
+# - Resolution: code -> (server id, name) is cached, invalid codes too, so guessing costs no queries.
+# - Joining: one INSERT ... ON CONFLICT DO NOTHING, instead of a lookup, an exists() and an INSERT.
+
+ALPHABET = string.ascii_uppercase + string.digits
+CODE_LENGTH = 6
+CODE_SPACE = len(ALPHABET) ** CODE_LENGTH
+CODE_PATTERN = re.compile(r'[A-Z0-9]{6}')
+FEISTEL_ROUNDS = 4
+
+
+# --- 1. Allocation ---
+def take_numbers(name, count):
+    """The next `count` numbers of the named counter, from one statement (no read-modify-write)."""
+    table = Counter._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (name, value) VALUES (%s, %s) "
+            f"ON CONFLICT (name) DO UPDATE SET value = {table}.value + excluded.value RETURNING value",
+            [name, count],
+        )
+        last = cursor.fetchone()[0]
+    return range(last - count, last)
+
+
+def _round(index, right):
+    digest = salted_hmac(f'api.join_codes.{index}', right.to_bytes(2, 'big'), algorithm='sha256').digest()
+    return int.from_bytes(digest[:2], 'big')
+
+
+def permute(number):
+    # A Feistel network over 32-bit numbers, keyed by SECRET_KEY. It is a bijection; 'cycle
+    # walking' (permuting again until the result fits) keeps it one on [0, CODE_SPACE).
+    if not 0 <= number < CODE_SPACE:
+        raise ValueError("Every join code has been handed out")
+    while True:
+        left, right = number >> 16, number & 0xFFFF
+        for n in range(FEISTEL_ROUNDS):
+            left, right = right, left ^ _round(n, right)
+        number = (left << 16) | right
+        if number < CODE_SPACE:
+            return number
+
+
+def encode(number):
+    chars = []
+    for _ in range(CODE_LENGTH):
+        number, digit = divmod(number, len(ALPHABET))
+        chars.append(ALPHABET[digit])
+    return ''.join(reversed(chars))
+
+
+def allocate_join_codes(count=1):
+    codes = [encode(permute(number)) for number in take_numbers('join_code', count)]
+    # Random codes from before the allocator (or from under another SECRET_KEY) may still be
+    # taken: skip those numbers. One indexed lookup; a clash is a one in a million event.
+    taken = set(Server.objects.filter(join_code__in=codes).values_list('join_code', flat=True))
+    if taken:
+        codes = [code for code in codes if code not in taken] + allocate_join_codes(len(taken))
+    return codes
+
+
+# --- 2. Resolution Cache ---
+def _code_key(code):
+    return f"api:join-code:{code}"
+
+
+def normalize_code(code):
+    # Codes are shown in upper case; people type them in any case
+    code = code.strip().upper() if isinstance(code, str) else ''
+    return code if CODE_PATTERN.fullmatch(code) else None
+
+
+def remember_join_code(server):
+    cache.set(_code_key(server.join_code), (str(server.pk), server.name), timeout=settings.JOIN_CODE_CACHE_TIMEOUT)
+
+
+def forget_join_code(server):
+    cache.delete(_code_key(server.join_code))
+
+
+def _cache_entry(row):
+    # '' marks an invalid code: None would read as a miss
+    if row is None:
+        return '', settings.JOIN_CODE_NEGATIVE_CACHE_TIMEOUT
+    return (str(row[0]), row[1]), settings.JOIN_CODE_CACHE_TIMEOUT
+
+
+def resolve_join_code(code):
+    """(server id, server name) for a join code, or None when no server has it."""
+    code = normalize_code(code)
+    if code is None:
+        return None  # Malformed: not worth a cache entry
+    key = _code_key(code)
+    found = cache.get(key)
+    if found is None:
+        row = Server.objects.filter(join_code=code).values_list('id', 'name').first()
+        found, timeout = _cache_entry(row)
+        cache.set(key, found, timeout=timeout)
+    return found or None
+
+
+async def aresolve_join_code(code):
+    code = normalize_code(code)
+    if code is None:
+        return None
+    key = _code_key(code)
+    found = await cache.aget(key)
+    if found is None:
+        row = await Server.objects.filter(join_code=code).values_list('id', 'name').afirst()
+        found, timeout = _cache_entry(row)
+        await cache.aset(key, found, timeout=timeout)
+    return found or None
+
+
+# --- 3. Joining ---
+def add_member(server_id, user_id):
+    """Makes the user a member with a single INSERT. False if they already were one."""
+    member = ServerMember(server_id=server_id, user_id=user_id, joined_at=timezone.now())
+    fields = [ServerMember._meta.get_field(name) for name in ('id', 'server', 'user', 'joined_at')]
+    server_column, user_column = fields[1].column, fields[2].column
+    with connection.cursor() as cursor:
+        # A racing second join (double tap, two devices) hits the unique index and inserts nothing
+        cursor.execute(
+            f"INSERT INTO {ServerMember._meta.db_table} ({', '.join(field.column for field in fields)}) "
+            f"VALUES (%s, %s, %s, %s) ON CONFLICT ({server_column}, {user_column}) DO NOTHING RETURNING {fields[0].column}",
+            [field.get_db_prep_save(getattr(member, field.attname), connection) for field in fields],
+        )
+        created = cursor.fetchone() is not None
+    if created:
+        # What save() would have sent: the server list and access caches are dropped on it
+        member._state.adding, member._state.db = False, connection.alias
+        post_save.send(sender=ServerMember, instance=member, created=True, update_fields=None, raw=False, using=connection.alias)
+    return created
@@ -0,0 +1,114 @@
+import http.client
+import re
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+
+# --- 1. Stats ---
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, statuses, elapsed, concurrency, queries=()):
+    latencies = sorted(latencies)
+    ms = lambda seconds: round(seconds * 1000, 2) if seconds is not None else None
+    queries = sorted(queries)
+    return {
+        'requests': len(latencies),
+        'concurrency': concurrency,
+        'errors': sum(count for code, count in statuses.items() if not 200 <= code < 400),
+        'status_codes': dict(statuses),
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'p50_ms': ms(percentile(latencies, 50)),
+        'p95_ms': ms(percentile(latencies, 95)),
+        'p99_ms': ms(percentile(latencies, 99)),
+        'max_ms': ms(latencies[-1] if latencies else None),
+        # From the Server-Timing header, when the target sends one
+        'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+        'queries_p95': percentile(queries, 95),
+    }
+
+
+def queries_from_server_timing(header):
+    match = re.search(r'desc="(\d+) queries"', header or '')
+    return int(match.group(1)) if match else None
+
+
+# --- 2. Driving Load ---
+def run_load(send, total, concurrency):
+    """
+    Calls `send()` `total` times from `concurrency` threads. `send` returns an HTTP status code,
+    or (status code, queries run). Returns latency percentiles, throughput and status counts.
+    """
+    latencies, statuses, queries = [], Counter(), []
+    lock = threading.Lock()
+    remaining = iter(range(total))
+
+    def worker():
+        while True:
+            with lock:
+                if next(remaining, None) is None:
+                    return
+            started = time.perf_counter()
+            try:
+                result = send()
+            except Exception:
+                result = 599  # Connection errors count as failures, not crashes
+            took = time.perf_counter() - started
+            code, query_count = result if isinstance(result, tuple) else (result, None)
+            with lock:
+                latencies.append(took)
+                statuses[code] += 1
+                if query_count is not None:
+                    queries.append(query_count)
+
+    began = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    return summarize(latencies, statuses, time.perf_counter() - began, concurrency, queries)
+
+
+def http_client(base_url):
+    """
+    Returns request(method, path, body=None, headers=None, read_body=True) -> (status, queries),
+    with one keep-alive connection per load thread, like a real client.
+    """
+    parts = urlsplit(base_url)
+    connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+    local = threading.local()
+
+    def request(method, path, body=None, headers=None, read_body=True):
+        if getattr(local, 'connection', None) is None:
+            local.connection = connection_class(parts.netloc, timeout=30)
+        try:
+            local.connection.request(method, parts.path.rstrip('/') + path, body=body, headers=headers or {})
+            response = local.connection.getresponse()
+            queries = queries_from_server_timing(response.getheader('Server-Timing'))
+            if read_body:
+                response.read()
+            else:
+                # Long-lived streams: time to the headers, then hang up
+                local.connection.close()
+                local.connection = None
+            return response.status, queries
+        except (http.client.HTTPException, OSError):
+            local.connection.close()
+            local.connection = None
+            raise
+
+    return request
+
+
+def http_sender(url, headers=None, method='GET', body=None):
+    # The same request over and over
+    parts = urlsplit(url)
+    request = http_client(f"{parts.scheme}://{parts.netloc}")
+    path = parts.path + (f"?{parts.query}" if parts.query else '')
+    return lambda: request(method, path, body=body, headers=headers)
@@ -0,0 +1,270 @@
+import itertools
+import json
+import subprocess
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, override_settings
+from django.test.client import encode_multipart
+from django.urls import reverse
+from django.utils import timezone
+
+from api.campus import BENCH_PASSWORD, BENCH_PREFIX, campus_exists, seed_campus
+from api.loadgen import http_client, queries_from_server_timing, run_load
+from api.models import User, Server, ServerMember, Unit, Resource, UploadSession, AssignmentGroup, GroupMember
+from api.serializers import TaskTideTokenObtainPairSerializer
+from api.sync import encode_token
+from api.urls import urlpatterns
+
+BOUNDARY = 'BenchBoundary'
+UPLOAD_CONTENT = b'%PDF-1.4\nbench upload\n'
+
+
+# --- 1. Scenarios ---
+def build_scenarios(fixtures):
+    """
+    One scenario per URL and method: (label, url name, who, build(i) -> (method, path, body, content type)).
+    `who` picks the caller: 'student', 'rep', 'admin', 'metrics' or None (anonymous).
+    """
+    f, run = fixtures, int(time.time())
+
+    def get(path):
+        return lambda i: ('GET', path, None, None)
+
+    def post(path, data):
+        return lambda i: ('POST', path, json.dumps(data(i)), 'application/json')
+
+    server_q, unit_q = f"?server_id={f['server'].pk}", f"?unit_id={f['unit'].pk}"
+    return [
+        ('register', 'register', None, post(reverse('register'), lambda i: {
+            'username': f'{BENCH_PREFIX}new-{run}-{i}', 'password': f'Bench-{run}-{i}!', 'role': 'STUDENT',
+        })),
+        ('register-bulk', 'register-bulk', 'admin', post(reverse('register-bulk'), lambda i: {'users': [
+            {'username': f'{BENCH_PREFIX}bulk-{run}-{i}-{k}'} for k in range(10)
+        ]})),
+        ('login', 'token_obtain_pair', None, post(reverse('token_obtain_pair'), lambda i: {
+            'username': f['student'].username, 'password': BENCH_PASSWORD,
+        })),
+        ('token-refresh', 'token_refresh', None, post(reverse('token_refresh'), lambda i: {'refresh': f['refresh']})),
+        ('server-list', 'server-list-create', 'student', get(reverse('server-list-create'))),
+        ('server-create', 'server-list-create', 'rep', post(reverse('server-list-create'), lambda i: {
+            'name': f'{BENCH_PREFIX}New Class {run}-{i}',
+        })),
+        ('join-server', 'join-server', 'student', post(reverse('join-server'), lambda i: {
+            'join_code': f['other_server'].join_code,
+        })),
+        ('roster-import', 'roster-import', 'rep', post(reverse('roster-import', args=[f['server'].pk]), lambda i: {
+            'registration_numbers': f['registration_numbers'],
+        })),
+        ('server-events', 'server-events', 'student', get(reverse('server-events', args=[f['server'].pk]))),
+        ('unit-list', 'unit-list-create', 'student', get(reverse('unit-list-create') + server_q)),
+        ('unit-create', 'unit-list-create', 'rep', post(reverse('unit-list-create'), lambda i: {
+            'server': str(f['server'].pk), 'name': f'Bench Unit {i}', 'code': f'B{i}',
+        })),
+        ('resource-list', 'resource-list-create', 'student', get(reverse('resource-list-create') + unit_q)),
+        ('resource-upload', 'resource-list-create', 'rep', lambda i: ('POST', reverse('resource-list-create'), encode_multipart(
+            BOUNDARY, {'unit': str(f['unit'].pk), 'title': f'Upload {i}', 'file': SimpleUploadedFile('bench.pdf', UPLOAD_CONTENT)}
+        ), f'multipart/form-data; boundary={BOUNDARY}')),
+        ('resource-search', 'resource-search', 'student', get(
+            reverse('resource-search', args=[f['server'].pk]) + '?q=lecture+1'
+        )),
+        ('resource-download', 'resource-download', 'student', get(reverse('resource-download', args=[f['resource'].pk]))),
+        ('upload-create', 'upload-create', 'rep', post(reverse('upload-create'), lambda i: {
+            'unit': str(f['unit'].pk), 'title': f'Chunked {i}', 'filename': 'notes.pdf', 'size': 1024,
+        })),
+        ('upload-status', 'upload-detail', 'rep', get(reverse('upload-detail', args=[f['upload_session'].pk]))),
+        ('group-list', 'group-list-create', 'student', get(reverse('group-list-create') + unit_q)),
+        ('group-create', 'group-list-create', 'rep', post(reverse('group-list-create'), lambda i: {
+            'unit': str(f['unit'].pk), 'name': f'Bench Group {i}', 'max_members': 5,
+        })),
+        ('join-group', 'join-group', 'student', post(reverse('join-group', args=[f['group'].pk]), lambda i: {})),
+        ('generate-groups', 'generate-groups', 'rep', post(reverse('generate-groups', args=[f['unit'].pk]), lambda i: {
+            'group_size': 5,
+        })),
+        ('sync-full', 'sync', 'student', get(reverse('sync'))),
+        ('sync-warm', 'sync', 'student', get(reverse('sync') + f"?since={f['since']}")),
+        ('dashboard', 'dashboard', 'student', get(reverse('dashboard'))),
+        ('dashboard-trimmed', 'dashboard', 'student', get(reverse('dashboard') + '?fields=id,name,units.id,units.code')),
+        ('async-server-list', 'async-server-list', 'student', get(reverse('async-server-list'))),
+        ('async-join-server', 'async-join-server', 'student', post(reverse('async-join-server'), lambda i: {
+            'join_code': f['other_server'].join_code,
+        })),
+        ('async-unit-list', 'async-unit-list', 'student', get(reverse('async-unit-list') + server_q)),
+        ('async-resource-list', 'async-resource-list', 'student', get(reverse('async-resource-list') + unit_q)),
+        ('async-group-list', 'async-group-list', 'student', get(reverse('async-group-list') + unit_q)),
+        ('cache-stats', 'cache-stats', 'admin', get(reverse('cache-stats'))),
+        ('metrics', 'metrics', 'metrics', get(reverse('metrics'))),
+    ]
+
+
+def load_fixtures():
+    # A student in a class with units, resources and a group with a free seat, and that class's rep
+    student = User.objects.filter(username__startswith=f'{BENCH_PREFIX}student-').order_by('username').first()
+    # Seeded rows only: earlier runs' write scenarios leave empty servers and units behind
+    membership = ServerMember.objects.filter(user=student, server__name__startswith=f'{BENCH_PREFIX}Class ') \
+        .select_related('server__created_by').order_by('server__name').first()
+    server = membership.server
+    unit = Unit.objects.filter(server=server, code='U000').first()
+    rep, admin = server.created_by, User.objects.get(username=f'{BENCH_PREFIX}admin')
+    tokens = {who: TaskTideTokenObtainPairSerializer.get_token(user) for who, user in
+              (('student', student), ('rep', rep), ('admin', admin))}
+    return {
+        'student': student,
+        'server': server,
+        'other_server': Server.objects.filter(name__startswith=f'{BENCH_PREFIX}Class ')
+                        .exclude(members__user=student).first() or server,
+        'unit': unit,
+        'resource': Resource.objects.filter(unit=unit).first(),
+        'group': AssignmentGroup.objects.filter(unit=unit).exclude(members__user=student).first()
+                 or AssignmentGroup.objects.filter(unit=unit).first(),
+        'upload_session': UploadSession.objects.create(
+            unit=unit, uploaded_by=rep, title='Bench', filename='bench.pdf', size=1024
+        ),
+        'registration_numbers': list(
+            User.objects.filter(registration_number__startswith='BENCH/').values_list('registration_number', flat=True)[:20]
+        ),
+        'since': encode_token(timezone.now() - timedelta(hours=1)),
+        'refresh': str(tokens['student']),
+        'auth': {who: f'Bearer {token.access_token}' for who, token in tokens.items()},
+        'admin': admin,
+    }
+
+
+# --- 2. Senders ---
+def client_sender(fixtures, who, build):
+    # In-process: the Django test client, one per load thread (each thread gets its own DB connection)
+    local, counter = threading.local(), itertools.count()
+    headers = {'Authorization': fixtures['auth'][who]} if who in fixtures['auth'] else {}
+
+    def send():
+        if not hasattr(local, 'client'):
+            local.client = Client(raise_request_exception=False)
+            if who == 'metrics':
+                local.client.force_login(fixtures['admin'])
+        method, path, body, content_type = build(next(counter))
+        response = local.client.generic(method, path, data=body or b'', content_type=content_type or '', headers=headers)
+        if response.streaming and '/events/' not in path:
+            response.getvalue()  # Streamed bodies (sync) are built as they are read
+        response.close()  # The change feed never ends: it is timed to its headers
+        return response.status_code, queries_from_server_timing(response.get('Server-Timing'))
+
+    return send
+
+
+def url_sender(base_url, fixtures, who, build):
+    request, counter = http_client(base_url), itertools.count()
+    headers = {'Authorization': fixtures['auth'][who]} if who in fixtures['auth'] else {}
+    if who == 'metrics':
+        headers = {'Authorization': f'Bearer {settings.METRICS_TOKEN}'}
+
+    def send():
+        method, path, body, content_type = build(next(counter))
+        extra = {'Content-Type': content_type} if content_type else {}
+        if isinstance(body, str):
+            body = body.encode()
+        return request(method, path, body=body, headers={**headers, **extra}, read_body='/events/' not in path)
+
+    return send
+
+
+# --- 3. Command ---
+class Command(BaseCommand):
+    help = (
+        "Benchmark every API URL against a synthetic campus and print p50/p95/p99 latency, "
+        "queries per request and throughput as JSON. Seeds thousands of servers and hundreds of "
+        "thousands of rows with --seed, and the write scenarios add rows: use a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', action='store_true', help="Seed the synthetic campus first (once per database)")
+        parser.add_argument('--scale', type=float, default=1.0, help="Campus size multiplier for --seed (1.0 = 2,000 servers)")
+        parser.add_argument('--url', help="Benchmark a running server at this base URL instead of the in-process client")
+        parser.add_argument('--requests', type=int, default=200, help="Requests per scenario")
+        parser.add_argument('--concurrency', type=int, default=4, help="Concurrent clients")
+        parser.add_argument('--only', action='append', help="Run only these scenario labels (repeatable)")
+        parser.add_argument('--read-only', action='store_true', help="Skip scenarios that write")
+        parser.add_argument('--output', help="Also write the JSON report to this file")
+        parser.add_argument('--compare', help="A previous report: print the changes per scenario")
+
+    # In-process runs read queries per request from the Server-Timing header
+    @override_settings(SERVER_TIMING=True)
+    def handle(self, *args, **options):
+        if options['seed']:
+            if campus_exists():
+                self.stderr.write("Campus already seeded, reusing it")
+            else:
+                self.stderr.write(f"Seeding campus at scale {options['scale']}...")
+                self.stderr.write(f"  {seed_campus(options['scale'], log=self.stderr.write)}")
+        elif not campus_exists():
+            raise CommandError("No synthetic campus in this database: run with --seed (on a scratch database)")
+
+        fixtures = load_fixtures()
+        scenarios = build_scenarios(fixtures)
+        covered = {url_name for _, url_name, _, _ in scenarios}
+        missing = [pattern.name for pattern in urlpatterns if pattern.name not in covered]
+        if missing:
+            raise CommandError(f"No benchmark scenario for: {', '.join(missing)}")
+
+        results = {}
+        for label, url_name, who, build in scenarios:
+            method = build(0)[0]
+            if options['only'] and label not in options['only']:
+                continue
+            if options['read_only'] and method != 'GET':
+                continue
+            if who == 'metrics' and options['url'] and not settings.METRICS_TOKEN:
+                results[label] = {'skipped': "set METRICS_TOKEN to benchmark /metrics over HTTP"}
+                continue
+            if options['url']:
+                send = url_sender(options['url'], fixtures, who, build)
+            else:
+                send = client_sender(fixtures, who, build)
+            results[label] = {'url': url_name, 'method': method, **run_load(send, options['requests'], options['concurrency'])}
+            self.stderr.write(
+                f"{label:22} p95 {results[label]['p95_ms']}ms  {results[label]['queries_per_request']} q/req  "
+                f"{results[label]['throughput_rps']} req/s"
+            )
+
+        report = {
+            'commit': self.git_commit(),
+            'target': options['url'] or 'in-process',
+            'requests': options['requests'],
+            'concurrency': options['concurrency'],
+            'dataset': {model.__name__: model.objects.count() for model in (
+                User, Server, ServerMember, Unit, Resource, AssignmentGroup, GroupMember
+            )},
+            'results': results,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as out:
+                out.write(output)
+        if options['compare']:
+            self.compare(options['compare'], results)
+        self.stdout.write(output)
+
+    def git_commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, cwd=settings.BASE_DIR
+            ).stdout.strip() or None
+        except OSError:
+            return None
+
+    def compare(self, path, results):
+        with open(path) as baseline_file:
+            baseline = json.load(baseline_file)
+        self.stderr.write(f"\nvs {baseline.get('commit')}:  p95 ms  |  queries/request  |  req/s")
+        for label, now in results.items():
+            before = baseline['results'].get(label)
+            if not before or 'skipped' in before or 'skipped' in now:
+                continue
+            self.stderr.write(
+                f"{label:22} {before['p95_ms']} -> {now['p95_ms']}  |  "
+                f"{before['queries_per_request']} -> {now['queries_per_request']}  |  "
+                f"{before['throughput_rps']} -> {now['throughput_rps']}"
+            )
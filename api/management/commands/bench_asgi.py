@@ -0,0 +1,57 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.loadgen import http_sender, run_load
+
+# The DRF (sync) path for each endpoint and its async twin. {server} / {unit} are filled from the options.
+ENDPOINTS = {
+    'servers': ('/api/servers/', '/api/async/servers/'),
+    'units': ('/api/units/?server_id={server}', '/api/async/units/?server_id={server}'),
+    'resources': ('/api/resources/?unit_id={unit}', '/api/async/resources/?unit_id={unit}'),
+    'groups': ('/api/groups/?unit_id={unit}', '/api/async/groups/?unit_id={unit}'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the sync list endpoints on a WSGI deployment against their async twins on an "
+        "ASGI deployment (same database, same worker count) and print p50/p95/p99 and throughput as JSON. "
+        "Start both servers first, e.g. gunicorn -w 4 tasktide.wsgi and "
+        "gunicorn -w 4 -k uvicorn.workers.UvicornWorker tasktide.asgi. "
+        "Run them with API_LIST_CACHE_TIMEOUT=0 to compare the database paths rather than the cache."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wsgi-url', required=True, help="Base URL of the WSGI deployment")
+        parser.add_argument('--asgi-url', required=True, help="Base URL of the ASGI deployment")
+        parser.add_argument('--token', required=True, help="JWT access token to send as Bearer")
+        parser.add_argument('--endpoint', choices=sorted(ENDPOINTS), action='append', help="Repeatable (default: all that can be filled)")
+        parser.add_argument('--server-id', help="Server for the units endpoint")
+        parser.add_argument('--unit-id', help="Unit for the resources and groups endpoints")
+        parser.add_argument('--requests', type=int, default=2000, help="Requests per run")
+        parser.add_argument('--concurrency', type=int, default=50, help="Concurrent client connections")
+
+    def handle(self, *args, **options):
+        names = options['endpoint'] or [
+            name for name, (path, _) in ENDPOINTS.items()
+            if ('{server}' not in path or options['server_id']) and ('{unit}' not in path or options['unit_id'])
+        ]
+        headers = {'Authorization': f"Bearer {options['token']}"}
+        results = {}
+
+        for name in names:
+            sync_path, async_path = (
+                path.format(server=options['server_id'], unit=options['unit_id']) for path in ENDPOINTS[name]
+            )
+            if 'None' in sync_path:
+                raise CommandError(f"--endpoint {name} needs --server-id / --unit-id")
+            results[name] = {}
+            for label, base, path in (('wsgi', options['wsgi_url'], sync_path), ('asgi', options['asgi_url'], async_path)):
+                send = http_sender(base.rstrip('/') + path, headers=headers)
+                # A short warm-up so connection setup and first-query costs are not in the numbers
+                run_load(send, min(options['concurrency'], options['requests']), options['concurrency'])
+                results[name][label] = run_load(send, options['requests'], options['concurrency'])
+                self.stderr.write(f"{name} {label}: {results[name][label]['throughput_rps']} req/s")
+
+        self.stdout.write(json.dumps(results, indent=2))
@@ -0,0 +1,64 @@
+import itertools
+import json
+import random
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from api.campus import BENCH_PREFIX, campus_exists
+from api.join_codes import ALPHABET, CODE_LENGTH
+from api.loadgen import queries_from_server_timing, run_load
+from api.models import User, Server, ServerMember
+from api.serializers import TaskTideTokenObtainPairSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Semester start: students joining classes by code, all at once. Every request is another "
+        "student joining a random class, and --invalid of them send a made-up code (their 404s show "
+        "up as errors). Prints latency percentiles, queries per request and joins per second as JSON. "
+        "Needs the synthetic campus from 'manage.py bench --seed', and adds memberships to it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--joins', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--invalid', type=float, default=0.2, help="Share of requests with a made-up code")
+        parser.add_argument('--async', action='store_true', dest='use_async', help="Use /api/async/servers/join/")
+
+    # Queries per request are read from the Server-Timing header
+    @override_settings(SERVER_TIMING=True)
+    def handle(self, *args, **options):
+        if not campus_exists():
+            raise CommandError("No synthetic campus in this database: run 'manage.py bench --seed' first")
+        rng = random.Random(0)
+        students = list(User.objects.filter(username__startswith=f'{BENCH_PREFIX}student-')[:options['joins']])
+        codes = list(Server.objects.filter(name__startswith=f'{BENCH_PREFIX}Class ').values_list('join_code', flat=True))
+        requests = []
+        for i in range(options['joins']):
+            token = TaskTideTokenObtainPairSerializer.get_token(students[i % len(students)]).access_token
+            guess = rng.random() < options['invalid']
+            code = ''.join(rng.choices(ALPHABET, k=CODE_LENGTH)) if guess else rng.choice(codes)
+            requests.append(({'Authorization': f'Bearer {token}'}, json.dumps({'join_code': code})))
+
+        url = reverse('async-join-server' if options['use_async'] else 'join-server')
+        local, counter = threading.local(), itertools.count()
+
+        def send():
+            # One test client per load thread, each with its own DB connection
+            if not hasattr(local, 'client'):
+                local.client = Client(raise_request_exception=False)
+            headers, body = requests[next(counter)]
+            response = local.client.post(url, body, content_type='application/json', headers=headers)
+            return response.status_code, queries_from_server_timing(response.get('Server-Timing'))
+
+        before = ServerMember.objects.count()
+        report = {
+            'url': url,
+            'invalid_share': options['invalid'],
+            **run_load(send, len(requests), options['concurrency']),
+            'memberships_created': ServerMember.objects.count() - before,
+        }
+        self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,52 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, close_old_connections, connection
+
+from api.loadgen import run_load
+
+
+class Command(BaseCommand):
+    help = (
+        "Run short database 'requests' from more threads than Postgres has connections to spare, "
+        "as gunicorn threads do, and print latency percentiles and errors as JSON. Run it once "
+        "with DB_POOL=0 (persistent connections) and once with DB_POOL=1 (pooled) to compare."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=100, help="Concurrent request threads")
+        parser.add_argument('--requests', type=int, default=5000)
+        parser.add_argument('--hold-ms', type=float, default=5, help="Time each request holds its connection")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("Needs Postgres: point DATABASE_URL at a local server")
+        pool = connection.pool
+        with connection.cursor() as cursor:
+            cursor.execute("SHOW max_connections")
+            max_connections = int(cursor.fetchone()[0])
+        close_old_connections()
+        hold = options['hold_ms'] / 1000
+
+        def send():
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT pg_sleep(%s)", [hold])
+                return 200
+            except DatabaseError:
+                # 'too many clients' without a pool, a checkout timeout with one
+                return 503
+            finally:
+                # What Django does at the end of every request: a persistent connection stays
+                # with its thread, a pooled one goes back to the pool
+                close_old_connections()
+
+        report = {
+            'mode': 'pool' if pool else 'persistent',
+            'max_connections': max_connections,
+            'pool': connection.settings_dict['OPTIONS'].get('pool') if pool else None,
+            **run_load(send, options['requests'], options['threads']),
+        }
+        if pool:
+            report['pool_stats'] = pool.get_stats()
+        self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,63 @@
+import json
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from api.loadgen import percentile
+from api.models import Resource
+from api.readers import reader_for
+from api.renderers import OrjsonRenderer, stream_json
+from api.serializers import ResourceSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Time a big resource list through ResourceSerializer + JSONRenderer (the old read path) "
+        "against .values() rows + orjson, and the streamed version. Prints median/p95 ms and peak "
+        "memory per path as JSON. Needs resources in the database (e.g. 'manage.py bench --seed')."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000, help="Resources per list")
+        parser.add_argument('--repeat', type=int, default=20, help="Timed runs per path")
+
+    def handle(self, *args, **options):
+        queryset = Resource.objects.order_by('-uploaded_at', '-id')[:options['rows']]
+        rows = queryset.count()
+        if not rows:
+            raise CommandError("No resources to list: seed a campus first with 'manage.py bench --seed'")
+        context = {'request': APIRequestFactory().get('/api/resources/')}
+        reader = reader_for(ResourceSerializer)
+
+        paths = {
+            'serializer+json': lambda: JSONRenderer().render(
+                ResourceSerializer(queryset.select_related('uploaded_by', 'blob'), many=True, context=context).data
+            ),
+            'values+json': lambda: JSONRenderer().render(reader.rows(reader.values(queryset), context)),
+            'values+orjson': lambda: OrjsonRenderer().render(reader.rows(reader.values(queryset), context)),
+            'streamed': lambda: sum(len(part) for part in stream_json({'results': reader.iter_rows(queryset, context)})),
+        }
+        results = {'rows': rows}
+        for label, run in paths.items():
+            run()  # Warm-up: compiled mappers, connection, query plan
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                run()
+                timings.append(time.perf_counter() - started)
+            timings.sort()
+            # Peak memory of one more run: what a worker must hold to answer the request
+            tracemalloc.start()
+            run()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            results[label] = {
+                'median_ms': round(percentile(timings, 50) * 1000, 2),
+                'p95_ms': round(percentile(timings, 95) * 1000, 2),
+                'peak_kib': peak // 1024,
+            }
+            self.stderr.write(f"{label:16} {results[label]['median_ms']}ms  peak {results[label]['peak_kib']} KiB")
+        self.stdout.write(json.dumps(results, indent=2))
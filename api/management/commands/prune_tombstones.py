@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from api.sync import TOMBSTONE_RETENTION, prune_tombstones
+
+
+class Command(BaseCommand):
+    help = (
+        f"Delete delta-sync tombstones older than {TOMBSTONE_RETENTION.days} days. "
+        "Clients with an older sync token get a full sync instead. Run it daily from cron."
+    )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS(f"{prune_tombstones()} tombstones pruned"))
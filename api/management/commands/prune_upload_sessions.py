@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.uploads import prune_upload_sessions
+
+
+class Command(BaseCommand):
+    help = (
+        f"Delete resumable uploads that got no chunk for {settings.UPLOAD_SESSION_TTL} seconds, "
+        "with their part files. Run it hourly from cron."
+    )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS(f"{prune_upload_sessions()} upload sessions pruned"))
@@ -0,0 +1,33 @@
+import signal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.jobs import HANDLERS, Worker, run_pending
+
+
+class Command(BaseCommand):
+    help = (
+        "Run background jobs (post-upload resource processing, ...) from the database queue. "
+        "Start one or more next to the web workers; SIGTERM lets running jobs finish first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=2, help="Jobs run at once by this process")
+        parser.add_argument('--kind', action='append', choices=sorted(HANDLERS),
+                            help="Only run jobs of this kind (repeatable)")
+        parser.add_argument('--once', action='store_true', help="Run every due job, then exit (for cron)")
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1:
+            raise CommandError("--concurrency must be at least 1")
+        if options['once']:
+            ran = run_pending(kinds=options['kind'])
+            self.stdout.write(self.style.SUCCESS(f"{ran} jobs run"))
+            return
+
+        worker = Worker(concurrency=options['concurrency'], kinds=options['kind'])
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *_: worker.stop())
+        self.stdout.write(f"Worker {worker.name} running {options['concurrency']} jobs at a time")
+        worker.run()
+        self.stdout.write("Worker stopped")
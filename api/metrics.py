@@ -0,0 +1,275 @@
+import atexit
+import fcntl
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('api.performance')
+
+# Per-view request metrics in the Prometheus text format, for /metrics. Each worker process
+# aggregates in memory and writes its totals to its own file in METRICS_DIR about once a
+# second, and once more when it exits; a scrape (served by any worker) adds up every file.
+# A scrape folds the files of exited workers into one, so counters never go backwards and the
+# directory does not grow with every restart. Gauges are a snapshot, so only files of processes
+# still running count towards them.
+
+# Upper bounds of the histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+JOB_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+HISTOGRAMS = {
+    'tasktide_request_duration_seconds': ("Total time in Django per request", DURATION_BUCKETS),
+    'tasktide_request_db_seconds': ("Time spent in database queries per request", DURATION_BUCKETS),
+    'tasktide_request_serialize_seconds': ("Time spent rendering the response body per request", DURATION_BUCKETS),
+    'tasktide_request_queries': ("Database queries per request", QUERY_BUCKETS),
+    # Background jobs (api/jobs.py), written by 'manage.py runworker' processes
+    'tasktide_job_wait_seconds': ("Time from a job falling due to a worker starting it", JOB_BUCKETS),
+    'tasktide_job_duration_seconds': ("Time spent running a job", JOB_BUCKETS),
+}
+COUNTERS = {
+    'tasktide_requests_total': "Requests by view, method and status class",
+    'tasktide_jobs_total': "Job attempts by kind and outcome (done, retried, failed)",
+    # Postgres connection pools (DB_POOL=1). Mean wait: rate(wait_seconds) / rate(requests_queued)
+    'tasktide_db_pool_requests_total': "Connections handed out by the pool",
+    'tasktide_db_pool_requests_queued_total': "Connection requests that had to wait for a free connection",
+    'tasktide_db_pool_wait_seconds_total': "Time spent waiting for a free connection",
+    'tasktide_db_pool_timeouts_total': "Connection requests that gave up after DB_POOL_TIMEOUT",
+    'tasktide_db_pool_connections_lost_total': "Connections dropped by the health check before use",
+    'tasktide_db_pool_connection_errors_total': "Failed attempts to open a new connection",
+}
+GAUGES = {
+    'tasktide_db_pool_size': "Connections open in the pool, in use or idle",
+    'tasktide_db_pool_available': "Idle connections ready in the pool",
+    'tasktide_db_pool_max': "Most connections the pool may open (DB_POOL_MAX_SIZE)",
+    'tasktide_db_pool_waiting': "Connection requests waiting right now",
+}
+
+
+# --- 1. Per-Process Registry ---
+class Registry:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _for_this_process(self):
+        # A forked worker starts from zero under its own file, not with its parent's numbers
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._filename = f"{self._pid}-{uuid.uuid4().hex[:8]}.json"
+            self._histograms = {}
+            self._counters = {}
+            self._gauges = {}
+            self._flushed_at = 0
+
+    def observe(self, name, labels, value):
+        buckets = HISTOGRAMS[name][1]
+        with self._lock:
+            self._for_this_process()
+            key = json.dumps([name, labels], sort_keys=True)
+            # Per-bucket counts (not cumulative), then +Inf, sum
+            series = self._histograms.setdefault(key, [0] * (len(buckets) + 1) + [0.0])
+            index = next((i for i, bound in enumerate(buckets) if value <= bound), len(buckets))
+            series[index] += 1
+            series[-1] += value
+
+    def inc(self, name, labels, amount=1):
+        with self._lock:
+            self._for_this_process()
+            key = json.dumps([name, labels], sort_keys=True)
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def set(self, name, labels, value):
+        with self._lock:
+            self._for_this_process()
+            self._gauges[json.dumps([name, labels], sort_keys=True)] = value
+
+    def flush(self, force=False):
+        with self._lock:
+            self._for_this_process()
+            if not force and time.monotonic() - self._flushed_at < settings.METRICS_FLUSH_SECONDS:
+                return
+            self._flushed_at = time.monotonic()
+        collect_pool_stats()
+        with self._lock:
+            data = {'histograms': self._histograms, 'counters': self._counters, 'gauges': self._gauges}
+            path = os.path.join(settings.METRICS_DIR, self._filename)
+            # Write then rename, so a scrape never reads half a file. Metrics never fail a request.
+            try:
+                os.makedirs(settings.METRICS_DIR, exist_ok=True)
+                with open(f"{path}.tmp", 'w') as out:
+                    json.dump(data, out)
+                os.replace(f"{path}.tmp", path)
+            except OSError as exc:
+                logger.warning("Cannot write metrics to %s: %s", path, exc)
+
+
+registry = Registry()
+
+
+@atexit.register
+def _flush_on_exit():
+    # The last second of a worker's requests would otherwise be lost. A forked worker inherits
+    # this hook, but only the process that recorded something has anything to write.
+    if registry._pid == os.getpid():
+        registry.flush(force=True)
+
+
+# --- 2. Connection Pool Stats ---
+# psycopg_pool counts requests, waits and errors since the last pop_stats(), so every flush adds
+# exactly what happened since the one before
+POOL_COUNTERS = {
+    'requests_num': 'tasktide_db_pool_requests_total',
+    'requests_queued': 'tasktide_db_pool_requests_queued_total',
+    'requests_errors': 'tasktide_db_pool_timeouts_total',
+    'connections_lost': 'tasktide_db_pool_connections_lost_total',
+    'connections_errors': 'tasktide_db_pool_connection_errors_total',
+}
+POOL_GAUGES = {
+    'pool_size': 'tasktide_db_pool_size',
+    'pool_available': 'tasktide_db_pool_available',
+    'pool_max': 'tasktide_db_pool_max',
+    'requests_waiting': 'tasktide_db_pool_waiting',
+}
+
+
+def pooled_databases():
+    for alias in connections:
+        if connections[alias].settings_dict.get('OPTIONS', {}).get('pool'):
+            yield alias, connections[alias].pool
+
+
+def collect_pool_stats():
+    for alias, pool in pooled_databases():
+        stats = pool.pop_stats()
+        labels = {'database': alias}
+        for stat, name in POOL_GAUGES.items():
+            registry.set(name, labels, stats.get(stat, 0))
+        for stat, name in POOL_COUNTERS.items():
+            if stats.get(stat):
+                registry.inc(name, labels, stats[stat])
+        if stats.get('requests_wait_ms'):
+            registry.inc('tasktide_db_pool_wait_seconds_total', labels, stats['requests_wait_ms'] / 1000)
+
+
+# --- 3. Exposition ---
+# Totals of exited workers, in METRICS_DIR
+RETIRED = 'retired.json'
+
+
+def _running(path):
+    # Files are named '<pid>-<random>.json' (see Registry._for_this_process)
+    try:
+        os.kill(int(os.path.basename(path).split('-', 1)[0]), 0)
+    except (ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        pass  # Alive, but someone else's
+    return True
+
+
+def _read(path):
+    try:
+        with open(path) as source:
+            return json.load(source)
+    except (OSError, ValueError):
+        return None
+
+
+def _add(histograms, counters, data):
+    for key, series in data['histograms'].items():
+        total = histograms.setdefault(key, [0] * len(series))
+        histograms[key] = [a + b for a, b in zip(total, series)]
+    for key, value in data['counters'].items():
+        counters[key] = counters.get(key, 0) + value
+
+
+def _retire(dead):
+    # Adds the totals of exited workers to 'retired.json' and deletes their files. The lock keeps
+    # two scrapes from adding the same file twice; 'merged' does if we die before deleting it.
+    retired_path = os.path.join(settings.METRICS_DIR, RETIRED)
+    with open(os.path.join(settings.METRICS_DIR, 'retired.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        retired = _read(retired_path) or {'histograms': {}, 'counters': {}, 'merged': []}
+        merged = [name for name in retired['merged'] if os.path.exists(os.path.join(settings.METRICS_DIR, name))]
+        for path in dead:
+            data = _read(path)
+            if data is None or os.path.basename(path) in merged:
+                continue
+            _add(retired['histograms'], retired['counters'], data)
+            merged.append(os.path.basename(path))
+        retired['merged'] = merged
+        with open(f"{retired_path}.tmp", 'w') as out:
+            json.dump(retired, out)
+        os.replace(f"{retired_path}.tmp", retired_path)
+        for path in dead:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def _collect():
+    registry.flush(force=True)
+    paths = [path for path in glob.glob(os.path.join(settings.METRICS_DIR, '*.json'))
+             if os.path.basename(path) != RETIRED]
+    dead = [path for path in paths if not _running(path)]
+    if dead:
+        try:
+            _retire(dead)
+        except OSError as exc:
+            logger.warning("Cannot fold exited workers' metrics into %s: %s", RETIRED, exc)
+
+    histograms, counters, gauges = {}, {}, {}
+    for path in glob.glob(os.path.join(settings.METRICS_DIR, '*.json')):
+        data = _read(path)
+        if data is None:
+            continue
+        _add(histograms, counters, data)
+        if os.path.basename(path) != RETIRED and _running(path):
+            for key, value in data.get('gauges', {}).items():
+                gauges[key] = gauges.get(key, 0) + value
+    return histograms, counters, gauges
+
+
+def _labels(labels, **extra):
+    labels = {**labels, **extra}
+    return ','.join(f'{key}="{value}"' for key, value in sorted(labels.items()))
+
+
+def render_metrics():
+    histograms, counters, gauges = _collect()
+    lines = []
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for key in sorted(histograms):
+            series_name, labels = json.loads(key)
+            if series_name != name:
+                continue
+            series, cumulative = histograms[key], 0
+            for bound, count in zip((*buckets, '+Inf'), series):
+                cumulative += count
+                lines.append(f"{name}_bucket{{{_labels(labels, le=bound)}}} {cumulative}")
+            lines.append(f"{name}_sum{{{_labels(labels)}}} {series[-1]}")
+            lines.append(f"{name}_count{{{_labels(labels)}}} {cumulative}")
+    for name, help_text in COUNTERS.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        for key in sorted(counters):
+            series_name, labels = json.loads(key)
+            if series_name == name:
+                lines.append(f"{name}{{{_labels(labels)}}} {counters[key]}")
+    for name, help_text in GAUGES.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+        for key in sorted(gauges):
+            series_name, labels = json.loads(key)
+            if series_name == name:
+                lines.append(f"{name}{{{_labels(labels)}}} {gauges[key]}")
+    return '\n'.join(lines) + '\n'
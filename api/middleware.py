@@ -0,0 +1,163 @@
+import logging
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+
+from .metrics import registry
+from .routers import pin_to_primary
+
+logger = logging.getLogger('api.performance')
+
+# The stats of the request being handled, for code outside the middleware (see api/renderers.py)
+current_request_stats = ContextVar('current_request_stats', default=None)
+
+
+# --- 1. Per-Request Stats ---
+class RequestStats:
+    # Installed as a DB execute wrapper, so it sees every query on every connection
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.db_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            took = time.perf_counter() - started
+            self.query_count += 1
+            self.db_seconds += took
+            # SQL text only (no parameters) for the slow request log
+            if len(self.queries) < settings.SLOW_REQUEST_MAX_QUERIES:
+                self.queries.append((took, sql))
+
+    def install(self):
+        for connection in connections.all():
+            connection.execute_wrappers.append(self)
+
+    def uninstall(self):
+        for connection in connections.all():
+            if self in connection.execute_wrappers:
+                connection.execute_wrappers.remove(self)
+
+
+# --- 2. Middleware ---
+class RequestTimingMiddleware:
+    """
+    Times every request: queries, DB time, response rendering and total. Adds a Server-Timing
+    header (visible in the browser's network panel), logs slow requests with their SQL,
+    and feeds the per-view histograms behind /metrics.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        stats.install()
+        try:
+            response = self.get_response(request)
+        finally:
+            stats.uninstall()
+            current_request_stats.reset(token)
+        return self.finish(request, response, stats)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        # The async ORM runs queries in the request's sync thread, whose connections are its own
+        await sync_to_async(stats.install)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stats.uninstall)()
+            current_request_stats.reset(token)
+        return self.finish(request, response, stats)
+
+    def finish(self, request, response, stats):
+        total = time.perf_counter() - stats.started
+        match = request.resolver_match
+        view = (match.url_name or match.route) if match else 'unmatched'
+
+        registry.inc('tasktide_requests_total', {
+            'view': view, 'method': request.method, 'status': f"{response.status_code // 100}xx",
+        })
+        labels = {'view': view}
+        registry.observe('tasktide_request_duration_seconds', labels, total)
+        registry.observe('tasktide_request_db_seconds', labels, stats.db_seconds)
+        registry.observe('tasktide_request_serialize_seconds', labels, stats.serialize_seconds)
+        registry.observe('tasktide_request_queries', labels, stats.query_count)
+        registry.flush()
+
+        if settings.SERVER_TIMING:
+            app = max(total - stats.db_seconds - stats.serialize_seconds, 0)
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.query_count} queries"',
+                f'serialize;dur={stats.serialize_seconds * 1000:.1f}',
+                f'app;dur={app * 1000:.1f}',
+                f'total;dur={total * 1000:.1f}',
+            ])
+
+        if total * 1000 >= settings.SLOW_REQUEST_MS:
+            slowest = sorted(stats.queries, key=lambda query: query[0], reverse=True)
+            logger.warning(
+                "Slow request %s %s (%s): %.0fms total, %d queries in %.0fms\n%s",
+                request.method, request.path, view, total * 1000, stats.query_count, stats.db_seconds * 1000,
+                '\n'.join(f"  {took * 1000:.1f}ms  {sql}" for took, sql in slowest),
+            )
+        return response
+
+
+# --- 3. Read-Your-Writes for Read Replicas (see api/routers.py) ---
+class ReadYourWritesMiddleware:
+    """
+    After a successful write, reads the user's lists from the primary for a few seconds,
+    so a replica that has not caught up yet can't hide their own join or upload.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        if self.wrote(request, response):
+            self.pin(request)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if self.wrote(request, response):
+            # request.user may be a lazy object that still has to query the session
+            await sync_to_async(self.pin)(request)
+        return response
+
+    def wrote(self, request, response):
+        return bool(settings.DATABASE_REPLICAS) and request.method not in SAFE_METHODS and response.status_code < 400
+
+    def pin(self, request):
+        # DRF copies the user it authenticated (JWT included) onto the Django request
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            pin_to_primary(user.pk)
+
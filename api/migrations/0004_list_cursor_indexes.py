@@ -0,0 +1,25 @@
+# Generated by Django 6.0 on 2026-10-18 10:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_user_registration_number_alter_user_role_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='assignmentgroup',
+            index=models.Index(fields=['unit', 'created_at', 'id'], name='group_unit_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='resource',
+            index=models.Index(fields=['unit', 'uploaded_at', 'id'], name='resource_unit_uploaded_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='unit',
+            index=models.Index(fields=['server', 'created_at', 'id'], name='unit_server_created_idx'),
+        ),
+    ]
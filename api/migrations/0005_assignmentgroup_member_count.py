@@ -0,0 +1,28 @@
+# Generated by Django 6.0 on 2026-10-18 10:08
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_member_count(apps, schema_editor):
+    AssignmentGroup = apps.get_model('api', 'AssignmentGroup')
+    GroupMember = apps.get_model('api', 'GroupMember')
+    counts = GroupMember.objects.filter(group=OuterRef('pk')).values('group').annotate(total=Count('pk')).values('total')
+    AssignmentGroup.objects.update(member_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_list_cursor_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assignmentgroup',
+            name='member_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_member_count, migrations.RunPython.noop),
+    ]
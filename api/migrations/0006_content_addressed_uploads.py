@@ -0,0 +1,49 @@
+# Generated by Django 6.0 on 2026-10-18 10:12
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_assignmentgroup_member_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Blob',
+            fields=[
+                ('sha256', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('file', models.FileField(max_length=255, upload_to='')),
+                ('size', models.BigIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='resource',
+            name='file',
+            field=models.FileField(max_length=255, upload_to='resources/'),
+        ),
+        migrations.AddField(
+            model_name='resource',
+            name='blob',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='resources', to='api.blob'),
+        ),
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=200)),
+                ('resource_type', models.CharField(choices=[('DOCUMENT', 'Document'), ('ASSIGNMENT', 'Assignment'), ('PAST_PAPER', 'Past Paper')], default='DOCUMENT', max_length=50)),
+                ('filename', models.CharField(max_length=255)),
+                ('size', models.BigIntegerField()),
+                ('offset', models.BigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('unit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to='api.unit')),
+                ('uploaded_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 6.0 on 2026-10-18 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_content_addressed_uploads'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('server', 'Server'), ('unit', 'Unit'), ('resource', 'Resource'), ('group', 'Group'), ('group_member', 'Group Member')], max_length=20)),
+                ('object_id', models.UUIDField()),
+                ('server_id', models.UUIDField()),
+                ('user_id', models.UUIDField(blank=True, null=True)),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='assignmentgroup',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='groupmember',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='resource',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='server',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='unit',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='assignmentgroup',
+            index=models.Index(fields=['unit', 'updated_at'], name='group_unit_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='groupmember',
+            index=models.Index(fields=['group', 'updated_at'], name='groupmember_group_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='resource',
+            index=models.Index(fields=['unit', 'updated_at'], name='resource_unit_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='unit',
+            index=models.Index(fields=['server', 'updated_at'], name='unit_server_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['server_id', 'deleted_at'], name='tombstone_server_deleted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['user_id', 'deleted_at'], name='tombstone_user_deleted_idx'),
+        ),
+    ]
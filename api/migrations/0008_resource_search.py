@@ -0,0 +1,148 @@
+# Generated by Django 6.0 on 2026-10-18 11:02
+
+from django.db import migrations
+
+# The search index behind /api/servers/<id>/resources/search/ (see api/search.py). It is not a
+# model: SQLite keeps it in an FTS5 table, Postgres in a tsvector table with GIN indexes.
+# Triggers keep it current on every write, including bulk_create() and queryset.update().
+# Then every existing resource is indexed.
+
+# A copy of api.search.SQLITE_TRIGGERS as it was when this migration was written: migrations
+# must not change with the app code
+SQLITE_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS api_resource_search_insert AFTER INSERT ON api_resource BEGIN
+        INSERT INTO api_resource_search (resource_id, unit_id, server_id, title, unit_code, unit_name, resource_type)
+        SELECT new.id, new.unit_id, u.server_id, new.title, u.code, u.name, new.resource_type
+        FROM api_unit u WHERE u.id = new.unit_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS api_resource_search_update
+    AFTER UPDATE OF title, resource_type, unit_id ON api_resource BEGIN
+        DELETE FROM api_resource_search WHERE api_resource_search MATCH 'resource_id:"' || old.id || '"';
+        INSERT INTO api_resource_search (resource_id, unit_id, server_id, title, unit_code, unit_name, resource_type)
+        SELECT new.id, new.unit_id, u.server_id, new.title, u.code, u.name, new.resource_type
+        FROM api_unit u WHERE u.id = new.unit_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS api_resource_search_delete AFTER DELETE ON api_resource BEGIN
+        DELETE FROM api_resource_search WHERE api_resource_search MATCH 'resource_id:"' || old.id || '"';
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS api_resource_search_unit_update
+    AFTER UPDATE OF code, name, server_id ON api_unit BEGIN
+        DELETE FROM api_resource_search WHERE api_resource_search MATCH 'unit_id:"' || old.id || '"';
+        INSERT INTO api_resource_search (resource_id, unit_id, server_id, title, unit_code, unit_name, resource_type)
+        SELECT r.id, r.unit_id, new.server_id, r.title, new.code, new.name, r.resource_type
+        FROM api_resource r WHERE r.unit_id = new.id;
+    END""",
+]
+
+SQLITE_FORWARD = [
+    # Ids are indexed as tokens, so a trigger deletes a resource's (or a unit's) rows by MATCH
+    # and a search stays inside one server: 'server_id:"<id>" AND (...)'
+    """CREATE VIRTUAL TABLE api_resource_search USING fts5(
+        resource_id, unit_id, server_id, title, unit_code, unit_name, resource_type,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )""",
+    *SQLITE_TRIGGERS,
+    """INSERT INTO api_resource_search (resource_id, unit_id, server_id, title, unit_code, unit_name, resource_type)
+        SELECT r.id, r.unit_id, u.server_id, r.title, u.code, u.name, r.resource_type
+        FROM api_resource r JOIN api_unit u ON u.id = r.unit_id""",
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS api_resource_search_insert",
+    "DROP TRIGGER IF EXISTS api_resource_search_update",
+    "DROP TRIGGER IF EXISTS api_resource_search_delete",
+    "DROP TRIGGER IF EXISTS api_resource_search_unit_update",
+    "DROP TABLE IF EXISTS api_resource_search",
+]
+
+POSTGRES_FORWARD = [
+    # Trigram similarity on titles catches typos ('algoritms') that prefix matching cannot
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    # 'simple': course codes and titles are not all English, and prefixes cover plurals
+    """CREATE FUNCTION api_resource_search_document(title text, code text, name text, kind text)
+        RETURNS tsvector LANGUAGE sql IMMUTABLE AS $$
+            SELECT setweight(to_tsvector('simple', title), 'A')
+                || setweight(to_tsvector('simple', code), 'B')
+                || setweight(to_tsvector('simple', name), 'C')
+                || setweight(to_tsvector('simple', replace(kind, '_', ' ')), 'D')
+        $$""",
+    """CREATE TABLE api_resource_search (
+        -- No foreign key: 'manage.py flush' and test teardown TRUNCATE api_resource on their own
+        resource_id uuid PRIMARY KEY,
+        unit_id uuid NOT NULL,
+        server_id uuid NOT NULL,
+        title varchar(200) NOT NULL,
+        document tsvector NOT NULL
+    )""",
+    "CREATE INDEX api_resource_search_document_idx ON api_resource_search USING gin (document)",
+    "CREATE INDEX api_resource_search_title_trgm_idx ON api_resource_search USING gin (title gin_trgm_ops)",
+    "CREATE INDEX api_resource_search_server_idx ON api_resource_search (server_id)",
+    "CREATE INDEX api_resource_search_unit_idx ON api_resource_search (unit_id)",
+    """CREATE FUNCTION api_resource_search_resource() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                DELETE FROM api_resource_search WHERE resource_id = OLD.id;
+                RETURN NULL;
+            END IF;
+            INSERT INTO api_resource_search (resource_id, unit_id, server_id, title, document)
+            SELECT NEW.id, NEW.unit_id, u.server_id, NEW.title,
+                   api_resource_search_document(NEW.title, u.code, u.name, NEW.resource_type)
+            FROM api_unit u WHERE u.id = NEW.unit_id
+            ON CONFLICT (resource_id) DO UPDATE SET
+                unit_id = EXCLUDED.unit_id, server_id = EXCLUDED.server_id,
+                title = EXCLUDED.title, document = EXCLUDED.document;
+            RETURN NULL;
+        END
+    $$""",
+    """CREATE TRIGGER api_resource_search_resource AFTER INSERT OR DELETE OR UPDATE OF title, resource_type, unit_id
+        ON api_resource FOR EACH ROW EXECUTE FUNCTION api_resource_search_resource()""",
+    """CREATE FUNCTION api_resource_search_unit() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            UPDATE api_resource_search s SET
+                server_id = NEW.server_id,
+                document = api_resource_search_document(r.title, NEW.code, NEW.name, r.resource_type)
+            FROM api_resource r
+            WHERE s.unit_id = NEW.id AND r.id = s.resource_id;
+            RETURN NULL;
+        END
+    $$""",
+    """CREATE TRIGGER api_resource_search_unit AFTER UPDATE OF code, name, server_id
+        ON api_unit FOR EACH ROW EXECUTE FUNCTION api_resource_search_unit()""",
+    """INSERT INTO api_resource_search (resource_id, unit_id, server_id, title, document)
+        SELECT r.id, r.unit_id, u.server_id, r.title,
+               api_resource_search_document(r.title, u.code, u.name, r.resource_type)
+        FROM api_resource r JOIN api_unit u ON u.id = r.unit_id""",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP TRIGGER IF EXISTS api_resource_search_unit ON api_unit",
+    "DROP TRIGGER IF EXISTS api_resource_search_resource ON api_resource",
+    "DROP FUNCTION IF EXISTS api_resource_search_unit()",
+    "DROP FUNCTION IF EXISTS api_resource_search_resource()",
+    "DROP TABLE IF EXISTS api_resource_search",
+    "DROP FUNCTION IF EXISTS api_resource_search_document(text, text, text, text)",
+]
+
+STATEMENTS = {
+    'sqlite': (SQLITE_FORWARD, SQLITE_BACKWARD),
+    'postgresql': (POSTGRES_FORWARD, POSTGRES_BACKWARD),
+}
+
+
+def run(direction):
+    def apply(apps, schema_editor):
+        # Other databases get no index (api/search.py refuses to search them)
+        for sql in STATEMENTS.get(schema_editor.connection.vendor, ([], []))[direction]:
+            schema_editor.execute(sql)
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_delta_sync'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(0), run(1)),
+    ]
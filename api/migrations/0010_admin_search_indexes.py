@@ -0,0 +1,46 @@
+# Generated by Django 6.0 on 2026-10-18 15:40
+
+from django.db import migrations
+
+# Trigram indexes for the admin's search boxes and autocomplete widgets (see api/admin.py).
+# Admin search is icontains, which Postgres runs as UPPER(col::text) LIKE UPPER('%term%'): a
+# GIN trigram index on that exact expression serves it, a plain btree cannot. Built
+# CONCURRENTLY so the big tables keep taking writes meanwhile. pg_trgm comes from 0008.
+# SQLite has no equivalent and gets nothing.
+
+INDEXES = [
+    ('api_user_username_trgm_idx', 'api_user', 'username'),
+    ('api_user_registration_number_trgm_idx', 'api_user', 'registration_number'),
+    ('api_user_email_trgm_idx', 'api_user', 'email'),
+    ('api_resource_title_trgm_idx', 'api_resource', 'title'),
+    ('api_assignmentgroup_name_trgm_idx', 'api_assignmentgroup', 'name'),
+]
+
+
+def forward(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, column in INDEXES:
+        schema_editor.execute(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} USING gin (UPPER({column}::text) gin_trgm_ops)"
+        )
+
+
+def backward(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, column in INDEXES:
+        schema_editor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('api', '0009_jobs'),
+    ]
+
+    operations = [
+        migrations.RunPython(forward, backward),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 17:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_counter'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='server',
+            name='join_code',
+            field=models.CharField(blank=True, max_length=6, unique=True),
+        ),
+    ]
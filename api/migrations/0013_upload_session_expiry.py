@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-18 17:40
+
+import api.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_server_join_code_on_save'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadsession',
+            name='expires_at',
+            field=models.DateTimeField(db_index=True, default=api.models.upload_session_expiry),
+        ),
+    ]
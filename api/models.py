@@ -1,8 +1,11 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser
 import uuid
-import random
-import string
 
 # --- Custom User Model ---
 class User(AbstractUser):
@@ -26,16 +29,29 @@ class User(AbstractUser):
 
 # --- Helper: Generate Join Code ---
 def generate_join_code():
-    return ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
+    # Unique by construction, not by retrying on the unique constraint (see api/join_codes.py).
+    # No longer a field default, but migration 0001 still refers to it.
+    from .join_codes import allocate_join_codes
+    return allocate_join_codes(1)[0]
 
 # --- Server Model ---
 class Server(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=100)
-    join_code = models.CharField(max_length=6, default=generate_join_code, unique=True)
+    # Set by save(), not a field default: a default would take a code (a counter upsert) for
+    # every unsaved Server(), e.g. admin add forms and serializer validation
+    join_code = models.CharField(max_length=6, unique=True, blank=True)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_servers')
     description = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Delta sync (/api/sync/) sends rows changed since the client's last visit
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def save(self, *args, **kwargs):
+        # bulk_create() skips this: pass codes from allocate_join_codes() (see api/campus.py)
+        if self._state.adding and not self.join_code:
+            self.join_code = generate_join_code()
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.name} [{self.join_code}]"
@@ -61,10 +77,39 @@ class Unit(models.Model):
     code = models.CharField(max_length=20)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_units')
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # Matches the cursor ordering used by UnitListCreateView, and the delta sync filter
+        indexes = [
+            models.Index(fields=['server', 'created_at', 'id'], name='unit_server_created_idx'),
+            models.Index(fields=['server', 'updated_at'], name='unit_server_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.code} - {self.name}"
 
+# --- Blob Model (Content-Addressed File Storage) ---
+def blob_path(sha256, extension=''):
+    # Fan out by the first two hex chars so no directory holds millions of files
+    return f"blobs/{sha256[:2]}/{sha256}{extension}"
+
+class Blob(models.Model):
+    # One row per distinct file content. Resources with identical bytes share a Blob.
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    file = models.FileField(max_length=255)
+    size = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Filled in after the upload by the 'process_resource' job (see api/processing.py)
+    content_type = models.CharField(max_length=100, blank=True)
+    text = models.TextField(blank=True)
+    preview = models.TextField(blank=True)
+    page_count = models.PositiveIntegerField(null=True, blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.size} bytes)"
+
 # --- Resource Model ---
 class Resource(models.Model):
     class Type(models.TextChoices):
@@ -75,14 +120,46 @@ class Resource(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     unit = models.ForeignKey(Unit, on_delete=models.CASCADE, related_name='resources')
     title = models.CharField(max_length=200)
-    file = models.FileField(upload_to='resources/')
+    file = models.FileField(upload_to='resources/', max_length=255)
+    # Deduplicated content. 'file' points at the blob's path; older uploads have no blob.
+    blob = models.ForeignKey(Blob, on_delete=models.PROTECT, related_name='resources', null=True, blank=True, editable=False)
     resource_type = models.CharField(max_length=50, choices=Type.choices, default=Type.DOCUMENT)
     uploaded_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='uploaded_resources')
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # Matches the cursor ordering used by ResourceListCreateView, and the delta sync filter
+        indexes = [
+            models.Index(fields=['unit', 'uploaded_at', 'id'], name='resource_unit_uploaded_idx'),
+            models.Index(fields=['unit', 'updated_at'], name='resource_unit_updated_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+# --- Upload Session (Resumable Chunked Uploads) ---
+def upload_session_expiry():
+    return timezone.now() + timedelta(seconds=settings.UPLOAD_SESSION_TTL)
+
+class UploadSession(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    unit = models.ForeignKey(Unit, on_delete=models.CASCADE, related_name='upload_sessions')
+    uploaded_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions')
+    title = models.CharField(max_length=200)
+    resource_type = models.CharField(max_length=50, choices=Resource.Type.choices, default=Resource.Type.DOCUMENT)
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    # Bytes received so far; the next chunk must start exactly here
+    offset = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Pushed back by every chunk; past it the session is gone for the client and
+    # 'manage.py prune_upload_sessions' deletes it and its part file
+    expires_at = models.DateTimeField(default=upload_session_expiry, db_index=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size})"
+
 # --- Assignment Group Model ---
 class AssignmentGroup(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -92,8 +169,21 @@ class AssignmentGroup(models.Model):
     # Limit decided by Class Rep (Default 5)
     max_members = models.PositiveIntegerField(default=5)
 
+    # Denormalized size of 'members'. JoinGroupView claims a seat with one conditional
+    # UPDATE on this column, so concurrent joins can never overfill the group.
+    member_count = models.PositiveIntegerField(default=0, editable=False)
+
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_groups')
     created_at = models.DateTimeField(auto_now_add=True)
+    # Also set by the member_count UPDATEs, which bypass auto_now
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # Matches the cursor ordering used by GroupListCreateView, and the delta sync filter
+        indexes = [
+            models.Index(fields=['unit', 'created_at', 'id'], name='group_unit_created_idx'),
+            models.Index(fields=['unit', 'updated_at'], name='group_unit_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.unit.code})"
@@ -104,9 +194,80 @@ class GroupMember(models.Model):
     group = models.ForeignKey(AssignmentGroup, on_delete=models.CASCADE, related_name='members')
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='group_memberships')
     joined_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ('group', 'user') # Prevent joining twice
+        indexes = [models.Index(fields=['group', 'updated_at'], name='groupmember_group_updated_idx')]
+
+    def __str__(self):
+        return f"{self.user.username} in {self.group.name}"
+
+# --- Tombstone (Deleted Rows, for Delta Sync) ---
+class Tombstone(models.Model):
+    # Tells /api/sync/ clients to drop a row they have cached. Rows deleted along with their
+    # parent get no tombstone of their own: clients drop the children of a deleted parent.
+    # A 'server' tombstone with a user is per user: that server is gone for them (left or deleted).
+    class Kind(models.TextChoices):
+        SERVER = "server", "Server"
+        UNIT = "unit", "Unit"
+        RESOURCE = "resource", "Resource"
+        GROUP = "group", "Group"
+        GROUP_MEMBER = "group_member", "Group Member"
+
+    id = models.BigAutoField(primary_key=True)
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    object_id = models.UUIDField()
+    # Plain ids, not foreign keys: the server or user may be gone too
+    server_id = models.UUIDField()
+    user_id = models.UUIDField(null=True, blank=True)
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['server_id', 'deleted_at'], name='tombstone_server_deleted_idx'),
+            models.Index(fields=['user_id', 'deleted_at'], name='tombstone_user_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} deleted {self.deleted_at:%Y-%m-%d %H:%M}"
+
+# --- Named Counter ---
+class Counter(models.Model):
+    # Numbers handed out by one upsert each, never twice (join codes, see api/join_codes.py)
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
+
+# --- Background Job (Database-Backed Queue, see api/jobs.py) ---
+class Job(models.Model):
+    # Finished jobs are deleted; failed ones stay for inspection and can be retried from the admin
+    class Status(models.TextChoices):
+        QUEUED = "queued", "Queued"
+        RUNNING = "running", "Running"
+        FAILED = "failed", "Failed"
+
+    id = models.BigAutoField(primary_key=True)
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    # Not before this time: set on enqueue and pushed back after every failed attempt
+    run_at = models.DateTimeField()
+    # A running job whose lease ran out belongs to a worker that died; another worker takes it
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx'),
+            models.Index(fields=['kind', 'status'], name='job_kind_status_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.user.username} in {self.group.name}"
\ No newline at end of file
+        return f"{self.kind} #{self.id} ({self.status})"
@@ -0,0 +1,16 @@
+from rest_framework.pagination import CursorPagination
+
+
+# --- Keyset (Cursor) Pagination ---
+# The cursor encodes the last timestamp seen, so fetching page 50 is a "WHERE created_at < x"
+# index seek instead of an OFFSET scan. 'id' breaks ties between rows created in the same instant.
+class CreatedAtCursorPagination(CursorPagination):
+    ordering = ('-created_at', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
+# Resources are stamped with 'uploaded_at' instead of 'created_at'
+class UploadedAtCursorPagination(CreatedAtCursorPagination):
+    ordering = ('-uploaded_at', '-id')
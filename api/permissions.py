@@ -0,0 +1,164 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import permissions
+from rest_framework.exceptions import NotFound
+
+from .models import Server, ServerMember, Unit
+from .routers import on_primary
+
+# Everything inside a server (units, resources, groups, its search and change feed) is for the
+# server's members, its creator and staff. Each user's server ids are cached as one set, and
+# each unit's server id on its own, so a check is one cache round trip (get_many) and no query.
+# Signals drop the entries on ServerMember, Server and Unit writes (see api/signals.py). A
+# per-process cache only forgets in the process that saw the write, so a denial read from the
+# cache is confirmed in the database before it stands: a new member is never turned away.
+
+
+# --- 1. Cached Lookups ---
+def _access_key(user_id):
+    return f"api:access:{user_id}"
+
+
+def _unit_key(unit_id):
+    return f"api:unit-server:{unit_id}"
+
+
+def _server_ids_query(user_id):
+    return ServerMember.objects.filter(user_id=user_id).values_list('server_id', flat=True).union(
+        Server.objects.filter(created_by_id=user_id).values_list('id', flat=True)
+    )
+
+
+def _unit_server_query(unit_id):
+    return Unit.objects.filter(pk=unit_id).values_list('server_id', flat=True)
+
+
+def forget_server_access(user_ids):
+    # Dropped now and again on commit: a request reading in between would cache the old set
+    keys = [_access_key(user_id) for user_id in user_ids]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def forget_unit(unit_id):
+    cache.delete(_unit_key(unit_id))
+
+
+def _canonical(value):
+    # Clients may send ids in any case or with braces; cache keys need one spelling
+    try:
+        return str(uuid.UUID(str(value)))
+    except ValueError:
+        return None
+
+
+def _decide(lookup, object_id, servers, unit_server):
+    # None: the unit does not exist, and the view answers as it would for anyone (empty list, 400)
+    server_id = object_id if lookup == 'server' else unit_server
+    return server_id is None or server_id in servers
+
+
+def _load(user_id, lookup, object_id, keys, found, updates):
+    # Cached values where `found` has them, the database otherwise (queued in `updates`)
+    servers = found.get(keys[0])
+    if servers is None:
+        servers = updates[keys[0]] = frozenset(str(pk) for pk in _server_ids_query(user_id))
+    unit_server = None
+    if lookup == 'unit':
+        unit_server = found.get(keys[1])
+        if unit_server is None:
+            unit_server = next((str(pk) for pk in _unit_server_query(object_id)), None)
+            if unit_server:
+                updates[keys[1]] = unit_server
+    return servers, unit_server
+
+
+async def _aload(user_id, lookup, object_id, keys, found, updates):
+    servers = found.get(keys[0])
+    if servers is None:
+        servers = updates[keys[0]] = frozenset([str(pk) async for pk in _server_ids_query(user_id)])
+    unit_server = None
+    if lookup == 'unit':
+        unit_server = found.get(keys[1])
+        if unit_server is None:
+            unit_server = await _unit_server_query(object_id).afirst()
+            if unit_server:
+                unit_server = updates[keys[1]] = str(unit_server)
+    return servers, unit_server
+
+
+def has_server_access(user, lookup, object_id):
+    """Whether `user` may see the server with this id ('server'), or the server of this unit ('unit')."""
+    object_id = _canonical(object_id)
+    if object_id is None or user.is_staff:
+        return True  # A malformed id finds nothing in the view either
+    keys = [_access_key(user.pk)] + ([_unit_key(object_id)] if lookup == 'unit' else [])
+    found = cache.get_many(keys)
+    updates = {}
+    # Read from the primary: a replica may not have the join that just happened
+    with on_primary():
+        allowed = _decide(lookup, object_id, *_load(user.pk, lookup, object_id, keys, found, updates))
+        if not allowed and found:
+            # A cached 'no' is checked once more in the database: with a per-process cache
+            # (locmem) a join drops the entry only in the worker that handled it
+            allowed = _decide(lookup, object_id, *_load(user.pk, lookup, object_id, keys, {}, updates))
+    if updates:
+        cache.set_many(updates, timeout=settings.SERVER_ACCESS_CACHE_TIMEOUT)
+    return allowed
+
+
+async def ahas_server_access(user, lookup, object_id):
+    # has_server_access() for the async views, with no thread hop
+    object_id = _canonical(object_id)
+    if object_id is None or user.is_staff:
+        return True
+    keys = [_access_key(user.pk)] + ([_unit_key(object_id)] if lookup == 'unit' else [])
+    found = await cache.aget_many(keys)
+    updates = {}
+    allowed = _decide(lookup, object_id, *await _aload(user.pk, lookup, object_id, keys, found, updates))
+    if not allowed and found:
+        allowed = _decide(lookup, object_id, *await _aload(user.pk, lookup, object_id, keys, {}, updates))
+    if updates:
+        await cache.aset_many(updates, timeout=settings.SERVER_ACCESS_CACHE_TIMEOUT)
+    return allowed
+
+
+# --- 2. Permission Class ---
+class IsServerMember(permissions.BasePermission):
+    """
+    For views inside one server. The view names what its id points at with `server_lookup`
+    ('server' or 'unit') and where the id is with `server_lookup_param`: a URL kwarg, or a query
+    parameter on reads. Writes send it in the body field named after `server_lookup`.
+    Detail views fetch their object and call check_object_permissions() with it.
+    Outsiders get a 404, as if the server did not exist.
+    """
+
+    def has_permission(self, request, view):
+        lookup = getattr(view, 'server_lookup', None)
+        if lookup is None:
+            return True
+        param = getattr(view, 'server_lookup_param', 'pk')
+        if param in view.kwargs:
+            value = view.kwargs[param]
+        elif request.method in permissions.SAFE_METHODS:
+            value = request.query_params.get(param)
+        else:
+            value = request.data.get(lookup) if hasattr(request.data, 'get') else None
+        if not has_server_access(request.user, lookup, value):
+            raise NotFound()
+        return True
+
+    def has_object_permission(self, request, view, obj):
+        # Units carry their server id; groups and resources are fetched with select_related('unit')
+        if isinstance(obj, Server):
+            server_id = obj.pk
+        elif isinstance(obj, Unit):
+            server_id = obj.server_id
+        else:
+            server_id = obj.unit.server_id
+        if not has_server_access(request.user, 'server', server_id):
+            raise NotFound()
+        return True
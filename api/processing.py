@@ -0,0 +1,214 @@
+import codecs
+import html
+import io
+import mimetypes
+import re
+import zipfile
+import zlib
+
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import bump_versions
+from .models import Blob, Resource
+from .uploads import store_blob
+
+# Post-upload work on a resource's file: content type, text, a short preview and the page count.
+# It runs in the 'process_resource' job (api/jobs.py) so the upload request never waits for it.
+# Results live on the Blob, so identical files are processed once. Only the standard library is
+# used: text comes from plain text files, Office Open XML (docx/pptx/xlsx) and uncompressed or
+# Flate-compressed PDF content streams. Scanned PDFs and images get a content type only.
+
+MAX_PROCESS_BYTES = 50 * 1024 * 1024  # Bigger files get a content type only
+MAX_TEXT_CHARS = 200_000
+PREVIEW_CHARS = 280
+
+DOCX = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+PPTX = 'application/vnd.openxmlformats-officedocument.presentationml.presentation'
+XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+# --- 1. Content Type ---
+SIGNATURES = [
+    (b'%PDF-', 'application/pdf'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'PK\x03\x04', 'application/zip'),
+]
+# Office files are zip archives; the part inside says which kind
+OFFICE_MARKERS = [('word/document.xml', DOCX), ('ppt/presentation.xml', PPTX), ('xl/workbook.xml', XLSX)]
+
+
+def _is_text(data):
+    try:
+        # Not final: the sample may end in the middle of a multi-byte character
+        codecs.getincrementaldecoder('utf-8')().decode(data[:8192])
+    except UnicodeDecodeError:
+        return False
+    return b'\x00' not in data[:8192]
+
+
+def sniff_content_type(data, filename):
+    # From the bytes: the client's file name and Content-Type header are not trusted
+    for magic, content_type in SIGNATURES:
+        if data.startswith(magic):
+            if content_type == 'application/zip':
+                try:
+                    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+                        names = set(archive.namelist())
+                except zipfile.BadZipFile:
+                    return content_type
+                return next((office for marker, office in OFFICE_MARKERS if marker in names), content_type)
+            return content_type
+    if _is_text(data):
+        guessed = mimetypes.guess_type(filename)[0] or ''
+        return guessed if guessed.startswith('text/') else 'text/plain'
+    return 'application/octet-stream'
+
+
+# --- 2. Text Extraction ---
+def _office_text(data, content_type):
+    # Text runs of the document body, the slides in order, or the spreadsheet's strings
+    pattern = {DOCX: r'word/document\.xml', PPTX: r'ppt/slides/slide(\d+)\.xml', XLSX: r'xl/sharedStrings\.xml'}[content_type]
+    parts = []
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        members = [(re.fullmatch(pattern, info.filename), info) for info in archive.infolist()]
+        members = sorted(
+            ((match, info) for match, info in members if match),
+            key=lambda item: int(item[0].group(1)) if item[0].groups() else 0,
+        )
+        for _, info in members:
+            if info.file_size > MAX_PROCESS_BYTES:
+                continue  # Refuse zip bombs
+            xml = archive.read(info).decode('utf-8', 'replace')
+            xml = re.sub(r'</(?:w:p|a:p|si)>', '\n', xml)  # Paragraph, slide line and cell ends
+            parts.append(html.unescape(re.sub(r'<[^>]+>', '', xml)))
+    page_count = len(members) if content_type == PPTX else None
+    return '\n'.join(parts), page_count
+
+
+PDF_STREAM = re.compile(rb'stream\r?\n(.*?)endstream', re.S)
+PDF_PAGE = re.compile(rb'/Type\s*/Page(?![A-Za-z])')
+# Text-showing operators: [(...) -250 (...)] TJ, (...) Tj / ' / ", and the operators that move
+# to a new line (everything else in a content stream is skipped)
+PDF_TEXT = re.compile(
+    rb'\[((?:\\.|[^\\\]])*)\]\s*TJ|\(((?:\\.|[^\\)])*)\)\s*(?:Tj|\'|")|(?<![A-Za-z])(T\*|Td|TD|ET)(?![A-Za-z])',
+    re.S,
+)
+PDF_ARRAY_ITEM = re.compile(rb'\(((?:\\.|[^\\)])*)\)|(-?\d+(?:\.\d+)?)')
+PDF_ESCAPES = {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b', b'f': b'\f'}
+
+
+def _pdf_string(raw):
+    def unescape(match):
+        escaped = match.group(1)
+        if escaped[:1].isdigit():
+            return bytes([int(escaped, 8) & 0xFF])
+        if escaped in (b'\n', b'\r\n', b'\r'):
+            return b''  # Line continuation
+        return PDF_ESCAPES.get(escaped, escaped)
+    value = re.sub(rb'\\([0-7]{1,3}|\r\n|.)', unescape, raw, flags=re.S)
+    if value.startswith(b'\xfe\xff'):
+        return value[2:].decode('utf-16-be', 'replace')
+    return value.decode('latin-1')
+
+
+def _pdf_text(data):
+    # Best effort, like 'strings' for PDFs: fonts with custom encodings come out as junk, which
+    # the printable check below throws away
+    streams = [data]
+    for match in PDF_STREAM.finditer(data):
+        raw = match.group(1)
+        try:
+            streams.append(zlib.decompressobj().decompress(raw, MAX_PROCESS_BYTES))
+        except zlib.error:
+            # Another filter (images: DCTDecode, ...) is skipped; an unfiltered stream is read as is
+            if b'/Filter' not in data[max(0, match.start() - 300):match.start()]:
+                streams.append(raw)
+    lines, line = [], []
+    for stream in streams[1:]:
+        for match in PDF_TEXT.finditer(stream):
+            array, string, newline = match.groups()
+            if newline is not None:
+                if line:
+                    lines.append(''.join(line))
+                    line = []
+            elif string is not None:
+                line.append(_pdf_string(string))
+            else:
+                for item in PDF_ARRAY_ITEM.finditer(array):
+                    if item.group(1) is not None:
+                        line.append(_pdf_string(item.group(1)))
+                    elif float(item.group(2)) <= -200:
+                        line.append(' ')  # A kerning gap wide enough to be a space
+    if line:
+        lines.append(''.join(line))
+    text = '\n'.join(lines)
+    printable = sum(char.isprintable() or char.isspace() for char in text)
+    if text and printable / len(text) < 0.9:
+        text = ''
+    # Page objects can be inside compressed object streams too
+    page_count = sum(len(PDF_PAGE.findall(stream)) for stream in streams)
+    return text, page_count or None
+
+
+def extract_text(data, content_type):
+    """(text, page_count) of the file's content; page_count is None when it has no pages."""
+    if content_type.startswith('text/'):
+        return data.decode('utf-8', 'replace'), None
+    if content_type in (DOCX, PPTX, XLSX):
+        return _office_text(data, content_type)
+    if content_type == 'application/pdf':
+        return _pdf_text(data)
+    return '', None
+
+
+def make_preview(text):
+    text = ' '.join(text.split())
+    if len(text) <= PREVIEW_CHARS:
+        return text
+    cut = text[:PREVIEW_CHARS].rsplit(' ', 1)[0]
+    return f"{cut}…"
+
+
+def inspect(data, filename):
+    content_type = sniff_content_type(data[:8192] if len(data) > MAX_PROCESS_BYTES else data, filename)
+    text, page_count = ('', None) if len(data) > MAX_PROCESS_BYTES else extract_text(data, content_type)
+    text = text.replace('\x00', '')[:MAX_TEXT_CHARS]
+    return {'content_type': content_type, 'text': text, 'preview': make_preview(text), 'page_count': page_count}
+
+
+# --- 3. The 'process_resource' Job ---
+def _attach_blob(resource):
+    # Uploads from before deduplication: checksum the file now and move it into the blob store
+    old_name = resource.file.name
+    with resource.file.open('rb') as source:
+        blob = store_blob(source, old_name)
+    resource.blob, resource.file = blob, blob.file.name
+    resource.save(update_fields=['blob', 'file', 'updated_at'])
+    if old_name != blob.file.name and not Resource.objects.filter(file=old_name).exists():
+        blob.file.storage.delete(old_name)
+    return blob
+
+
+def process_resource(resource_id):
+    resource = Resource.objects.select_related('blob').filter(pk=resource_id).first()
+    if resource is None:
+        return  # Deleted before its turn came
+    blob = resource.blob or _attach_blob(resource)
+    if blob.processed_at:
+        return  # Same content as an earlier upload
+    with blob.file.open('rb') as source:
+        data = source.read(MAX_PROCESS_BYTES + 1)
+    details = inspect(data, blob.file.name)
+
+    now = timezone.now()
+    with transaction.atomic():
+        Blob.objects.filter(pk=blob.pk).update(**details, processed_at=now)
+        # Every resource sharing the file shows the new details: resync them and drop cached lists
+        sharing = Resource.objects.filter(blob=blob)
+        unit_ids = set(sharing.values_list('unit_id', flat=True))
+        sharing.update(updated_at=now)
+    bump_versions('resources', unit_ids)
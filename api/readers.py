@@ -0,0 +1,161 @@
+import copy
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import FileSystemStorage
+from django.utils import timezone
+from django.utils.encoding import filepath_to_uri
+from rest_framework import ISO_8601, serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+# Read path for big lists: rows come from .values() and are turned into the serializer's exact
+# output by a list of per-field mappers, compiled once per serializer class. No model instances,
+# no field binding per row. Only flat serializers qualify: plain columns, foreign key ids and
+# 'a.b' lookups. A nested serializer or a SerializerMethodField is refused when compiling.
+
+ROW_CHUNK_SIZE = 2000  # Rows fetched per round trip by iter_rows()
+
+
+# --- 1. Field Mappers ---
+def _datetime(context):
+    # Same output as serializers.DateTimeField with the default ISO 8601 format
+    tz = timezone.get_current_timezone()
+
+    def convert(value):
+        if not value:
+            return None
+        if timezone.is_aware(value):
+            value = value.astimezone(tz)
+        value = value.isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    return convert
+
+
+def _file_url(storage):
+    # Same output as serializers.FileField: the storage URL, made absolute with the request
+    def make(context):
+        request = context.get('request')
+
+        def convert(name):
+            if not name:
+                return None
+            url = storage.url(name)
+            return request.build_absolute_uri(url) if request is not None else url
+
+        if not isinstance(storage, FileSystemStorage) or storage.base_url.startswith('//'):
+            return convert
+        # Local files: urljoin() and build_absolute_uri() cost more than the rest of the row,
+        # and both reduce to a prefix for a plain relative path
+        base = request.build_absolute_uri(storage.base_url) if request is not None else storage.base_url
+
+        def convert_local(name):
+            if not name:
+                return None
+            path = filepath_to_uri(name).lstrip('/')
+            if '/.' in f'/{path}':
+                return convert(name)
+            return base + path
+        return convert_local
+    return make
+
+
+def _uuid(context):
+    return lambda value: str(value) if value is not None else None
+
+
+def _generic(field):
+    # Other scalar fields convert a single column value as they would a model attribute
+    return lambda context: lambda value: field.to_representation(value) if value is not None else None
+
+
+# Fields whose column value is already the output (foreign keys give their id)
+PASSTHROUGH_FIELDS = (
+    serializers.ReadOnlyField, serializers.CharField, serializers.IntegerField, serializers.BooleanField,
+    serializers.PrimaryKeyRelatedField,
+)
+
+
+def _mapper(model, name, field):
+    if isinstance(field, (serializers.BaseSerializer, serializers.SerializerMethodField,
+                          serializers.ManyRelatedField, serializers.HiddenField)):
+        raise ImproperlyConfigured(f"'{name}' ({type(field).__name__}) cannot be read from a .values() row")
+    if isinstance(field, serializers.FileField):
+        if not getattr(field, 'use_url', api_settings.UPLOADED_FILES_USE_URL):
+            return None
+        return _file_url(model._meta.get_field(field.source).storage)
+    if isinstance(field, serializers.DateTimeField):
+        if getattr(field, 'format', api_settings.DATETIME_FORMAT) != ISO_8601:
+            return _generic(field)
+        return _datetime
+    if isinstance(field, serializers.UUIDField):
+        return _uuid
+    if isinstance(field, PASSTHROUGH_FIELDS):
+        return None
+    if isinstance(field, serializers.RelatedField):
+        raise ImproperlyConfigured(f"'{name}' ({type(field).__name__}) cannot be read from a .values() row")
+    return _generic(field)
+
+
+# --- 2. Row Readers ---
+class RowReader:
+
+    def __init__(self, serializer_class):
+        model = serializer_class.Meta.model
+        self.fields = []
+        for name, field in serializer_class().fields.items():
+            if field.write_only:
+                continue
+            # 'uploaded_by.username' -> 'uploaded_by__username'; a foreign key column gives its id
+            path = '__'.join(field.source_attrs)
+            self.fields.append((name, path, _mapper(model, name, field)))
+        self.paths = list(dict.fromkeys(path for _, path, _ in self.fields))
+
+    def only(self, names):
+        # The same reader limited to some fields, for '?fields=' selections
+        reader = copy.copy(self)
+        reader.fields = [field for field in self.fields if field[0] in names]
+        reader.paths = list(dict.fromkeys(path for _, path, _ in reader.fields))
+        return reader
+
+    def values(self, queryset, *extra):
+        return queryset.values(*self.paths, *(path for path in extra if path not in self.paths))
+
+    def converters(self, context):
+        return [(name, path, make(context) if make else None) for name, path, make in self.fields]
+
+    def rows(self, values, context):
+        converters = self.converters(context)
+        return [
+            {name: convert(row[path]) if convert else row[path] for name, path, convert in converters}
+            for row in values
+        ]
+
+    def iter_rows(self, queryset, context, chunk_size=ROW_CHUNK_SIZE):
+        # A generator over a server-side cursor: the whole list is never held in memory
+        converters = self.converters(context)
+        for row in self.values(queryset).iterator(chunk_size=chunk_size):
+            yield {name: convert(row[path]) if convert else row[path] for name, path, convert in converters}
+
+
+_readers = {}
+
+
+def reader_for(serializer_class):
+    if serializer_class not in _readers:
+        _readers[serializer_class] = RowReader(serializer_class)
+    return _readers[serializer_class]
+
+
+# --- 3. View Mixin ---
+class RowListMixin:
+    # list() from .values() rows; writes and single objects still go through the serializer
+
+    def list(self, request, *args, **kwargs):
+        reader = reader_for(self.get_serializer_class())
+        # The cursor paginator reads its position from the ordering columns of the last row
+        ordering = [field.lstrip('-') for field in getattr(self.paginator, 'ordering', ())]
+        queryset = reader.values(self.filter_queryset(self.get_queryset()), *ordering)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(reader.rows(page, self.get_serializer_context()))
+        return Response(reader.rows(queryset, self.get_serializer_context()))
@@ -0,0 +1,116 @@
+import csv
+import io
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from .hashing import hash_passwords
+from .models import User
+from .serializers import BulkUserRowSerializer
+
+# Usernames/registration numbers are checked and rows inserted this many at a time
+REGISTRATION_BATCH_SIZE = 500
+
+
+# --- 1. Reading the batch ---
+def read_users_csv(uploaded_file):
+    # Header row names the columns: username, email, password, role, registration_number
+    reader = csv.DictReader(io.TextIOWrapper(uploaded_file, encoding='utf-8-sig', newline=''))
+    return [{key.strip(): (value or '').strip() for key, value in row.items() if key} for row in reader]
+
+
+def _existing(field, values):
+    found = set()
+    values = list(values)
+    for i in range(0, len(values), REGISTRATION_BATCH_SIZE):
+        chunk = values[i:i + REGISTRATION_BATCH_SIZE]
+        found.update(User.objects.filter(**{f'{field}__in': chunk}).values_list(field, flat=True))
+    return found
+
+
+# --- 2. Registering the batch ---
+def register_users(rows, workers=None, allowed_roles=None):
+    """
+    Validates and creates a batch of users. Returns (report, timings):
+    one report row per input row with a status of 'created', 'invalid',
+    'duplicate' (repeated in the batch) or 'exists' (already registered).
+    """
+    workers = workers or settings.BULK_REGISTRATION_WORKERS
+    started = time.perf_counter()
+
+    # 1. Shape checks per row; uniqueness is checked below in batches, not one query per row
+    row_serializer = BulkUserRowSerializer()
+    report, valid, candidates = [], {}, []
+    for index, row in enumerate(rows):
+        report.append({'username': str(row.get('username', '')) if isinstance(row, dict) else ''})
+        try:
+            valid[index] = row_serializer.run_validation(row)
+        except ValidationError as exc:
+            report[index].update(status='invalid', errors=exc.detail)
+            continue
+        if allowed_roles is not None and valid[index]['role'] not in allowed_roles:
+            report[index].update(status='invalid', errors={'role': [f"You cannot create {valid[index]['role']} accounts."]})
+            continue
+        candidates.append(index)
+
+    taken_usernames = _existing('username', (valid[i]['username'] for i in candidates))
+    taken_numbers = _existing(
+        'registration_number', (valid[i]['registration_number'] for i in candidates if valid[i].get('registration_number'))
+    )
+    seen_usernames, seen_numbers, accepted = set(), set(), []
+    for index in candidates:
+        data = valid[index]
+        number = data.get('registration_number')
+        if data['username'] in seen_usernames or (number and number in seen_numbers):
+            report[index]['status'] = 'duplicate'
+        elif data['username'] in taken_usernames or (number and number in taken_numbers):
+            report[index]['status'] = 'exists'
+        else:
+            accepted.append(index)
+        seen_usernames.add(data['username'])
+        if number:
+            seen_numbers.add(number)
+    validated = time.perf_counter()
+
+    # 2. Hash in parallel. Rows without a password get an unusable one (no hashing needed).
+    with_password = [index for index in accepted if valid[index].get('password')]
+    hashes = dict(zip(with_password, hash_passwords([valid[i]['password'] for i in with_password], workers)))
+    hashed = time.perf_counter()
+
+    # 3. Insert in chunks. ignore_conflicts: a racing single registration only loses its own row.
+    users = []
+    for index in accepted:
+        data = valid[index]
+        users.append(User(
+            username=data['username'],
+            email=data.get('email', ''),
+            role=data.get('role', User.Role.STUDENT),
+            registration_number=data.get('registration_number') or None,
+            password=hashes.get(index) or make_password(None),
+        ))
+    with transaction.atomic():
+        for i in range(0, len(users), REGISTRATION_BATCH_SIZE):
+            chunk = users[i:i + REGISTRATION_BATCH_SIZE]
+            User.objects.bulk_create(chunk, ignore_conflicts=True)
+        created_ids = set()
+        for i in range(0, len(users), REGISTRATION_BATCH_SIZE):
+            chunk_ids = [user.pk for user in users[i:i + REGISTRATION_BATCH_SIZE]]
+            created_ids.update(User.objects.filter(pk__in=chunk_ids).values_list('pk', flat=True))
+    for index, user in zip(accepted, users):
+        report[index]['status'] = 'created' if user.pk in created_ids else 'exists'
+        if user.pk in created_ids:
+            report[index]['id'] = user.pk
+    finished = time.perf_counter()
+
+    timings = {
+        'validate_ms': round((validated - started) * 1000),
+        'hash_ms': round((hashed - validated) * 1000),
+        'insert_ms': round((finished - hashed) * 1000),
+        'total_ms': round((finished - started) * 1000),
+        'users_per_sec': round(len(created_ids) / (finished - started), 1) if finished > started else None,
+        'workers': workers,
+    }
+    return report, timings
@@ -0,0 +1,84 @@
+import time
+from collections.abc import Iterator
+
+import orjson
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from .middleware import current_request_stats
+
+# orjson leaves datetimes and anything it doesn't know to DRF's encoder, so the bytes match
+# JSONRenderer's compact output ('Z' for UTC, Decimals and lazy strings as DRF writes them)
+ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+STREAM_BUFFER_SIZE = 64 * 1024
+_drf_default = JSONEncoder().default
+
+
+def dumps(data):
+    # JSONRenderer escapes these two so the output is also valid JavaScript
+    return orjson.dumps(data, default=_drf_default, option=ORJSON_OPTIONS) \
+        .replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+# --- 1. JSON ---
+class TimedJSONRenderer(JSONRenderer):
+    # Reports the time spent turning response.data into bytes as 'serialize' (see api/middleware.py)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        started = time.perf_counter()
+        try:
+            return self.render_json(data, accepted_media_type, renderer_context)
+        finally:
+            stats = current_request_stats.get()
+            if stats is not None:
+                stats.serialize_seconds += time.perf_counter() - started
+
+    def render_json(self, data, accepted_media_type=None, renderer_context=None):
+        return super().render(data, accepted_media_type, renderer_context)
+
+
+class OrjsonRenderer(TimedJSONRenderer):
+    # Same bytes as JSONRenderer, several times faster on big lists. Indented output
+    # (the browsable API, 'Accept: application/json; indent=2') still uses the json module.
+
+    def render_json(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}) or not self.compact or self.ensure_ascii:
+            return super().render_json(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+
+# --- 2. Streaming ---
+def stream_json(data):
+    """
+    Yields the JSON for the dict `data` in pieces. Values that are iterators (e.g. from
+    RowReader.iter_rows) are written as lists row by row, so they are never built in memory.
+    """
+    yield b'{'
+    for n, (key, value) in enumerate(data.items()):
+        yield (b',' if n else b'') + dumps(key) + b':'
+        if not isinstance(value, Iterator):
+            yield dumps(value)
+            continue
+        # Rows go out in ~64 KB pieces, not one write per row
+        buffer, size, opening = [], 0, b'['
+        for row in value:
+            buffer.append(dumps(row))
+            size += len(buffer[-1])
+            if size >= STREAM_BUFFER_SIZE:
+                yield opening + b','.join(buffer)
+                buffer, size, opening = [], 0, b','
+        if buffer:
+            yield opening + b','.join(buffer) + b']'
+        else:
+            yield b'[]' if opening == b'[' else b']'
+    yield b'}'
+
+
+class StreamingJSONResponse(StreamingHttpResponse):
+    # The Server-Timing header goes out first, so it only covers the work done before streaming
+
+    def __init__(self, data, status=200):
+        super().__init__(stream_json(data), status=status, content_type='application/json')
@@ -0,0 +1,79 @@
+import csv
+import io
+from itertools import islice
+
+from .cache import bump_versions
+from .permissions import forget_server_access
+from .models import User, ServerMember
+
+# Rows are resolved and inserted this many at a time: one IN query + one bulk INSERT per batch
+ROSTER_BATCH_SIZE = 500
+
+
+# --- 1. Reading the roster ---
+def iter_csv_registration_numbers(uploaded_file):
+    # Streams the upload line by line, so a 5,000-row file is never held in memory as a whole.
+    # Accepts a bare column of registration numbers or a header row with 'registration_number'.
+    reader = csv.reader(io.TextIOWrapper(uploaded_file, encoding='utf-8-sig', newline=''))
+    column = 0
+    for line_number, row in enumerate(reader):
+        if not row:
+            continue
+        if line_number == 0:
+            header = [cell.strip().lower() for cell in row]
+            if 'registration_number' in header:
+                column = header.index('registration_number')
+                continue
+        yield row[column] if column < len(row) else ''
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+# --- 2. Importing the roster ---
+def import_roster(server, registration_numbers, batch_size=ROSTER_BATCH_SIZE):
+    """
+    Adds every user in `registration_numbers` to `server`.
+    Returns one report row per input row, each with a status of
+    'added', 'already_member', 'not_found', 'duplicate' or 'invalid'.
+    """
+    report = []
+    seen = set()
+
+    for batch in _batches(registration_numbers, batch_size):
+        rows = [str(value).strip() for value in batch]
+        wanted = {reg for reg in rows if reg and reg not in seen}
+
+        users = dict(
+            User.objects.filter(registration_number__in=wanted).values_list('registration_number', 'id')
+        )
+        existing = set(
+            ServerMember.objects.filter(server=server, user_id__in=users.values()).values_list('user_id', flat=True)
+        )
+
+        new_members = []
+        for reg in rows:
+            if not reg:
+                status = 'invalid'
+            elif reg in seen:
+                status = 'duplicate'
+            elif reg not in users:
+                status = 'not_found'
+            elif users[reg] in existing:
+                status = 'already_member'
+            else:
+                status = 'added'
+                new_members.append(ServerMember(server=server, user_id=users[reg]))
+            seen.add(reg)
+            report.append({'registration_number': reg, 'status': status})
+
+        # ignore_conflicts: a student joining by code at the same moment is not an error
+        ServerMember.objects.bulk_create(new_members, ignore_conflicts=True)
+        # bulk_create skips model signals, so refresh the new members' server lists and access here
+        bump_versions('servers', [member.user_id for member in new_members])
+        forget_server_access([member.user_id for member in new_members])
+
+    return report
@@ -0,0 +1,75 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+# Read replicas (DATABASE_REPLICA_URLS, see settings). Only views that opt in with
+# ReplicaReadMixin read from a replica, and only on GET. Writes, select_for_update() and every
+# other query stay on 'default'. Replicas lag behind the primary, so for REPLICA_PIN_SECONDS
+# after a user writes, their lists are read from the primary and they see their own join or
+# upload (see ReadYourWritesMiddleware).
+
+# The replica this request reads from, or None for the primary. Set per request, never globally.
+_read_alias = ContextVar('replica_read_alias', default=None)
+
+
+# --- 1. Router ---
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get() or 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+
+def choose_replica():
+    # One replica per request, so all its queries see the same point in time
+    return random.choice(settings.DATABASE_REPLICAS) if settings.DATABASE_REPLICAS else None
+
+
+@contextmanager
+def on_primary():
+    token = _read_alias.set(None)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+# --- 2. Read-Your-Writes ---
+def _pin_key(user_id):
+    return f"api:primary:{user_id}"
+
+
+def pin_to_primary(user_id):
+    cache.set(_pin_key(user_id), True, timeout=settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user):
+    return user.pk is not None and cache.get(_pin_key(user.pk)) is not None
+
+
+# --- 3. View Mixin ---
+class ReplicaReadMixin:
+
+    def dispatch(self, request, *args, **kwargs):
+        # Threads serve one request after another: the choice must not outlive this one
+        token = _read_alias.set(None)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            _read_alias.reset(token)
+
+    def initial(self, request, *args, **kwargs):
+        # After authentication and permission checks, which stay on the primary
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS and settings.DATABASE_REPLICAS and not is_pinned(request.user):
+            _read_alias.set(choose_replica())
@@ -0,0 +1,109 @@
+import re
+import uuid
+
+from django.db import NotSupportedError, connection
+
+# Full-text search over a server's resources: title, unit code and name, resource type.
+# The index lives next to the tables (an FTS5 table on SQLite, a tsvector table with GIN indexes
+# on Postgres) and database triggers keep it current, so bulk_create() and queryset.update()
+# are indexed too. The table, its functions and the backfill are in migration 0008.
+
+MAX_TERMS = 8
+# Column weights: title, unit code, unit name, resource type (the 3 id columns get 0)
+SQLITE_WEIGHTS = (0, 0, 0, 10.0, 5.0, 3.0, 1.0)
+
+# --- 1. Triggers ---
+# SQLite drops a table's triggers when a migration rebuilds the table, so these are created
+# again after every migrate (see api/signals.py). Postgres keeps its triggers across ALTER TABLE.
+SQLITE_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS api_resource_search_insert AFTER INSERT ON api_resource BEGIN
+        INSERT INTO api_resource_search (resource_id, unit_id, server_id, title, unit_code, unit_name, resource_type)
+        SELECT new.id, new.unit_id, u.server_id, new.title, u.code, u.name, new.resource_type
+        FROM api_unit u WHERE u.id = new.unit_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS api_resource_search_update
+    AFTER UPDATE OF title, resource_type, unit_id ON api_resource BEGIN
+        DELETE FROM api_resource_search WHERE api_resource_search MATCH 'resource_id:"' || old.id || '"';
+        INSERT INTO api_resource_search (resource_id, unit_id, server_id, title, unit_code, unit_name, resource_type)
+        SELECT new.id, new.unit_id, u.server_id, new.title, u.code, u.name, new.resource_type
+        FROM api_unit u WHERE u.id = new.unit_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS api_resource_search_delete AFTER DELETE ON api_resource BEGIN
+        DELETE FROM api_resource_search WHERE api_resource_search MATCH 'resource_id:"' || old.id || '"';
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS api_resource_search_unit_update
+    AFTER UPDATE OF code, name, server_id ON api_unit BEGIN
+        DELETE FROM api_resource_search WHERE api_resource_search MATCH 'unit_id:"' || old.id || '"';
+        INSERT INTO api_resource_search (resource_id, unit_id, server_id, title, unit_code, unit_name, resource_type)
+        SELECT r.id, r.unit_id, new.server_id, r.title, new.code, new.name, r.resource_type
+        FROM api_resource r WHERE r.unit_id = new.id;
+    END""",
+]
+
+
+def install_sqlite_triggers(using_connection):
+    with using_connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'api_resource_search'")
+        if cursor.fetchone() is None:
+            return  # Migration 0008 not applied yet
+        for sql in SQLITE_TRIGGERS:
+            cursor.execute(sql)
+
+
+# --- 2. Queries ---
+def search_terms(query):
+    # Letters and digits only ('PAST_PAPER' is two words): nothing typed reaches FTS5 / tsquery syntax
+    return re.findall(r'[^\W_]+', query.lower())[:MAX_TERMS]
+
+
+def _with_prefix(terms):
+    # Only the last word is a prefix, as the user is still typing it. Prefix lookups cost far
+    # more than exact ones (a 1-letter prefix scans the whole vocabulary), so finished words
+    # and single letters are matched exactly.
+    return [(term, n == len(terms) - 1 and len(term) > 1) for n, term in enumerate(terms)]
+
+
+def _sqlite_search(server_id, terms, limit, offset):
+    # The server id is a token too, so the match is narrowed to one server inside the index
+    words = ' AND '.join(f'"{term}"*' if prefix else f'"{term}"' for term, prefix in _with_prefix(terms))
+    match = f'server_id:"{server_id.hex}" AND {{title unit_code unit_name resource_type}}: ({words})'
+    weights = ', '.join(str(weight) for weight in SQLITE_WEIGHTS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT resource_id FROM api_resource_search WHERE api_resource_search MATCH %s "
+            f"ORDER BY bm25(api_resource_search, {weights}) LIMIT %s OFFSET %s",
+            [match, limit, offset],
+        )
+        # SQLite stores UUIDs as hex text
+        return [uuid.UUID(row[0]) for row in cursor.fetchall()]
+
+
+def _postgres_search(server_id, terms, limit, offset):
+    # Prefix matches rank by weight (title A ... type D); trigram similarity adds typo tolerance
+    tsquery = ' & '.join(f'{term}:*' if prefix else term for term, prefix in _with_prefix(terms))
+    text = ' '.join(terms)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT s.resource_id FROM api_resource_search s, to_tsquery('simple', %s) query "
+            "WHERE s.server_id = %s AND (s.document @@ query OR %s <%% s.title) "
+            "ORDER BY ts_rank_cd(s.document, query) + word_similarity(%s, s.title) DESC, s.resource_id "
+            "LIMIT %s OFFSET %s",
+            [tsquery, server_id, text, text, limit, offset],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+SEARCHES = {
+    'sqlite': _sqlite_search,
+    'postgresql': _postgres_search,
+}
+
+
+def search_resources(server_id, query, limit, offset=0):
+    """UUIDs of the server's resources matching `query`, best first (one query)."""
+    terms = search_terms(query)
+    if not terms:
+        return []
+    if connection.vendor not in SEARCHES:
+        raise NotSupportedError(f"Resource search needs SQLite or Postgres, not {connection.vendor}")
+    return SEARCHES[connection.vendor](server_id, terms, limit, offset)
@@ -1,5 +1,8 @@
+from django.conf import settings
+from django.contrib.auth.validators import UnicodeUsernameValidator
 from rest_framework import serializers
-from .models import User, Server, ServerMember, Unit, Resource, AssignmentGroup, GroupMember
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from .models import User, Server, ServerMember, Unit, Resource, UploadSession, AssignmentGroup, GroupMember
 
 # --- 1. User Serializer (For Registration) ---
 class UserSerializer(serializers.ModelSerializer):
@@ -39,12 +42,33 @@ class UnitSerializer(serializers.ModelSerializer):
 # --- 5. Resource Serializer (The File Upload) ---
 class ResourceSerializer(serializers.ModelSerializer):
     uploaded_by_name = serializers.ReadOnlyField(source='uploaded_by.username')
+    # Filled in by the post-upload job (api/processing.py): blank until it has run
+    content_type = serializers.ReadOnlyField(source='blob.content_type', allow_null=True)
+    page_count = serializers.ReadOnlyField(source='blob.page_count', allow_null=True)
+    preview = serializers.ReadOnlyField(source='blob.preview', allow_null=True)
 
     class Meta:
         model = Resource
-        fields = ['id', 'unit', 'title', 'file', 'resource_type', 'uploaded_by', 'uploaded_by_name', 'uploaded_at']
+        fields = [
+            'id', 'unit', 'title', 'file', 'resource_type', 'uploaded_by', 'uploaded_by_name', 'uploaded_at',
+            'content_type', 'page_count', 'preview',
+        ]
         read_only_fields = ['uploaded_by', 'uploaded_at']
         
+# --- 5b. Upload Session Serializer (Resumable Uploads) ---
+class UploadSessionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'unit', 'title', 'resource_type', 'filename', 'size', 'offset', 'created_at', 'expires_at']
+        read_only_fields = ['offset', 'created_at', 'expires_at']
+        extra_kwargs = {'size': {'min_value': 1}}
+
+    def validate_size(self, value):
+        # Checked before any bytes arrive: a session reserves room for the whole declared size
+        if value > settings.MAX_UPLOAD_SIZE:
+            raise serializers.ValidationError(f"Files can be at most {settings.MAX_UPLOAD_SIZE} bytes.")
+        return value
+
 # --- 6. Group Member Info (Helper for listing students) ---
 class GroupMemberInfoSerializer(serializers.ModelSerializer):
     username = serializers.ReadOnlyField(source='user.username')
@@ -56,7 +80,6 @@ class GroupMemberInfoSerializer(serializers.ModelSerializer):
 
 # --- 7. Assignment Group Serializer ---
 class AssignmentGroupSerializer(serializers.ModelSerializer):
-    member_count = serializers.SerializerMethodField()
     # This shows the list of students inside the JSON
     members = GroupMemberInfoSerializer(many=True, read_only=True)
 
@@ -64,7 +87,75 @@ class AssignmentGroupSerializer(serializers.ModelSerializer):
         model = AssignmentGroup
         # Added 'max_members' so Class Reps can set limits
         fields = ['id', 'unit', 'name', 'max_members', 'created_by', 'created_at', 'member_count', 'members']
-        read_only_fields = ['created_by', 'created_at']
+        read_only_fields = ['created_by', 'created_at', 'member_count']
+
+# --- 8. Bulk Group Generation (Input only) ---
+class GroupGenerationSerializer(serializers.Serializer):
+    group_size = serializers.IntegerField(min_value=1)
+    # Optional: defaults to every student in the unit's server
+    registration_numbers = serializers.ListField(child=serializers.CharField(max_length=30), required=False)
+    name_prefix = serializers.CharField(max_length=80, default='Group')
+    shuffle = serializers.BooleanField(default=False)
+
+# --- 9. Bulk Registration Row (Input only) ---
+class BulkUserRowSerializer(serializers.Serializer):
+    # Same fields as UserSerializer, minus the per-row UNIQUE queries (checked per batch instead)
+    username = serializers.CharField(max_length=150, validators=[UnicodeUsernameValidator()])
+    email = serializers.EmailField(required=False, allow_blank=True, default='')
+    # Optional: accounts without one get an unusable password
+    password = serializers.CharField(required=False, allow_blank=True, write_only=True)
+    role = serializers.ChoiceField(choices=User.Role.choices, default=User.Role.STUDENT)
+    registration_number = serializers.CharField(max_length=30, required=False, allow_blank=True, allow_null=True)
+
+# --- 10. Login Token Serializer ---
+class TaskTideTokenObtainPairSerializer(TokenObtainPairSerializer):
+    # Role and admin flags travel inside the token, so read requests never load the User
+    # (see api/authentication.py). Refreshed access tokens copy these claims.
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token['username'] = user.username
+        token['role'] = user.role
+        token['is_staff'] = user.is_staff
+        token['is_superuser'] = user.is_superuser
+        return token
+
+# --- 11. Delta Sync Rows (see api/sync.py) ---
+class SyncGroupSerializer(AssignmentGroupSerializer):
+    # Members travel as their own rows, so a join sends one small row, not the whole group
+    class Meta(AssignmentGroupSerializer.Meta):
+        fields = [field for field in AssignmentGroupSerializer.Meta.fields if field != 'members']
+
+class SyncGroupMemberSerializer(GroupMemberInfoSerializer):
+    class Meta(GroupMemberInfoSerializer.Meta):
+        fields = ['id', 'group', 'user'] + GroupMemberInfoSerializer.Meta.fields
 
-    def get_member_count(self, obj):
-        return obj.members.count()
\ No newline at end of file
+# --- 12. Resource Search Results ---
+class ResourceSearchResultSerializer(ResourceSerializer):
+    # Results span every unit of the server: say which one each came from
+    unit_code = serializers.ReadOnlyField(source='unit.code')
+    unit_name = serializers.ReadOnlyField(source='unit.name')
+
+    class Meta(ResourceSerializer.Meta):
+        fields = ResourceSerializer.Meta.fields + ['unit_code', 'unit_name']
+
+# --- 13. Dashboard Rows (see api/dashboard.py) ---
+# Counts are annotations on the dashboard's querysets
+class DashboardServerSerializer(ServerSerializer):
+    member_count = serializers.IntegerField(read_only=True)
+    unit_count = serializers.IntegerField(read_only=True)
+
+    class Meta(ServerSerializer.Meta):
+        fields = ServerSerializer.Meta.fields + ['member_count', 'unit_count']
+
+class DashboardUnitSerializer(UnitSerializer):
+    resource_count = serializers.IntegerField(read_only=True)
+    group_count = serializers.IntegerField(read_only=True)
+
+    class Meta(UnitSerializer.Meta):
+        fields = [field for field in UnitSerializer.Meta.fields if field != 'server'] + ['resource_count', 'group_count']
+
+class DashboardGroupSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = AssignmentGroup
+        fields = ['id', 'name', 'member_count', 'max_members']
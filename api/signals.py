@@ -0,0 +1,234 @@
+from django.db.models import F, QuerySet
+from django.db import connections
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .authentication import user_cache
+from .cache import bump_version
+from .events import publish_on_commit
+from .jobs import enqueue
+from .join_codes import forget_join_code, remember_join_code
+from .permissions import forget_server_access, forget_unit
+from .search import install_sqlite_triggers
+from .models import User, Server, ServerMember, Unit, Resource, AssignmentGroup, GroupMember, Tombstone
+
+
+# --- Keep AssignmentGroup.member_count in sync ---
+# Joins increment the counter inside JoinGroupView; every delete path (admin, cascades
+# from a deleted User) frees the seat here.
+@receiver(post_delete, sender=GroupMember)
+def release_group_seat(sender, instance, **kwargs):
+    AssignmentGroup.objects.filter(pk=instance.group_id, member_count__gt=0).update(
+        member_count=F('member_count') - 1, updated_at=timezone.now()
+    )
+
+
+# --- Invalidate cached list responses (see api/cache.py) ---
+@receiver([post_save, post_delete], sender=Server)
+def invalidate_server_list(sender, instance, created=False, **kwargs):
+    if created:
+        bump_version('servers', instance.created_by_id)
+    else:
+        # Renamed or deleted: it may be in anyone's list, so move the shared version
+        bump_version('servers', 'all')
+
+
+@receiver([post_save, post_delete], sender=ServerMember)
+def invalidate_member_server_list(sender, instance, **kwargs):
+    bump_version('servers', instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=Unit)
+def invalidate_unit_list(sender, instance, **kwargs):
+    bump_version('units', instance.server_id)
+
+
+@receiver([post_save, post_delete], sender=Resource)
+def invalidate_resource_list(sender, instance, **kwargs):
+    bump_version('resources', instance.unit_id)
+
+
+@receiver([post_save, post_delete], sender=AssignmentGroup)
+def invalidate_group_list(sender, instance, **kwargs):
+    bump_version('groups', instance.unit_id)
+
+
+@receiver([post_save, post_delete], sender=GroupMember)
+def invalidate_group_list_on_membership(sender, instance, **kwargs):
+    # The group list embeds members and 'member_count'
+    if GroupMember.group.is_cached(instance):
+        unit_id = instance.group.unit_id
+    else:
+        unit_id = AssignmentGroup.objects.filter(pk=instance.group_id).values_list('unit_id', flat=True).first()
+    if unit_id:
+        bump_version('groups', unit_id)
+
+
+# --- Drop cached server access (see api/permissions.py) ---
+@receiver(pre_save, sender=Server)
+def remember_server_creator(sender, instance, **kwargs):
+    # An admin may hand a server to someone else: the old creator loses access
+    if not instance._state.adding:
+        instance._previous_creator_id = (
+            Server.objects.filter(pk=instance.pk).values_list('created_by_id', flat=True).first()
+        )
+
+
+@receiver([post_save, post_delete], sender=Server)
+def forget_creator_access(sender, instance, **kwargs):
+    user_ids = {instance.created_by_id, getattr(instance, '_previous_creator_id', None)}
+    forget_server_access(user_ids - {None})
+
+
+@receiver([post_save, post_delete], sender=ServerMember)
+def forget_member_access(sender, instance, **kwargs):
+    forget_server_access([instance.user_id])
+
+
+@receiver([post_save, post_delete], sender=Unit)
+def forget_unit_server(sender, instance, created=False, **kwargs):
+    if not created:
+        forget_unit(instance.pk)
+
+
+# --- Keep the join code cache current (see api/join_codes.py) ---
+@receiver(post_save, sender=Server)
+def cache_join_code(sender, instance, **kwargs):
+    # Also replaces an 'invalid code' entry left by someone who guessed this code earlier
+    remember_join_code(instance)
+
+
+@receiver(post_delete, sender=Server)
+def uncache_join_code(sender, instance, **kwargs):
+    forget_join_code(instance)
+
+
+# --- Drop cached users on change (see api/authentication.py) ---
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    user_cache.invalidate(instance.pk)
+
+
+# --- Change feed for /api/servers/<id>/events/ (see api/events.py) ---
+def _server_id_of_unit(instance, field='unit'):
+    # The views hand the unit over as an object, so this is normally free
+    descriptor = getattr(type(instance), field)
+    if descriptor.is_cached(instance):
+        return getattr(instance, field).server_id
+    return Unit.objects.filter(pk=getattr(instance, f'{field}_id')).values_list('server_id', flat=True).first()
+
+
+@receiver(post_save, sender=Unit)
+def announce_unit(sender, instance, created, **kwargs):
+    if created:
+        publish_on_commit(instance.server_id, 'unit.created', {
+            'id': instance.id, 'name': instance.name, 'code': instance.code,
+        })
+
+
+@receiver(post_save, sender=Resource)
+def announce_resource(sender, instance, created, **kwargs):
+    if created:
+        publish_on_commit(_server_id_of_unit(instance), 'resource.created', {
+            'id': instance.id, 'unit': instance.unit_id, 'title': instance.title,
+            'resource_type': instance.resource_type,
+        })
+
+
+@receiver(post_save, sender=AssignmentGroup)
+def announce_group(sender, instance, created, **kwargs):
+    if created:
+        publish_on_commit(_server_id_of_unit(instance), 'group.created', {
+            'id': instance.id, 'unit': instance.unit_id, 'name': instance.name,
+            'max_members': instance.max_members, 'member_count': instance.member_count,
+        })
+
+
+@receiver(post_save, sender=GroupMember)
+def announce_group_member(sender, instance, created, **kwargs):
+    if not created:
+        return
+    if GroupMember.group.is_cached(instance):
+        group = instance.group
+        server_id = _server_id_of_unit(group)
+    else:
+        group = AssignmentGroup.objects.select_related('unit').get(pk=instance.group_id)
+        server_id = group.unit.server_id
+    publish_on_commit(server_id, 'group.member_joined', {
+        'group': group.id, 'unit': group.unit_id, 'user': instance.user_id,
+    })
+
+
+# --- Tombstones for delta sync (see api/sync.py) ---
+def _cascaded_from(origin, *parents):
+    # True when this row is going because one of `parents` was deleted: the parent's
+    # own tombstone already tells clients to drop it
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return issubclass(model, parents)
+
+
+@receiver(pre_delete, sender=Server)
+def bury_server(sender, instance, **kwargs):
+    # Nobody is a member once it is gone, so every member and the creator get their own tombstone
+    user_ids = {instance.created_by_id, *instance.members.values_list('user_id', flat=True)}
+    Tombstone.objects.bulk_create(
+        Tombstone(kind=Tombstone.Kind.SERVER, object_id=instance.pk, server_id=instance.pk, user_id=user_id)
+        for user_id in user_ids
+    )
+
+
+@receiver(post_delete, sender=ServerMember)
+def bury_membership(sender, instance, origin=None, **kwargs):
+    # Leaving a server removes it (and everything in it) from that user's synced data
+    if not _cascaded_from(origin, Server, User):
+        Tombstone.objects.create(
+            kind=Tombstone.Kind.SERVER, object_id=instance.server_id, server_id=instance.server_id, user_id=instance.user_id
+        )
+
+
+@receiver(post_delete, sender=Unit)
+def bury_unit(sender, instance, origin=None, **kwargs):
+    if not _cascaded_from(origin, Server):
+        Tombstone.objects.create(kind=Tombstone.Kind.UNIT, object_id=instance.pk, server_id=instance.server_id)
+
+
+@receiver(post_delete, sender=Resource)
+def bury_resource(sender, instance, origin=None, **kwargs):
+    if not _cascaded_from(origin, Server, Unit):
+        Tombstone.objects.create(
+            kind=Tombstone.Kind.RESOURCE, object_id=instance.pk, server_id=_server_id_of_unit(instance)
+        )
+
+
+@receiver(post_delete, sender=AssignmentGroup)
+def bury_group(sender, instance, origin=None, **kwargs):
+    if not _cascaded_from(origin, Server, Unit):
+        Tombstone.objects.create(
+            kind=Tombstone.Kind.GROUP, object_id=instance.pk, server_id=_server_id_of_unit(instance)
+        )
+
+
+@receiver(post_delete, sender=GroupMember)
+def bury_group_member(sender, instance, origin=None, **kwargs):
+    if not _cascaded_from(origin, Server, Unit, AssignmentGroup):
+        server_id = AssignmentGroup.objects.filter(pk=instance.group_id).values_list('unit__server_id', flat=True).first()
+        if server_id:
+            Tombstone.objects.create(kind=Tombstone.Kind.GROUP_MEMBER, object_id=instance.pk, server_id=server_id)
+
+
+# --- Resource search triggers (see api/search.py) ---
+@receiver(post_migrate)
+def restore_search_triggers(sender, using, **kwargs):
+    # A migration that rebuilds api_resource or api_unit on SQLite drops their triggers
+    if sender.name == 'api' and connections[using].vendor == 'sqlite':
+        install_sqlite_triggers(connections[using])
+
+
+# --- Post-upload processing (see api/processing.py) ---
+@receiver(post_save, sender=Resource)
+def process_uploaded_file(sender, instance, created, **kwargs):
+    # A file already processed for an earlier upload needs nothing more. Every create path hands
+    # the blob over as an object, so this check costs no query.
+    if created and not (instance.blob_id and instance.blob.processed_at):
+        enqueue('process_resource', resource_id=instance.id)
@@ -0,0 +1,95 @@
+import base64
+from datetime import timedelta
+
+from django.db import models
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Server, ServerMember, Unit, Resource, AssignmentGroup, GroupMember, Tombstone
+from .readers import reader_for
+from .serializers import (
+    ServerSerializer, UnitSerializer, ResourceSerializer, SyncGroupSerializer, SyncGroupMemberSerializer
+)
+
+# A token is the time the client last synced, minus this overlap: a row written by a transaction
+# that was still open at that moment is sent again next time instead of being missed.
+SYNC_OVERLAP = timedelta(seconds=5)
+# Tombstones older than this are pruned ('manage.py prune_tombstones'); older tokens get a full sync
+TOMBSTONE_RETENTION = timedelta(days=30)
+
+
+# --- 1. Tokens ---
+def encode_token(moment):
+    return base64.urlsafe_b64encode(moment.isoformat().encode()).decode()
+
+
+def decode_token(token):
+    # None means "no usable token": the client gets everything
+    try:
+        moment = parse_datetime(base64.urlsafe_b64decode(token.encode()).decode())
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if moment is None or timezone.is_naive(moment) or moment < timezone.now() - TOMBSTONE_RETENTION:
+        return None
+    return moment
+
+
+# --- 2. Building the Delta ---
+def build_delta(user, since, context):
+    """
+    Everything in the user's servers changed after `since` (everything, if None), plus the ids
+    deleted since then, in 7 queries whatever the number of servers or rows.
+    Rows of servers joined after `since` are sent in full: the client has never seen them.
+    Units, resources, groups and members are generators over .values() rows, run as the
+    response is streamed (see api/renderers.py).
+    """
+    started = timezone.now()
+    # By id: on GETs `user` is the JWT's TokenUser, not a User row
+    joined = dict(ServerMember.objects.filter(user_id=user.pk).values_list('server_id', 'joined_at'))
+    servers = list(Server.objects.filter(models.Q(created_by_id=user.pk) | models.Q(pk__in=joined)))
+    server_ids = [server.pk for server in servers]
+
+    if since is None:
+        fresh = server_ids
+    else:
+        fresh = [server_id for server_id, joined_at in joined.items() if joined_at > since]
+
+    def changed(queryset, server_path):
+        if since is None:
+            return queryset.filter(**{f'{server_path}__in': server_ids})
+        return queryset.filter(**{f'{server_path}__in': server_ids}).filter(
+            models.Q(updated_at__gt=since) | models.Q(**{f'{server_path}__in': fresh})
+        )
+
+    delta = {
+        'token': encode_token(started - SYNC_OVERLAP),
+        'full': since is None,
+        'servers': ServerSerializer(
+            [server for server in servers if since is None or server.updated_at > since or server.pk in fresh],
+            many=True, context=context
+        ).data,
+        'units': reader_for(UnitSerializer).iter_rows(changed(Unit.objects.all(), 'server_id'), context),
+        'resources': reader_for(ResourceSerializer).iter_rows(
+            changed(Resource.objects.all(), 'unit__server_id'), context
+        ),
+        'groups': reader_for(SyncGroupSerializer).iter_rows(
+            changed(AssignmentGroup.objects.all(), 'unit__server_id'), context
+        ),
+        'group_members': reader_for(SyncGroupMemberSerializer).iter_rows(
+            changed(GroupMember.objects.all(), 'group__unit__server_id'), context
+        ),
+        'deleted': {kind: [] for kind in ('servers', 'units', 'resources', 'groups', 'group_members')},
+    }
+
+    if since is not None:
+        # Per-user tombstones (left or deleted servers) and tombstones inside the user's servers
+        tombstones = Tombstone.objects.filter(deleted_at__gt=since).filter(
+            models.Q(user_id=user.pk) | models.Q(user_id__isnull=True, server_id__in=server_ids)
+        ).values_list('kind', 'object_id')
+        for kind, object_id in tombstones:
+            delta['deleted'][f'{kind}s'].append(object_id)
+    return delta
+
+
+def prune_tombstones():
+    return Tombstone.objects.filter(deleted_at__lt=timezone.now() - TOMBSTONE_RETENTION).delete()[0]
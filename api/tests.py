@@ -1,3 +1,2044 @@
-from django.test import TestCase
+import asyncio
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta, timezone as dt_timezone
+from decimal import Decimal
+from contextlib import contextmanager
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, connections
+from django.db.models import QuerySet
+from django.shortcuts import get_object_or_404
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import events, jobs, metrics, routers
+from .authentication import user_cache
+from .campus import seed_campus
+from .loadgen import queries_from_server_timing, run_load
+from .management.commands.bench import build_scenarios, client_sender, load_fixtures
+from .jobs import claim, enqueue, run_job, run_pending
+from .join_codes import CODE_PATTERN, CODE_SPACE, allocate_join_codes, encode, permute, resolve_join_code, take_numbers
+from .metrics import registry, render_metrics
+from .readers import RowReader, reader_for
+from .registration import register_users
+from .renderers import STREAM_BUFFER_SIZE, OrjsonRenderer, stream_json
+from .sync import encode_token
+from .uploads import append_chunk, part_path
+from .permissions import has_server_access
+from .models import User, Server, ServerMember, Unit, Resource, Blob, UploadSession, AssignmentGroup, GroupMember, Tombstone, Job
+from .serializers import (
+    ServerSerializer, UnitSerializer, ResourceSerializer, AssignmentGroupSerializer,
+    SyncGroupSerializer, SyncGroupMemberSerializer
+)
+from .urls import urlpatterns
+
+
+# --- Query Budget Harness ---
+# Every view gets a fixed query budget. A budget that holds for 1 row AND for many rows
+# proves the endpoint does not scale its query count with the size of the result.
+class QueryBudgetMixin:
+
+    @contextmanager
+    def assertQueryBudget(self, budget):
+        with CaptureQueriesContext(connection) as ctx:
+            yield ctx
+        executed = len(ctx.captured_queries)
+        if executed > budget:
+            sql = '\n'.join(f"{i}. {q['sql']}" for i, q in enumerate(ctx.captured_queries, start=1))
+            self.fail(f"{executed} queries executed, budget is {budget}:\n{sql}")
+
+    def warm_access_cache(self):
+        pass
+
+    def assertConstantQueries(self, request, grow, budget):
+        # Run the request, add more rows, run it again: both runs must fit the same budget.
+        # The list cache is cleared first so the database path is what gets measured.
+        cache.clear()
+        self.warm_access_cache()
+        with self.assertQueryBudget(budget) as small:
+            request()
+        grow()
+        cache.clear()
+        self.warm_access_cache()
+        with self.assertQueryBudget(budget) as large:
+            request()
+        self.assertEqual(
+            len(small.captured_queries), len(large.captured_queries),
+            "Query count grew with the number of rows (N+1)"
+        )
+
+
+class APITestCase(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.rep = User.objects.create_user(username='rep', password='pass12345', role=User.Role.CLASS_REP)
+        cls.student = User.objects.create_user(
+            username='student', password='pass12345', registration_number='REG/001'
+        )
+        cls.server = Server.objects.create(name='CS Year 2', created_by=cls.rep)
+        ServerMember.objects.create(server=cls.server, user=cls.student)
+        cls.unit = Unit.objects.create(server=cls.server, name='Algorithms', code='CS201', created_by=cls.rep)
+
+    def setUp(self):
+        cache.clear()
+        self.warm_access_cache()
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def warm_access_cache(self):
+        # Membership checks cost queries only on a user's first request (api/permissions.py);
+        # budgets measure every request after that
+        for user in (self.rep, self.student):
+            has_server_access(user, 'unit', self.unit.pk)
+
+    def make_students(self, count, prefix='s'):
+        return User.objects.bulk_create(
+            User(username=f'{prefix}{i}', registration_number=f'{prefix.upper()}/{i}') for i in range(count)
+        )
+
+
+# --- 1. Auth Views ---
+class AuthQueryBudgetTests(APITestCase):
+
+    def test_register(self):
+        client = APIClient()
+        with self.assertQueryBudget(3):
+            response = client.post(reverse('register'), {
+                'username': 'newbie', 'password': 'pass12345', 'registration_number': 'REG/999'
+            })
+        self.assertEqual(response.status_code, 201)
+
+    def test_login_and_refresh(self):
+        client = APIClient()
+        with self.assertQueryBudget(2):
+            response = client.post(reverse('token_obtain_pair'), {'username': 'student', 'password': 'pass12345'})
+        self.assertEqual(response.status_code, 200)
+
+        with self.assertQueryBudget(1):
+            response = client.post(reverse('token_refresh'), {'refresh': response.data['refresh']})
+        self.assertEqual(response.status_code, 200)
+
+
+# --- 2. Server Views ---
+class ServerQueryBudgetTests(APITestCase):
+
+    def test_list_is_constant(self):
+        def grow():
+            for i in range(5):
+                server = Server.objects.create(name=f'Server {i}', created_by=self.rep)
+                ServerMember.objects.create(server=server, user=self.student)
+
+        self.assertConstantQueries(lambda: self.client.get(reverse('server-list-create')), grow, budget=1)
+
+    def test_create(self):
+        self.client.force_authenticate(self.rep)
+        # Join code (counter upsert, clash check) and the INSERT
+        with self.assertQueryBudget(3):
+            response = self.client.post(reverse('server-list-create'), {'name': 'New Server'})
+        self.assertEqual(response.status_code, 201)
+
+    def test_join(self):
+        other = Server.objects.create(name='Other', created_by=self.rep)
+        # The code comes from the cache: the membership INSERT only
+        with self.assertQueryBudget(1):
+            response = self.client.post(reverse('join-server'), {'join_code': other.join_code})
+        self.assertEqual(response.status_code, 201)
+
+
+# --- 3. Unit Views ---
+class UnitQueryBudgetTests(APITestCase):
+
+    def test_list_is_constant(self):
+        def grow():
+            Unit.objects.bulk_create(
+                Unit(server=self.server, name=f'Unit {i}', code=f'U{i}', created_by=self.rep) for i in range(10)
+            )
+
+        url = reverse('unit-list-create') + f'?server_id={self.server.id}'
+        self.assertConstantQueries(lambda: self.client.get(url), grow, budget=1)
+
+    def test_cursor_pages_cover_every_row_once(self):
+        Unit.objects.bulk_create(
+            Unit(server=self.server, name=f'Unit {i}', code=f'U{i}', created_by=self.rep) for i in range(11)
+        )
+        url = reverse('unit-list-create') + f'?server_id={self.server.id}&page_size=5'
+        seen = []
+        while url:
+            with self.assertQueryBudget(1):
+                response = self.client.get(url)
+            seen += [unit['id'] for unit in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(len(seen), 12)
+        self.assertEqual(len(set(seen)), 12)
+
+    def test_create(self):
+        self.client.force_authenticate(self.rep)
+        with self.assertQueryBudget(2):
+            response = self.client.post(reverse('unit-list-create'), {
+                'server': self.server.id, 'name': 'Databases', 'code': 'CS202'
+            })
+        self.assertEqual(response.status_code, 201)
+
+
+# --- 4. Resource Views ---
+class MediaRootMixin:
+    # Uploaded files go to a throwaway MEDIA_ROOT
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+
+class ResourceQueryBudgetTests(MediaRootMixin, APITestCase):
+
+    def test_list_is_constant(self):
+        def grow():
+            uploaders = self.make_students(10, prefix='up')
+            Resource.objects.bulk_create(
+                Resource(unit=self.unit, title=f'Paper {i}', file=f'resources/p{i}.pdf', uploaded_by=user)
+                for i, user in enumerate(uploaders)
+            )
+
+        url = reverse('resource-list-create') + f'?unit_id={self.unit.id}'
+        self.assertConstantQueries(lambda: self.client.get(url), grow, budget=1)
+
+    def test_upload(self):
+        self.client.force_authenticate(self.rep)
+        upload = SimpleUploadedFile('notes.pdf', b'%PDF-1.4 notes', content_type='application/pdf')
+        # unit, blob lookup, SAVEPOINT + blob INSERT + RELEASE, resource INSERT, processing job INSERT
+        with self.assertQueryBudget(7):
+            response = self.client.post(reverse('resource-list-create'), {
+                'unit': self.unit.id, 'title': 'Week 1 Notes', 'file': upload
+            }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+
+
+# --- 5. Group Views ---
+class GroupQueryBudgetTests(APITestCase):
+
+    def test_list_is_constant(self):
+        group = AssignmentGroup.objects.create(unit=self.unit, name='Group 0', created_by=self.rep)
+        GroupMember.objects.create(group=group, user=self.student)
+
+        def grow():
+            students = iter(self.make_students(60))
+            for i in range(1, 21):
+                group = AssignmentGroup.objects.create(unit=self.unit, name=f'Group {i}', created_by=self.rep)
+                GroupMember.objects.bulk_create(GroupMember(group=group, user=next(students)) for _ in range(3))
+
+        url = reverse('group-list-create') + f'?unit_id={self.unit.id}'
+        self.assertConstantQueries(lambda: self.client.get(url), grow, budget=2)
+
+    def test_list_payload(self):
+        group = AssignmentGroup.objects.create(unit=self.unit, name='Group A', created_by=self.rep)
+        self.client.post(reverse('join-group', args=[group.id]))
+        AssignmentGroup.objects.create(unit=self.unit, name='Group B', created_by=self.rep)
+
+        response = self.client.get(reverse('group-list-create') + f'?unit_id={self.unit.id}')
+        by_name = {g['name']: g for g in response.data['results']}
+        self.assertEqual(by_name['Group A']['member_count'], 1)
+        self.assertEqual(by_name['Group A']['members'][0]['registration_number'], 'REG/001')
+        self.assertEqual(by_name['Group B']['member_count'], 0)
+        self.assertEqual(by_name['Group B']['members'], [])
+
+    def test_create(self):
+        self.client.force_authenticate(self.rep)
+        with self.assertQueryBudget(4):
+            response = self.client.post(reverse('group-list-create'), {
+                'unit': self.unit.id, 'name': 'Group X', 'max_members': 4
+            })
+        self.assertEqual(response.status_code, 201)
+
+    def test_join(self):
+        group = AssignmentGroup.objects.create(unit=self.unit, name='Group A', created_by=self.rep)
+        # SELECT group, SAVEPOINT, conditional UPDATE, INSERT, RELEASE
+        with self.assertQueryBudget(5):
+            response = self.client.post(reverse('join-group', args=[group.id]))
+        self.assertEqual(response.status_code, 201)
+
+
+# --- 6. Group Capacity ---
+class GroupCapacityTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.group = AssignmentGroup.objects.create(unit=self.unit, name='Group A', max_members=2, created_by=self.rep)
+        self.url = reverse('join-group', args=[self.group.id])
+
+    def join_as(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.post(self.url)
+
+    def test_full_group_rejects_join(self):
+        others = self.make_students(2)
+        ServerMember.objects.bulk_create(ServerMember(server=self.server, user=other) for other in others)
+        self.assertEqual(self.join_as(others[0]).status_code, 201)
+        self.assertEqual(self.join_as(others[1]).status_code, 201)
+        self.assertEqual(self.join_as(self.student).status_code, 400)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.member_count, 2)
+
+    def test_rejoin_does_not_take_a_seat(self):
+        self.assertEqual(self.join_as(self.student).status_code, 201)
+        self.assertEqual(self.join_as(self.student).status_code, 200)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.member_count, 1)
+
+    def test_leaving_frees_the_seat(self):
+        self.join_as(self.student)
+        GroupMember.objects.filter(group=self.group, user=self.student).delete()
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.member_count, 0)
+
+    def test_seat_taken_between_read_and_claim(self):
+        # The race, interleaved by hand: this join has read the group with a seat free when a
+        # rival's join takes that seat. The claim re-checks the count in its UPDATE and loses.
+        rival = self.make_students(1)[0]
+        ServerMember.objects.create(server=self.server, user=rival)
+        AssignmentGroup.objects.filter(pk=self.group.pk).update(max_members=1)
+        rival_codes = []
+
+        def read_then_race(*args, **kwargs):
+            group = get_object_or_404(*args, **kwargs)
+            if not rival_codes:
+                rival_codes.append(None)
+                rival_codes[0] = self.join_as(rival).status_code
+            return group
+
+        with mock.patch('api.views.get_object_or_404', side_effect=read_then_race):
+            response = self.join_as(self.student)
+        self.assertEqual((rival_codes[0], response.status_code), (201, 400))
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.member_count, 1)
+        self.assertEqual(list(self.group.members.values_list('user_id', flat=True)), [rival.id])
+
+
+class ConcurrentGroupJoinTests(TransactionTestCase):
+    # Real threads with their own connections, so the seat claim is actually contended
+    JOINERS = 300
+
+    def setUp(self):
+        # GroupCapacityTests.test_seat_taken_between_read_and_claim covers the same race on any database
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest("In-memory SQLite raises 'table is locked' instead of waiting; use Postgres or a SQLite file")
+
+    def test_parallel_joins_never_overfill(self):
+        rep = User.objects.create_user(username='rep', role=User.Role.CLASS_REP)
+        server = Server.objects.create(name='Rush', created_by=rep)
+        unit = Unit.objects.create(server=server, name='Algorithms', code='CS201', created_by=rep)
+        group = AssignmentGroup.objects.create(unit=unit, name='Hot Group', max_members=5, created_by=rep)
+        students = User.objects.bulk_create(User(username=f'rush{i}') for i in range(self.JOINERS))
+        ServerMember.objects.bulk_create(ServerMember(server=server, user=student) for student in students)
+        url = reverse('join-group', args=[group.id])
+        start = threading.Barrier(self.JOINERS)
+
+        def join(user):
+            client = APIClient()
+            client.force_authenticate(user)
+            start.wait()
+            try:
+                return client.post(url).status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.JOINERS) as pool:
+            codes = list(pool.map(join, students))
+
+        group.refresh_from_db()
+        self.assertEqual(codes.count(201), 5)
+        self.assertEqual(codes.count(400), self.JOINERS - 5)
+        self.assertEqual(group.member_count, 5)
+        self.assertEqual(GroupMember.objects.filter(group=group).count(), 5)
+
+
+# --- 7. Roster Import ---
+class RosterImportTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.rep)
+        self.url = reverse('roster-import', args=[self.server.id])
+
+    def test_json_roster_report(self):
+        self.make_students(2, prefix='reg')
+        response = self.client.post(self.url, {
+            'registration_numbers': ['REG/0', 'REG/001', 'REG/404', 'REG/0', '', 'REG/1']
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [row['status'] for row in response.data['rows']],
+            ['added', 'already_member', 'not_found', 'duplicate', 'invalid', 'added']
+        )
+        self.assertEqual(response.data['summary']['added'], 2)
+        self.assertEqual(ServerMember.objects.filter(server=self.server).count(), 3)
+
+    def test_csv_roster_with_header(self):
+        self.make_students(3, prefix='reg')
+        upload = SimpleUploadedFile('roster.csv', b'name,registration_number\nA,REG/0\nB,REG/1\n\nC,REG/2\n')
+        response = self.client.post(self.url, {'file': upload}, format='multipart')
+        self.assertEqual(response.data['summary']['added'], 3)
+        self.assertEqual(response.data['total'], 3)
+
+    def test_unreadable_csv_is_refused(self):
+        self.make_students(1, prefix='reg')
+        for content in (b'REG/0\n\xff\xfeREG/1\n', b'REG/0\n"' + b'x' * 200_000 + b'"\n'):
+            upload = SimpleUploadedFile('roster.csv', content)
+            response = self.client.post(self.url, {'file': upload}, format='multipart')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('UTF-8 encoded CSV', response.data['error'])
+        self.assertEqual(ServerMember.objects.filter(server=self.server).count(), 1)
+
+    def test_large_roster_is_batched(self):
+        students = self.make_students(5000, prefix='big')
+        # server lookup + SAVEPOINT/RELEASE + (user IN, member IN, bulk INSERT) per 500-row batch.
+        # SQLite caps query parameters, so each bulk INSERT may be split into up to 3 statements.
+        with self.assertQueryBudget(3 + 5 * 10):
+            response = self.client.post(self.url, {
+                'registration_numbers': [s.registration_number for s in students]
+            }, format='json')
+        self.assertEqual(response.data['summary']['added'], 5000)
+        self.assertEqual(ServerMember.objects.filter(server=self.server).count(), 5001)
+
+    def test_students_cannot_import(self):
+        self.client.force_authenticate(self.student)
+        response = self.client.post(self.url, {'registration_numbers': ['REG/001']}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+# --- 8. Bulk Group Generation ---
+class GenerateGroupsTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.rep)
+        self.url = reverse('generate-groups', args=[self.unit.id])
+
+    def enroll(self, count):
+        students = self.make_students(count)
+        ServerMember.objects.bulk_create(ServerMember(server=self.server, user=s) for s in students)
+        return students
+
+    def test_groups_are_balanced(self):
+        self.enroll(10)  # + the existing student = 11
+        response = self.client.post(self.url, {'group_size': 5}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(sorted(g['member_count'] for g in response.data['groups']), [3, 4, 4])
+        for group in AssignmentGroup.objects.filter(unit=self.unit):
+            self.assertEqual(group.member_count, group.members.count())
+
+    def test_existing_members_keep_their_group(self):
+        group = AssignmentGroup.objects.create(unit=self.unit, name='Group 1', created_by=self.rep)
+        self.client.force_authenticate(self.student)
+        self.client.post(reverse('join-group', args=[group.id]))
+        self.client.force_authenticate(self.rep)
+        self.enroll(4)
+
+        response = self.client.post(self.url, {'group_size': 2}, format='json')
+        self.assertEqual(response.data['students_allocated'], 4)
+        self.assertEqual([g['name'] for g in response.data['groups']], ['Group 2', 'Group 3'])
+        self.assertEqual(GroupMember.objects.filter(user=self.student).count(), 1)
+
+    def test_explicit_member_list(self):
+        students = self.make_students(3, prefix='reg')
+        ServerMember.objects.bulk_create(ServerMember(server=self.server, user=s) for s in students)
+        response = self.client.post(self.url, {
+            'group_size': 2, 'registration_numbers': ['REG/0', 'REG/1', 'REG/2']
+        }, format='json')
+        self.assertEqual(response.data['students_allocated'], 3)
+
+    def test_explicit_list_rejects_other_servers_users(self):
+        outsider = User.objects.create_user(username='outsider', registration_number='OUT/1')
+        ServerMember.objects.create(server=Server.objects.create(name='Other', created_by=self.rep), user=outsider)
+        response = self.client.post(self.url, {
+            'group_size': 2, 'registration_numbers': ['REG/001', 'OUT/1', 'NOPE/9']
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['not_members'], ['OUT/1', 'NOPE/9'])
+        self.assertFalse(AssignmentGroup.objects.filter(unit=self.unit).exists())
+
+    def test_placed_students_are_announced(self):
+        students = self.enroll(2)
+        with mock.patch('api.grouping.publish_on_commit') as publish:
+            response = self.client.post(self.url, {'group_size': 3}, format='json')
+        group_id = response.data['groups'][0]['id']
+        joined = [call.args[2] for call in publish.call_args_list if call.args[1] == 'group.member_joined']
+        self.assertCountEqual(joined, [
+            {'group': group_id, 'unit': self.unit.id, 'user': user.id} for user in [self.student, *students]
+        ])
+
+    def test_generate_locks_the_unit(self):
+        # SQLite has no row locks (its writers are serialized anyway), so check the lock is asked for
+        select_for_update = QuerySet.select_for_update
+        with mock.patch.object(QuerySet, 'select_for_update', autospec=True, side_effect=select_for_update) as lock:
+            self.client.post(self.url, {'group_size': 5}, format='json')
+        self.assertIs(lock.call_args.args[0].model, Unit)
+
+    def test_students_cannot_generate(self):
+        self.client.force_authenticate(self.student)
+        self.assertEqual(self.client.post(self.url, {'group_size': 5}, format='json').status_code, 403)
+
+    def test_thousand_students_in_bounded_queries(self):
+        self.enroll(999)
+        # SAVEPOINT, locked unit, candidates, group count, bulk INSERTs (split by SQLite's parameter cap), RELEASE
+        with self.assertQueryBudget(20):
+            response = self.client.post(self.url, {'group_size': 4, 'shuffle': True}, format='json')
+        self.assertEqual(response.data['students_allocated'], 1000)
+        self.assertEqual(response.data['groups_created'], 250)
+        self.assertEqual(GroupMember.objects.filter(group__unit=self.unit).count(), 1000)
+
+
+# --- 9. Deduplicated & Resumable Uploads ---
+class ResourceUploadTests(MediaRootMixin, APITestCase):
+    CONTENT = b'%PDF-1.4 ' + bytes(range(256)) * 40
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.rep)
+
+    def open_session(self, **extra):
+        return self.client.post(reverse('upload-create'), {
+            'unit': self.unit.id, 'title': 'CAT 1', 'resource_type': 'PAST_PAPER',
+            'filename': 'cat1.pdf', 'size': len(self.CONTENT), **extra
+        }, format='json')
+
+    def send_chunk(self, session_id, offset, chunk):
+        return self.client.patch(
+            reverse('upload-detail', args=[session_id]), chunk,
+            content_type='application/offset+octet-stream', HTTP_UPLOAD_OFFSET=str(offset)
+        )
+
+    def test_identical_multipart_uploads_share_a_blob(self):
+        for unit_title in ('Paper A', 'Paper B'):
+            upload = SimpleUploadedFile('paper.pdf', self.CONTENT, content_type='application/pdf')
+            response = self.client.post(reverse('resource-list-create'), {
+                'unit': self.unit.id, 'title': unit_title, 'file': upload
+            }, format='multipart')
+            self.assertEqual(response.status_code, 201)
+        self.assertEqual(Blob.objects.count(), 1)
+        self.assertEqual(len({r.file.name for r in Resource.objects.all()}), 1)
+
+    def test_chunked_upload_resumes_after_drop(self):
+        session_id = self.open_session().data['id']
+        self.assertEqual(self.send_chunk(session_id, 0, self.CONTENT[:4000]).data['offset'], 4000)
+
+        # Client reconnects, asks where to resume, and a stale offset is refused
+        self.assertEqual(self.client.get(reverse('upload-detail', args=[session_id])).data['offset'], 4000)
+        self.assertEqual(self.send_chunk(session_id, 0, self.CONTENT[:4000]).status_code, 409)
+
+        self.send_chunk(session_id, 4000, self.CONTENT[4000:8000])
+        response = self.send_chunk(session_id, 8000, self.CONTENT[8000:])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['resource']['resource_type'], 'PAST_PAPER')
+
+        resource = Resource.objects.get()
+        self.assertEqual(resource.blob.sha256, hashlib.sha256(self.CONTENT).hexdigest())
+        with resource.file.open('rb') as stored:
+            self.assertEqual(stored.read(), self.CONTENT)
+        self.assertFalse(UploadSession.objects.exists())
+
+    def test_racing_chunks_for_one_offset_never_touch_the_part_file(self):
+        session_id = self.open_session().data['id']
+        stale = UploadSession.objects.get(pk=session_id)
+        rival = []
+
+        def race_then_write(session, stream, length):
+            # Another PATCH for the same offset, which read the session before this one claimed
+            # the range, arrives while this one is still writing
+            if not rival:
+                rival.append(None)
+                with mock.patch('api.views.UploadSessionDetailView.get_session', return_value=stale):
+                    rival[0] = self.send_chunk(session_id, 0, b'X' * 4000)
+            return append_chunk(session, stream, length)
+
+        with mock.patch('api.views.append_chunk', side_effect=race_then_write) as write:
+            first = self.send_chunk(session_id, 0, self.CONTENT[:4000])
+        self.assertEqual((first.status_code, rival[0].status_code), (200, 409))
+        self.assertEqual(write.call_count, 1)
+
+        self.send_chunk(session_id, 4000, self.CONTENT[4000:])
+        with Resource.objects.get().file.open('rb') as stored:
+            self.assertEqual(stored.read(), self.CONTENT)
+
+    def test_abandoned_sessions_expire_and_are_pruned_with_their_part_files(self):
+        stale_id, live_id = self.open_session().data['id'], self.open_session().data['id']
+        self.send_chunk(stale_id, 0, self.CONTENT[:4000])
+        UploadSession.objects.filter(pk=stale_id).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(self.send_chunk(stale_id, 4000, self.CONTENT[4000:8000]).status_code, 404)
+        stale_part = part_path(UploadSession.objects.get(pk=stale_id))
+        out = io.StringIO()
+        call_command('prune_upload_sessions', stdout=out)
+        self.assertIn('1 upload sessions pruned', out.getvalue())
+        self.assertEqual(list(UploadSession.objects.values_list('id', flat=True)), [uuid.UUID(str(live_id))])
+        self.assertFalse(os.path.exists(stale_part))
+        self.assertTrue(os.path.exists(part_path(UploadSession.objects.get())))
+
+    def test_each_chunk_pushes_the_expiry_back(self):
+        session_id = self.open_session().data['id']
+        UploadSession.objects.filter(pk=session_id).update(expires_at=timezone.now() + timedelta(seconds=5))
+        self.send_chunk(session_id, 0, self.CONTENT[:4000])
+        self.assertGreater(UploadSession.objects.get().expires_at,
+                           timezone.now() + timedelta(seconds=settings.UPLOAD_SESSION_TTL - 60))
+
+    def test_content_is_deduplicated_only_once_received(self):
+        session_id = self.open_session().data['id']
+        self.send_chunk(session_id, 0, self.CONTENT)
+
+        # A claimed hash does not skip the upload (nor reveal that the content exists)
+        response = self.open_session(sha256=hashlib.sha256(self.CONTENT).hexdigest())
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('deduplicated', response.data)
+        self.assertEqual(Resource.objects.count(), 1)
+
+        response = self.send_chunk(response.data['id'], 0, self.CONTENT)
+        self.assertTrue(response.data['deduplicated'])
+        self.assertEqual(Resource.objects.filter(blob__isnull=False).count(), 2)
+        self.assertEqual(Blob.objects.count(), 1)
+
+    def test_declared_size_is_capped(self):
+        with override_settings(MAX_UPLOAD_SIZE=len(self.CONTENT) - 1):
+            response = self.open_session()
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('size', response.data)
+        self.assertFalse(UploadSession.objects.exists())
+
+    def test_students_cannot_open_sessions(self):
+        self.client.force_authenticate(self.student)
+        self.assertEqual(self.open_session().status_code, 403)
+
+
+# --- 10. Resource Downloads ---
+class ResourceDownloadTests(MediaRootMixin, APITestCase):
+    CONTENT = bytes(range(256)) * 8
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.rep)
+        upload = SimpleUploadedFile('week1.pdf', self.CONTENT, content_type='application/pdf')
+        response = self.client.post(reverse('resource-list-create'), {
+            'unit': self.unit.id, 'title': 'Week 1', 'file': upload
+        }, format='multipart')
+        self.url = reverse('resource-download', args=[response.data['id']])
+        self.client.force_authenticate(self.student)
+
+    def test_full_download(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.CONTENT)
+        self.assertEqual(response['ETag'], f'"{hashlib.sha256(self.CONTENT).hexdigest()}"')
+        self.assertIn('Week_1.pdf', response['Content-Disposition'])
+        response.close()
+
+    def test_byte_ranges(self):
+        for header, expected, content_range in (
+            ('bytes=10-19', self.CONTENT[10:20], 'bytes 10-19/2048'),
+            ('bytes=2000-', self.CONTENT[2000:], 'bytes 2000-2047/2048'),
+            ('bytes=-8', self.CONTENT[-8:], 'bytes 2040-2047/2048'),
+        ):
+            response = self.client.get(self.url, HTTP_RANGE=header)
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(response['Content-Range'], content_range)
+            self.assertEqual(response['Content-Length'], str(len(expected)))
+            self.assertEqual(b''.join(response.streaming_content), expected)
+            response.close()
+
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=5000-').status_code, 416)
+
+    def test_if_none_match_returns_304(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(RESOURCE_DOWNLOAD_OFFLOAD='x-accel-redirect')
+    def test_accel_redirect_offload(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['X-Accel-Redirect'].startswith('/protected-media/blobs/'))
+        self.assertEqual(response.content, b'')
+
+    def test_requires_authentication(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+
+# --- 11. Versioned List Cache ---
+@override_settings(API_LIST_CACHE=True)
+class ListCacheTests(APITestCase):
+
+    def test_repeat_request_is_served_from_cache(self):
+        url = reverse('unit-list-create') + f'?server_id={self.server.id}'
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(first.data, second.data)
+
+    @override_settings(API_LIST_CACHE=False)
+    def test_off_with_a_per_process_cache(self):
+        # Another worker's write would not move this process' versions: every read goes to the DB
+        url = reverse('unit-list-create') + f'?server_id={self.server.id}'
+        self.client.get(url)
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+
+    def test_new_unit_invalidates_unit_list(self):
+        url = reverse('unit-list-create') + f'?server_id={self.server.id}'
+        self.assertEqual(len(self.client.get(url).data['results']), 1)
+        Unit.objects.create(server=self.server, name='Databases', code='CS202', created_by=self.rep)
+        self.assertEqual(len(self.client.get(url).data['results']), 2)
+
+    def test_join_invalidates_group_list(self):
+        group = AssignmentGroup.objects.create(unit=self.unit, name='Group A', created_by=self.rep)
+        url = reverse('group-list-create') + f'?unit_id={self.unit.id}'
+        self.assertEqual(self.client.get(url).data['results'][0]['member_count'], 0)
+        self.client.post(reverse('join-group', args=[group.id]))
+        self.assertEqual(self.client.get(url).data['results'][0]['member_count'], 1)
+
+    def test_versions_move_again_when_the_write_commits(self):
+        url = reverse('unit-list-create') + f'?server_id={self.server.id}'
+        with self.captureOnCommitCallbacks() as callbacks:
+            Unit.objects.create(server=self.server, name='Databases', code='CS202', created_by=self.rep)
+            # Elsewhere this read would still see the committed rows, and cache them
+            self.client.get(url)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+        for callback in callbacks:
+            callback()
+        with self.assertNumQueries(1):
+            self.client.get(url)
+
+    def test_other_units_keep_their_cache(self):
+        other = Unit.objects.create(server=self.server, name='Databases', code='CS202', created_by=self.rep)
+        url = reverse('resource-list-create') + f'?unit_id={other.id}'
+        self.client.get(url)
+        Resource.objects.create(unit=self.unit, title='Notes', file='resources/n.pdf', uploaded_by=self.rep)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+    def test_stats(self):
+        url = reverse('resource-list-create') + f'?unit_id={self.unit.id}'
+        self.client.get(url)
+        self.client.get(url)
+        self.rep.is_staff = True
+        self.client.force_authenticate(self.rep)
+        stats = self.client.get(reverse('cache-stats')).data
+        self.assertEqual(stats['resources'], {'hits': 1, 'misses': 1, 'hit_ratio': 0.5})
+
+
+# --- 12. Conditional GET ---
+@override_settings(API_LIST_CACHE=True)
+class ConditionalListTests(APITestCase):
+
+    def assertRevalidates(self, url, change):
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], first['ETag'])
+
+        change()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 200)
+
+    def test_server_list(self):
+        def join_another():
+            other = Server.objects.create(name='Other', created_by=self.rep)
+            ServerMember.objects.create(server=other, user=self.student)
+        self.assertRevalidates(reverse('server-list-create'), join_another)
+
+    def test_server_rename_revalidates(self):
+        def rename():
+            self.server.name = 'Renamed'
+            self.server.save()
+        self.assertRevalidates(reverse('server-list-create'), rename)
+
+    def test_unit_list(self):
+        self.assertRevalidates(
+            reverse('unit-list-create') + f'?server_id={self.server.id}',
+            lambda: Unit.objects.create(server=self.server, name='DB', code='CS202', created_by=self.rep)
+        )
+
+    def test_resource_list(self):
+        self.assertRevalidates(
+            reverse('resource-list-create') + f'?unit_id={self.unit.id}',
+            lambda: Resource.objects.create(unit=self.unit, title='Notes', file='resources/n.pdf', uploaded_by=self.rep)
+        )
+
+    def test_group_list(self):
+        self.assertRevalidates(
+            reverse('group-list-create') + f'?unit_id={self.unit.id}',
+            lambda: AssignmentGroup.objects.create(unit=self.unit, name='Group A', created_by=self.rep)
+        )
+
+    def test_if_modified_since(self):
+        url = reverse('unit-list-create') + f'?server_id={self.server.id}'
+        first = self.client.get(url)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_roster_import_revalidates_server_list(self):
+        newcomer = self.make_students(1, prefix='new')[0]
+        self.client.force_authenticate(newcomer)
+        etag = self.client.get(reverse('server-list-create'))['ETag']
+
+        self.client.force_authenticate(self.rep)
+        self.client.post(reverse('roster-import', args=[self.server.id]), {
+            'registration_numbers': [newcomer.registration_number]
+        }, format='json')
+
+        self.client.force_authenticate(newcomer)
+        response = self.client.get(reverse('server-list-create'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 1)
+
+
+# --- 13. JWT Authentication Without DB Reads ---
+class CachedJWTAuthenticationTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        user_cache.clear()
+        self.client = APIClient()
+
+    def login(self, username):
+        response = self.client.post(reverse('token_obtain_pair'), {'username': username, 'password': 'pass12345'})
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        return response.data
+
+    def test_token_carries_role_claims(self):
+        tokens = self.login('rep')
+        access = AccessToken(tokens['access'])
+        self.assertEqual(access['role'], 'CLASS_REP')
+        self.assertFalse(access['is_superuser'])
+        refreshed = self.client.post(reverse('token_refresh'), {'refresh': tokens['refresh']}).data
+        self.assertEqual(AccessToken(refreshed['access'])['role'], 'CLASS_REP')
+
+    @override_settings(API_LIST_CACHE=True)
+    def test_reads_do_not_load_the_user(self):
+        self.login('student')
+        url = reverse('unit-list-create') + f'?server_id={self.server.id}'
+        self.client.get(url)
+        # Served from the list cache: with no user lookup this is a zero-query request
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        with self.assertQueryBudget(1):
+            response = self.client.get(reverse('server-list-create') + '?page_size=10')
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_writes_use_the_user_cache(self):
+        self.login('rep')
+        self.client.post(reverse('server-list-create'), {'name': 'First'})
+        # Join code and Server INSERT only: the User comes from the cache
+        with self.assertQueryBudget(3):
+            response = self.client.post(reverse('server-list-create'), {'name': 'Second'})
+        self.assertEqual(response.status_code, 201)
+
+    def test_saving_a_user_invalidates_the_cache(self):
+        self.login('student')
+        self.assertEqual(self.client.post(reverse('server-list-create'), {'name': 'Nope'}).status_code, 403)
+
+        User.objects.filter(pk=self.student.pk).update(role=User.Role.LECTURER)
+        self.student.refresh_from_db()
+        self.student.save()
+        self.assertEqual(self.client.post(reverse('server-list-create'), {'name': 'Now OK'}).status_code, 201)
+
+
+# --- 14. Bulk Registration ---
+@override_settings(BULK_REGISTRATION_WORKERS=1)
+class BulkRegistrationTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.lecturer = User.objects.create_user(username='lecturer', role=User.Role.LECTURER)
+        self.client.force_authenticate(self.lecturer)
+
+    def test_report_and_login(self):
+        response = self.client.post(reverse('register-bulk'), {'users': [
+            {'username': 'amina', 'password': 'pass12345', 'registration_number': 'REG/100'},
+            {'username': 'brian', 'registration_number': 'REG/101', 'role': 'CLASS_REP'},
+            {'username': 'amina', 'registration_number': 'REG/102'},
+            {'username': 'student', 'registration_number': 'REG/103'},
+            {'username': 'carol', 'registration_number': 'REG/001'},
+            {'username': 'bad name!'},
+            {'username': 'dave', 'role': 'ADMIN'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [row['status'] for row in response.data['rows']],
+            ['created', 'created', 'duplicate', 'exists', 'exists', 'invalid', 'invalid']
+        )
+        self.assertTrue(self.client.login(username='amina', password='pass12345'))
+        self.assertFalse(User.objects.get(username='brian').has_usable_password())
+        self.assertEqual(User.objects.get(username='brian').role, 'CLASS_REP')
+
+    def test_csv_upload(self):
+        upload = SimpleUploadedFile(
+            'intake.csv', b'username,registration_number,email\nerin,REG/200,erin@uni.ac\nfaith,REG/201,\n'
+        )
+        response = self.client.post(reverse('register-bulk'), {'file': upload}, format='multipart')
+        self.assertEqual(response.data['summary']['created'], 2)
+        self.assertEqual(User.objects.get(username='erin').email, 'erin@uni.ac')
+
+    def test_unreadable_csv_is_refused(self):
+        for content in (b'username\n\xff\xfeerin\n', b'username\n"' + b'x' * 200_000 + b'"\n'):
+            upload = SimpleUploadedFile('intake.csv', content)
+            response = self.client.post(reverse('register-bulk'), {'file': upload}, format='multipart')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('UTF-8 encoded CSV', response.data['error'])
+
+    def test_queries_do_not_grow_per_user(self):
+        users = [{'username': f'bulk{i}', 'registration_number': f'BULK/{i}'} for i in range(1200)]
+        # 3 username IN + 3 registration IN + SAVEPOINT + bulk INSERTs (split by SQLite's parameter cap) + 3 id IN + RELEASE
+        with self.assertQueryBudget(40):
+            response = self.client.post(reverse('register-bulk'), {'users': users}, format='json')
+        self.assertEqual(response.data['summary']['created'], 1200)
+
+    @override_settings(BULK_REGISTRATION_API_MAX_PASSWORDS=2)
+    def test_passwords_per_request_are_capped(self):
+        users = [{'username': f'pw{i}', 'password': 'pass12345'} for i in range(3)]
+        with mock.patch('api.registration.hash_passwords') as hash_passwords:
+            response = self.client.post(reverse('register-bulk'), {'users': users}, format='json')
+        self.assertEqual(response.status_code, 400)
+        hash_passwords.assert_not_called()
+        self.assertFalse(User.objects.filter(username__startswith='pw').exists())
+
+    @override_settings(BULK_REGISTRATION_WORKERS=4)
+    def test_requests_hash_without_a_process_pool(self):
+        with mock.patch('api.views.register_users', wraps=register_users) as register:
+            response = self.client.post(reverse('register-bulk'), {'users': [
+                {'username': 'pw0', 'password': 'pass12345'}, {'username': 'pw1', 'password': 'pass12345'},
+            ]}, format='json')
+        self.assertEqual(response.data['summary']['created'], 2)
+        self.assertEqual(register.call_args.kwargs['workers'], 1)
+
+    def test_students_cannot_bulk_register(self):
+        self.client.force_authenticate(self.student)
+        self.assertEqual(self.client.post(reverse('register-bulk'), {'users': []}, format='json').status_code, 403)
+
+
+class PasswordPoolTests(TestCase):
+
+    def test_pool_hashes_match_django(self):
+        from django.contrib.auth.hashers import check_password
+        from .hashing import hash_passwords, shutdown_pool
+        self.addCleanup(shutdown_pool)
+        passwords = [f'secret-{i}' for i in range(4)]
+        hashes = hash_passwords(passwords, workers=2, chunk_size=1)
+        self.assertTrue(all(check_password(p, h) for p, h in zip(passwords, hashes)))
+
+
+# --- 15. Async (ASGI) Endpoints ---
+class AsyncEndpointTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        user_cache.clear()
+        self.async_client = AsyncClient()
+        access = self.client.post(
+            reverse('token_obtain_pair'), {'username': 'student', 'password': 'pass12345'}
+        ).data['access']
+        self.auth = {'Authorization': f'Bearer {access}'}
+
+    async def test_payloads_match_the_sync_views(self):
+        for sync_name, async_name, query in (
+            ('server-list-create', 'async-server-list', ''),
+            ('unit-list-create', 'async-unit-list', f'?server_id={self.server.id}'),
+            ('resource-list-create', 'async-resource-list', f'?unit_id={self.unit.id}'),
+            ('group-list-create', 'async-group-list', f'?unit_id={self.unit.id}'),
+        ):
+            expected = (await sync_to_async(self.client.get)(reverse(sync_name) + query)).json()['results']
+            response = await self.async_client.get(reverse(async_name) + query, headers=self.auth)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['results'], expected)
+
+    async def test_next_link_walks_every_row(self):
+        await Unit.objects.abulk_create(
+            Unit(server=self.server, name=f'Unit {i}', code=f'U{i}', created_by=self.rep) for i in range(4)
+        )
+        url, seen = reverse('async-unit-list') + f'?server_id={self.server.id}&page_size=2', []
+        while url:
+            page = (await self.async_client.get(url, headers=self.auth)).json()
+            seen += [unit['id'] for unit in page['results']]
+            url = page['next']
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(len(set(seen)), 5)
+
+    async def test_join_server(self):
+        server = await Server.objects.acreate(name='Other', created_by=self.rep)
+        url = reverse('async-join-server')
+        response = await self.async_client.post(
+            url, {'join_code': server.join_code}, content_type='application/json', headers=self.auth
+        )
+        self.assertEqual(response.status_code, 201)
+        response = await self.async_client.post(
+            url, {'join_code': server.join_code}, content_type='application/json', headers=self.auth
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(await ServerMember.objects.filter(server=server).acount(), 1)
+
+    async def test_requires_a_token(self):
+        response = await self.async_client.get(reverse('async-server-list'))
+        self.assertEqual(response.status_code, 401)
+
+
+# --- 16. Change Feed (Server-Sent Events) ---
+class ChangeFeedTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        user_cache.clear()
+        # A fresh broker per test, sized small enough to hit the limits
+        previous, events._broker = events._broker, events.InProcessBroker(replay_size=3, queue_size=2)
+        self.addCleanup(setattr, events, '_broker', previous)
+        self.broker = events._broker
+        override = override_settings(EVENT_FEED_SINGLE_PROCESS=True)
+        override.enable()
+        self.addCleanup(override.disable)
+        access = self.client.post(
+            reverse('token_obtain_pair'), {'username': 'student', 'password': 'pass12345'}
+        ).data['access']
+        self.auth = {'Authorization': f'Bearer {access}'}
+        self.async_client = AsyncClient()
+
+    def kinds(self):
+        return [event['event'] for event in self.broker.replay(self.server.id, 0)[0]]
+
+    def test_writes_are_published_after_commit(self):
+        self.client.force_authenticate(self.rep)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('unit-list-create'), {'server': self.server.id, 'name': 'Networks', 'code': 'CS202'})
+            group = self.client.post(reverse('group-list-create'), {'unit': self.unit.id, 'name': 'G1'}).data
+        self.client.force_authenticate(self.student)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('join-group', args=[group['id']]))
+        self.assertEqual(self.kinds(), ['unit.created', 'group.created', 'group.member_joined'])
+
+    def test_replay_knows_when_it_is_incomplete(self):
+        first = self.broker.publish(self.server.id, 'unit.created', {})
+        for _ in range(3):
+            last = self.broker.publish(self.server.id, 'unit.created', {})
+        missed, complete = self.broker.replay(self.server.id, first['id'])
+        self.assertEqual(len(missed), 3)
+        self.assertTrue(complete)
+        self.assertFalse(self.broker.replay(self.server.id, first['id'] - 1)[1])  # Evicted from the buffer
+        self.assertEqual(self.broker.replay(self.server.id, last['id']), ([], True))
+
+    async def read_events(self, stream, count):
+        chunks = []
+        while len(chunks) < count:
+            chunk = (await anext(stream)).decode()
+            if chunk.startswith('id:'):
+                chunks.append(chunk)
+        return chunks
+
+    async def test_stream_replays_then_goes_live(self):
+        first = self.broker.publish(self.server.id, 'unit.created', {'name': 'A'})
+        self.broker.publish(self.server.id, 'resource.created', {'title': 'B'})
+        response = await self.async_client.get(
+            reverse('server-events', args=[self.server.id]), headers={**self.auth, 'Last-Event-ID': str(first['id'])}
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        replayed, = await self.read_events(stream, 1)
+        self.assertIn('event: resource.created', replayed)
+
+        self.broker.publish(self.server.id, 'group.created', {'name': 'C'})
+        live, = await self.read_events(stream, 1)
+        self.assertIn('event: group.created', live)
+        await stream.aclose()
+
+    async def test_closing_the_stream_unsubscribes(self):
+        stream = events.stream_events(self.server.id)
+        self.assertTrue((await anext(stream)).startswith('retry:'))
+        self.assertEqual(self.broker.subscriber_count(), 1)
+        await stream.aclose()
+        self.assertEqual(self.broker.subscriber_count(), 0)
+
+    async def test_slow_subscribers_are_cut_off(self):
+        subscription = self.broker.subscribe(self.server.id)
+        for _ in range(3):
+            self.broker.publish(self.server.id, 'unit.created', {})
+        await asyncio.sleep(0)
+        self.assertIsNone(await subscription.get())
+        self.broker.unsubscribe(subscription)
+
+    def test_refused_under_wsgi(self):
+        response = self.client.get(reverse('server-events', args=[self.server.id]), headers=self.auth)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.broker.subscriber_count(), 0)
+
+    async def test_refused_without_a_broker_every_process_reaches(self):
+        with override_settings(EVENT_FEED_SINGLE_PROCESS=False):
+            response = await self.async_client.get(reverse('server-events', args=[self.server.id]), headers=self.auth)
+        self.assertEqual(response.status_code, 503)
+        self.broker.shared = True
+        response = await self.async_client.get(reverse('server-events', args=[self.server.id]), headers=self.auth)
+        self.assertEqual(response.status_code, 200)
+        await aiter(response.streaming_content).aclose()
+
+    async def test_only_members_can_listen(self):
+        other = await Server.objects.acreate(name='Other', created_by=self.rep)
+        response = await self.async_client.get(reverse('server-events', args=[other.id]), headers=self.auth)
+        self.assertEqual(response.status_code, 404)
+        token = self.auth['Authorization'].split()[1]
+        response = await self.async_client.get(reverse('server-events', args=[self.server.id]) + f'?access_token={token}')
+        self.assertEqual(response.status_code, 200)
+        await aiter(response.streaming_content).aclose()
+
+
+# --- 17. Delta Sync ---
+class DeltaSyncTests(APITestCase):
+
+    def sync(self, since=None):
+        url = reverse('sync') + (f'?since={since}' if since else '')
+        return json.loads(self.client.get(url).getvalue())
+
+    def ids(self, rows):
+        return {str(row['id']) for row in rows}
+
+    def backdate_everything(self):
+        # Pretend the client synced an hour ago and nothing has changed since
+        past = timezone.now() - timedelta(hours=1)
+        for model in (Server, Unit, Resource, AssignmentGroup, GroupMember):
+            model.objects.update(updated_at=past)
+        ServerMember.objects.update(joined_at=past)
+        return encode_token(past + timedelta(minutes=1))
+
+    def test_first_sync_sends_everything(self):
+        data = self.sync()
+        self.assertTrue(data['full'])
+        self.assertEqual(self.ids(data['servers']), {str(self.server.id)})
+        self.assertEqual(self.ids(data['units']), {str(self.unit.id)})
+
+    def test_only_changes_are_sent(self):
+        group = AssignmentGroup.objects.create(unit=self.unit, name='G1', created_by=self.rep)
+        token = self.backdate_everything()
+        self.assertEqual(self.sync(token)['groups'], [])
+
+        self.client.post(reverse('join-group', args=[group.id]))
+        data = self.sync(token)
+        self.assertFalse(data['full'])
+        self.assertEqual(data['units'], [])
+        # The seat count changed, so the group comes back along with the new member row
+        self.assertEqual(self.ids(data['groups']), {str(group.id)})
+        self.assertEqual(data['groups'][0]['member_count'], 1)
+        self.assertEqual(data['group_members'][0]['username'], 'student')
+
+    def test_deletions_are_tombstoned(self):
+        other = Unit.objects.create(server=self.server, name='Networks', code='CS202', created_by=self.rep)
+        group = AssignmentGroup.objects.create(unit=other, name='G1', created_by=self.rep)
+        token = self.backdate_everything()
+        unit_id = other.id
+        other.delete()
+        deleted = self.sync(token)['deleted']
+        self.assertEqual(deleted['units'], [str(unit_id)])
+        self.assertEqual(deleted['groups'], [])  # Went with its unit
+        self.assertFalse(Tombstone.objects.filter(object_id=group.id).exists())
+
+    def test_leaving_and_joining_servers(self):
+        joined = Server.objects.create(name='Elective', created_by=self.rep)
+        unit = Unit.objects.create(server=joined, name='Ethics', code='HU101', created_by=self.rep)
+        token = self.backdate_everything()
+        ServerMember.objects.create(server=joined, user=self.student)
+        ServerMember.objects.filter(server=self.server, user=self.student).delete()
+
+        data = self.sync(token)
+        # The new server arrives complete even though its rows are older than the token
+        self.assertEqual(self.ids(data['servers']), {str(joined.id)})
+        self.assertEqual(self.ids(data['units']), {str(unit.id)})
+        self.assertEqual(data['deleted']['servers'], [str(self.server.id)])
+
+        self.client.force_authenticate(self.rep)
+        self.assertEqual(self.sync(token)['deleted']['servers'], [])
+
+    def test_deleted_servers_reach_every_member(self):
+        token = self.backdate_everything()
+        server_id = self.server.id
+        Server.objects.filter(pk=server_id).delete()
+        self.assertEqual(self.sync(token)['deleted']['servers'], [str(server_id)])
+        self.client.force_authenticate(self.rep)
+        self.assertEqual(self.sync(token)['deleted']['servers'], [str(server_id)])
+        self.assertFalse(Tombstone.objects.filter(kind='unit').exists())
+
+    def test_sync_with_a_real_token(self):
+        # On GETs the JWT gives a TokenUser, not a User row
+        self.client.force_authenticate(None)
+        access = self.client.post(reverse('token_obtain_pair'), {'username': 'student', 'password': 'pass12345'}).data['access']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.assertEqual(self.ids(self.sync()['servers']), {str(self.server.id)})
+
+    def test_bad_or_expired_tokens_get_a_full_sync(self):
+        self.assertTrue(self.sync('not-a-token')['full'])
+        self.assertTrue(self.sync(encode_token(timezone.now() - timedelta(days=365)))['full'])
+
+    def test_queries_do_not_grow_with_servers(self):
+        token = self.backdate_everything()
+
+        def grow():
+            for i in range(3):
+                server = Server.objects.create(name=f'S{i}', created_by=self.rep)
+                ServerMember.objects.create(server=server, user=self.student)
+                unit = Unit.objects.create(server=server, name='U', code='U1', created_by=self.rep)
+                group = AssignmentGroup.objects.create(unit=unit, name='G', created_by=self.rep)
+                GroupMember.objects.create(group=group, user=self.student)
+                Resource.objects.create(unit=unit, title='Notes', file='resources/n.pdf', uploaded_by=self.rep)
+            Unit.objects.filter(pk=self.unit.pk).delete()
+
+        # memberships + servers + 4 row types + tombstones
+        self.assertConstantQueries(lambda: self.sync(token), grow, budget=7)
+
+
+# --- 18. Request Instrumentation ---
+class InstrumentationTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, metrics_dir, ignore_errors=True)
+        override = override_settings(METRICS_DIR=metrics_dir, METRICS_TOKEN='scrape-me', SERVER_TIMING=True)
+        override.enable()
+        self.addCleanup(override.disable)
+        registry._pid = None  # Start from an empty registry in the new directory
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('unit-list-create') + f'?server_id={self.server.id}')
+        timing = response['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn('desc="1 queries"', timing)
+        self.assertIn('serialize;dur=', timing)
+
+    def test_metrics_are_aggregated_per_view(self):
+        for _ in range(3):
+            self.client.get(reverse('unit-list-create') + f'?server_id={self.server.id}')
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-me')
+        body = response.content.decode()
+        self.assertIn('tasktide_request_duration_seconds_count{view="unit-list-create"} 3', body)
+        self.assertIn('tasktide_requests_total{method="GET",status="2xx",view="unit-list-create"} 3', body)
+        self.assertIn('tasktide_request_queries_bucket{le="1",view="unit-list-create"} 3', body)
+
+    def test_other_workers_are_added_in(self):
+        self.client.get(reverse('unit-list-create') + f'?server_id={self.server.id}')
+        registry.flush(force=True)
+        # Another worker's file is just another copy of the same totals here
+        mine, = os.listdir(settings.METRICS_DIR)
+        shutil.copy(os.path.join(settings.METRICS_DIR, mine), os.path.join(settings.METRICS_DIR, 'other.json'))
+        body = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-me').content.decode()
+        self.assertIn('tasktide_request_duration_seconds_count{view="unit-list-create"} 2', body)
+
+    def test_metrics_need_the_token_or_staff(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        self.rep.is_staff = True
+        self.rep.save()
+        self.client.force_login(self.rep)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+
+    @override_settings(SLOW_REQUEST_MS=0)
+    def test_slow_requests_are_logged_with_their_sql(self):
+        with self.assertLogs('api.performance', 'WARNING') as logs:
+            self.client.get(reverse('unit-list-create') + f'?server_id={self.server.id}')
+        self.assertIn('unit-list-create', logs.output[0])
+        self.assertIn('FROM "api_unit"', logs.output[0])
+
+    @override_settings(SERVER_TIMING=False)
+    def test_server_timing_can_be_turned_off(self):
+        response = self.client.get(reverse('unit-list-create') + f'?server_id={self.server.id}')
+        self.assertNotIn('Server-Timing', response)
+
+    def test_exited_workers_are_folded_into_one_file(self):
+        self.client.get(reverse('unit-list-create') + f'?server_id={self.server.id}')
+        registry.flush(force=True)
+        mine, = os.listdir(settings.METRICS_DIR)
+        for gone in ('999999998-gone.json', '999999999-gone.json'):
+            shutil.copy(os.path.join(settings.METRICS_DIR, mine), os.path.join(settings.METRICS_DIR, gone))
+        for _ in range(2):
+            body = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-me').content.decode()
+            # Counted once each, before and after their files were folded away
+            self.assertIn('tasktide_request_duration_seconds_count{view="unit-list-create"} 3', body)
+        self.assertEqual(sorted(name for name in os.listdir(settings.METRICS_DIR) if name.endswith('.json')),
+                         sorted([mine, metrics.RETIRED]))
+
+    def test_exiting_worker_writes_its_last_totals(self):
+        registry.inc('tasktide_requests_total', {'view': 'x', 'method': 'GET', 'status': '2xx'})
+        self.assertEqual(os.listdir(settings.METRICS_DIR), [])
+        metrics._flush_on_exit()
+        mine, = os.listdir(settings.METRICS_DIR)
+        with open(os.path.join(settings.METRICS_DIR, mine)) as written:
+            self.assertEqual(list(json.load(written)['counters'].values()), [1])
+
+    async def test_async_views_are_timed_too(self):
+        await sync_to_async(user_cache.clear)()
+        access = (await sync_to_async(self.client.post)(
+            reverse('token_obtain_pair'), {'username': 'student', 'password': 'pass12345'}
+        )).data['access']
+        response = await AsyncClient().get(
+            reverse('async-unit-list') + f'?server_id={self.server.id}', headers={'Authorization': f'Bearer {access}'}
+        )
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
+
+
+# --- 19. Benchmark Harness ---
+class BenchTests(MediaRootMixin, TestCase):
+
+    @override_settings(SERVER_TIMING=True)
+    def test_campus_and_every_scenario(self):
+        counts = seed_campus(scale=0.001, log=lambda line: None)
+        self.assertEqual(counts['servers'], 2)
+        self.assertEqual(counts['users'], 20 + 1 + 1)
+
+        fixtures = load_fixtures()
+        scenarios = build_scenarios(fixtures)
+        self.assertEqual({pattern.name for pattern in urlpatterns} - {name for _, name, _, _ in scenarios}, set())
+        # Reads only: in-process, without the load threads (their connections can't see this test's rows)
+        for label, _, who, build in scenarios:
+            if build(0)[0] == 'GET' and who != 'metrics' and label != 'server-events':
+                status, queries = client_sender(fixtures, who, build)()
+                self.assertEqual(status, 200, label)
+                self.assertIsNotNone(queries, label)
+
+    def test_load_summary(self):
+        statuses = iter([200, (201, 3), 500, (200, 1)])
+        summary = run_load(lambda: next(statuses), total=4, concurrency=1)
+        self.assertEqual(summary['requests'], 4)
+        self.assertEqual(summary['errors'], 1)
+        self.assertEqual(summary['queries_per_request'], 2)
+        self.assertEqual(queries_from_server_timing('db;dur=1.2;desc="7 queries", total;dur=3'), 7)
+
+
+# --- 20. Fast Read Path ---
+class RowReaderTests(APITestCase):
+
+    def test_rows_match_the_serializers(self):
+        resource = Resource.objects.create(
+            unit=self.unit, title='Notes', file='resources/week 1 – notes.pdf', uploaded_by=self.rep
+        )
+        Resource.objects.create(unit=self.unit, title='Link', file='', uploaded_by=self.rep)
+        group = AssignmentGroup.objects.create(unit=self.unit, name='G1', created_by=self.rep)
+        GroupMember.objects.create(group=group, user=self.student)
+        context = {'request': APIRequestFactory().get('/api/resources/')}
+
+        for serializer_class, queryset in (
+            (ServerSerializer, Server.objects.all()),
+            (UnitSerializer, Unit.objects.all()),
+            (ResourceSerializer, Resource.objects.all()),
+            (SyncGroupSerializer, AssignmentGroup.objects.all()),
+            (SyncGroupMemberSerializer, GroupMember.objects.all()),
+        ):
+            expected = serializer_class(queryset.order_by('pk'), many=True, context=context).data
+            reader = reader_for(serializer_class)
+            rows = reader.rows(reader.values(queryset.order_by('pk')), context)
+            self.assertEqual(json.loads(JSONRenderer().render(rows)), json.loads(JSONRenderer().render(expected)))
+            self.assertEqual(list(reader.iter_rows(queryset.order_by('pk'), context, chunk_size=1)), rows)
+        self.assertIn('week%201', reader_for(ResourceSerializer).rows(
+            reader_for(ResourceSerializer).values(Resource.objects.filter(pk=resource.pk)), context
+        )[0]['file'])
+
+    def test_nested_serializers_are_refused(self):
+        with self.assertRaises(ImproperlyConfigured):
+            RowReader(AssignmentGroupSerializer)
+
+    def test_list_pages_from_rows(self):
+        Resource.objects.bulk_create(
+            Resource(unit=self.unit, title=f'Paper {i}', file=f'resources/p{i}.pdf', uploaded_by=self.rep)
+            for i in range(7)
+        )
+        url = reverse('resource-list-create') + f'?unit_id={self.unit.id}&page_size=3'
+        seen = []
+        while url:
+            response = self.client.get(url)
+            seen += [row['title'] for row in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(sorted(seen), sorted(f'Paper {i}' for i in range(7)))
+        self.assertEqual(response.data['results'][0]['uploaded_by_name'], 'rep')
+
+
+class OrjsonRendererTests(TestCase):
+    DATA = {
+        'id': uuid.uuid4(),
+        'at': timezone.now(),
+        'local': timezone.now().astimezone(dt_timezone(timedelta(hours=3))),
+        'price': Decimal('1.50'),
+        'lazy': gettext_lazy('Hello'),
+        'text': 'café \u2028\u2029 "quoted"',
+        'rows': [{'n': 1, 'ok': True, 'none': None}, {'n': 2.5}],
+        3: 'int key',
+    }
+
+    def test_same_bytes_as_json_renderer(self):
+        self.assertEqual(OrjsonRenderer().render(self.DATA), JSONRenderer().render(self.DATA))
+
+    def test_indented_output_still_works(self):
+        body = OrjsonRenderer().render({'a': 1}, 'application/json; indent=2')
+        self.assertEqual(body, b'{\n  "a": 1\n}')
+
+    def test_streamed_lists(self):
+        rows = [{'n': i, 'text': 'x' * 50} for i in range(100)]
+        for size in (1, 64, STREAM_BUFFER_SIZE):
+            with mock.patch('api.renderers.STREAM_BUFFER_SIZE', size):
+                body = b''.join(stream_json({'token': 't', 'rows': iter(rows), 'empty': iter([]), 'list': [1]}))
+            self.assertEqual(json.loads(body), {'token': 't', 'rows': rows, 'empty': [], 'list': [1]})
+
+
+# --- 21. Resource Search ---
+class ResourceSearchMixin:
+
+    def search(self, query, server=None, **params):
+        url = reverse('resource-search', args=[(server or self.server).id])
+        return self.client.get(url, {'q': query, **params})
+
+    def titles(self, response):
+        return [row['title'] for row in response.data['results']]
+
+    def add(self, title, unit=None, **fields):
+        return Resource.objects.create(
+            unit=unit or self.unit, title=title, file='resources/x.pdf', uploaded_by=self.rep, **fields
+        )
+
+
+class ResourceSearchTests(ResourceSearchMixin, APITestCase):
+
+    def test_ranked_prefix_matches_across_units(self):
+        networks = Unit.objects.create(server=self.server, name='Networks', code='CS301', created_by=self.rep)
+        self.add('Sorting notes')
+        self.add('Algorithms exam 2019', unit=networks, resource_type=Resource.Type.PAST_PAPER)
+        self.add('Week 1 slides', unit=networks)
+
+        # Title matches outrank unit name matches ('Algorithms' is also self.unit's name)
+        self.assertEqual(self.titles(self.search('algo')), ['Algorithms exam 2019', 'Sorting notes'])
+        self.assertEqual(self.titles(self.search('cs301 past paper')), ['Algorithms exam 2019'])
+        row = self.search('sorting').data['results'][0]
+        self.assertEqual((row['unit_code'], row['uploaded_by_name']), ('CS201', 'rep'))
+
+    def test_accents_and_other_servers(self):
+        self.add('Résumé café')
+        other = Server.objects.create(name='Other', created_by=self.rep)
+        other_unit = Unit.objects.create(server=other, name='Other', code='X1', created_by=self.rep)
+        self.add('Cafe rules', unit=other_unit)
+        self.assertEqual(self.titles(self.search('resume CAFE')), ['Résumé café'])
+        self.assertEqual(self.search('"; DROP TABLE api_resource; --').status_code, 200)
+
+    def test_index_follows_writes(self):
+        resource = self.add('Draft')
+        Resource.objects.bulk_create([
+            Resource(unit=self.unit, title='Bulk notes', file='resources/b.pdf', uploaded_by=self.rep)
+        ])
+        self.assertEqual(self.titles(self.search('bulk')), ['Bulk notes'])
+
+        Resource.objects.filter(pk=resource.pk).update(title='Final')
+        self.assertEqual(self.titles(self.search('draft')), [])
+        self.assertEqual(self.titles(self.search('final')), ['Final'])
+
+        Unit.objects.filter(pk=self.unit.pk).update(code='ZZ900')
+        self.assertEqual(sorted(self.titles(self.search('zz900'))), ['Bulk notes', 'Final'])
+
+        resource.delete()
+        self.assertEqual(self.titles(self.search('final')), [])
+
+    def test_pages(self):
+        Resource.objects.bulk_create(
+            Resource(unit=self.unit, title=f'Lecture {i}', file='resources/l.pdf', uploaded_by=self.rep)
+            for i in range(25)
+        )
+        with self.assertQueryBudget(3):  # membership, index, rows
+            first = self.search('lecture')
+        self.assertEqual(len(first.data['results']), 20)
+        second = self.client.get(first.data['next'])
+        self.assertEqual(len(second.data['results']), 5)
+        self.assertIsNone(second.data['next'])
+        self.assertEqual(len(set(self.titles(first) + self.titles(second))), 25)
+
+    def test_members_only(self):
+        self.assertEqual(self.search('').status_code, 400)
+        outsider = User.objects.create_user(username='outsider')
+        self.client.force_authenticate(outsider)
+        self.assertEqual(self.search('notes').status_code, 404)
+
+
+@skipUnless(connection.vendor == 'postgresql', "Point DATABASE_URL at Postgres to run the tsvector/pg_trgm search")
+class PostgresResourceSearchTests(ResourceSearchMixin, APITestCase):
+    # The tests above run on either backend; these cover what only the Postgres index does
+
+    def test_migration_built_the_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            self.assertIsNotNone(cursor.fetchone())
+            cursor.execute("SELECT indexname FROM pg_indexes WHERE tablename = 'api_resource_search'")
+            indexes = {row[0] for row in cursor.fetchall()}
+        self.assertLessEqual({'api_resource_search_document_idx', 'api_resource_search_title_trgm_idx'}, indexes)
+
+    def test_typos_match_by_trigram(self):
+        self.add('Algorithms exam 2019')
+        self.add('Week 1 slides')
+        self.assertEqual(self.titles(self.search('algoritms')), ['Algorithms exam 2019'])
+
+    def test_weights_and_unit_trigger(self):
+        networks = Unit.objects.create(server=self.server, name='Networks', code='CS301', created_by=self.rep)
+        self.add('Network flows')
+        self.add('Week 1 slides', unit=networks)
+        # A title match (weight A) outranks a unit name match (weight C)
+        self.assertEqual(self.titles(self.search('network')), ['Network flows', 'Week 1 slides'])
+        Unit.objects.filter(pk=networks.pk).update(name='Distributed Systems')
+        self.assertEqual(self.titles(self.search('distributed')), ['Week 1 slides'])
+
+
+# --- 22. Background Jobs & Post-Upload Processing ---
+def failing_job(**payload):
+    raise RuntimeError("storage is down")
+
+
+def make_pdf(content):
+    stream = zlib.compress(content)
+    return (
+        b"%PDF-1.4\n1 0 obj << /Type /Catalog /Pages 2 0 R >> endobj\n"
+        b"2 0 obj << /Type /Pages /Kids [3 0 R 5 0 R] /Count 2 >> endobj\n"
+        b"3 0 obj << /Type /Page /Parent 2 0 R /Contents 4 0 R >> endobj\n"
+        b"5 0 obj << /Type /Page /Parent 2 0 R >> endobj\n"
+        b"4 0 obj << /Length " + str(len(stream)).encode() + b" /Filter /FlateDecode >>\nstream\n"
+        + stream + b"\nendstream endobj\n%%EOF"
+    )
+
+
+@mock.patch.dict(jobs.HANDLERS, {'failing': 'api.tests.failing_job'})
+class JobQueueTests(TestCase):
+
+    def test_retries_back_off_then_fail(self):
+        job = enqueue('failing', max_attempts=2)
+        with self.assertLogs('api.jobs', 'WARNING'):
+            self.assertEqual(run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.Status.QUEUED, 1))
+        self.assertIn('RuntimeError: storage is down', job.last_error)
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=5))
+        self.assertEqual(run_pending(), 0)  # Not due yet
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        with self.assertLogs('api.jobs', 'ERROR'):
+            run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.Status.FAILED, 2))
+
+    def test_expired_lease_is_taken_over(self):
+        job = enqueue('failing')
+        self.assertEqual(claim('worker-a').pk, job.pk)
+        self.assertIsNone(claim('worker-b'))
+
+        Job.objects.filter(pk=job.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        taken = claim('worker-b')
+        self.assertEqual((taken.pk, taken.locked_by, taken.attempts), (job.pk, 'worker-b', 2))
+
+    @override_settings(JOB_CONCURRENCY_LIMITS={'failing': 1})
+    def test_concurrency_limit(self):
+        first, second = enqueue('failing'), enqueue('failing')
+        self.assertEqual(claim('worker-a').pk, first.pk)
+        self.assertIsNone(claim('worker-b'))
+        with self.assertLogs('api.jobs', 'WARNING'):
+            run_job(Job.objects.get(pk=first.pk))
+        self.assertEqual(claim('worker-b').pk, second.pk)
+
+    def test_unknown_kind_is_refused(self):
+        with self.assertRaises(ValueError):
+            enqueue('nonexistent')
+
+    def test_metrics(self):
+        metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, metrics_dir, ignore_errors=True)
+        with override_settings(METRICS_DIR=metrics_dir):
+            registry._pid = None
+            enqueue('failing', max_attempts=1)
+            with self.assertLogs('api.jobs', 'ERROR'):
+                call_command('runworker', '--once', stdout=io.StringIO())
+            body = render_metrics()
+        self.assertIn('tasktide_jobs_total{kind="failing",outcome="failed"} 1', body)
+        self.assertIn('tasktide_job_wait_seconds_count{kind="failing"} 1', body)
+        self.assertIn('tasktide_job_duration_seconds_count{kind="failing"} 1', body)
+
+
+class ResourceProcessingTests(MediaRootMixin, APITestCase):
+    PDF = make_pdf(b"BT /F1 12 Tf 72 720 Td (Data Structures) Tj 0 -14 Td [(Past) -250 (Paper 2024)] TJ ET")
+
+    def upload(self, name, content, unit=None):
+        self.client.force_authenticate(self.rep)
+        return self.client.post(reverse('resource-list-create'), {
+            'unit': (unit or self.unit).id, 'title': name, 'file': SimpleUploadedFile(name, content),
+        }, format='multipart')
+
+    def listed(self):
+        url = reverse('resource-list-create') + f'?unit_id={self.unit.id}'
+        return {row['title']: row for row in self.client.get(url).data['results']}
+
+    def test_upload_is_processed_in_the_background(self):
+        response = self.upload('paper.pdf', self.PDF)
+        self.assertEqual(response.data['content_type'], '')
+        self.assertEqual(self.listed()['paper.pdf']['preview'], '')  # Now cached
+
+        self.assertEqual(run_pending(), 1)
+        row = self.listed()['paper.pdf']
+        self.assertEqual(row['content_type'], 'application/pdf')
+        self.assertEqual(row['page_count'], 2)
+        self.assertEqual(row['preview'], 'Data Structures Past Paper 2024')
+        self.assertFalse(Job.objects.exists())
+
+    def test_same_file_is_processed_once(self):
+        self.upload('paper.pdf', self.PDF)
+        run_pending()
+        other = Unit.objects.create(server=self.server, name='Databases', code='CS202', created_by=self.rep)
+        response = self.upload('copy.pdf', self.PDF, unit=other)
+        self.assertEqual(response.data['page_count'], 2)
+        self.assertFalse(Job.objects.exists())
+
+    def test_office_and_text_files(self):
+        docx = io.BytesIO()
+        with zipfile.ZipFile(docx, 'w') as archive:
+            archive.writestr('word/document.xml', (
+                '<w:document><w:body><w:p><w:r><w:t>Week 1 &amp; 2</w:t></w:r></w:p>'
+                '<w:p><w:r><w:t>Sorting</w:t></w:r></w:p></w:body></w:document>'
+            ))
+        self.upload('notes.docx', docx.getvalue())
+        self.upload('marks.csv', b'reg,mark\nREG/001,71\n')
+        self.upload('photo.png', b'\x89PNG\r\n\x1a\n' + bytes(64))
+        run_pending()
+
+        rows = self.listed()
+        self.assertEqual(rows['notes.docx']['content_type'], 'application/vnd.openxmlformats-officedocument.wordprocessingml.document')
+        self.assertEqual(rows['notes.docx']['preview'], 'Week 1 & 2 Sorting')
+        self.assertEqual((rows['marks.csv']['content_type'], rows['marks.csv']['preview']), ('text/csv', 'reg,mark REG/001,71'))
+        self.assertEqual((rows['photo.png']['content_type'], rows['photo.png']['preview']), ('image/png', ''))
+
+    def test_older_uploads_get_a_blob(self):
+        name = default_storage.save('resources/old.pdf', io.BytesIO(self.PDF))
+        resource = Resource.objects.create(unit=self.unit, title='Old', file=name, uploaded_by=self.rep)
+        run_pending()
+
+        resource.refresh_from_db()
+        self.assertEqual(resource.blob.sha256, hashlib.sha256(self.PDF).hexdigest())
+        self.assertEqual((resource.file.name, resource.blob.page_count), (resource.blob.file.name, 2))
+        self.assertFalse(default_storage.exists(name))
+
+    def test_deleted_resource_is_skipped(self):
+        self.upload('paper.pdf', self.PDF)
+        Resource.objects.all().delete()
+        self.assertEqual(run_pending(), 1)
+        self.assertIsNone(Blob.objects.get().processed_at)
+
+
+# --- 23. Read Replicas ---
+class ReplicaRoutingTests(APITestCase):
+    # 'default' stands in for the replica; the router's choice is recorded per query
+
+    def reads(self, method, url, data=None):
+        seen = []
+
+        def record(execute, sql, params, many, context):
+            seen.append('replica' if routers._read_alias.get() else 'primary')
+            return execute(sql, params, many, context)
+        with connection.execute_wrapper(record):
+            response = getattr(self.client, method)(url, data, format='json')
+        self.assertLess(response.status_code, 400)
+        return set(seen)
+
+    def units_url(self):
+        return reverse('unit-list-create') + f'?server_id={self.server.id}'
+
+    @override_settings(DATABASE_REPLICAS=['default'], REPLICA_PIN_SECONDS=0)
+    def test_lists_read_from_a_replica(self):
+        self.assertEqual(self.reads('get', self.units_url()), {'replica'})
+        self.assertEqual(self.reads('get', reverse('server-list-create')), {'replica'})
+
+    def test_no_replicas_configured(self):
+        self.assertEqual(self.reads('get', self.units_url()), {'primary'})
+
+    @override_settings(DATABASE_REPLICAS=['default'], REPLICA_PIN_SECONDS=5, API_LIST_CACHE=True)
+    def test_writers_read_their_writes(self):
+        self.client.force_authenticate(self.rep)
+        self.assertEqual(self.reads('post', reverse('unit-list-create'), {
+            'server': self.server.id, 'name': 'Networks', 'code': 'CS210',
+        }), {'primary'})
+        self.assertEqual(self.reads('get', self.units_url()), {'primary'})
+
+        # Anyone else reads the primary only while the list's last write is recent: a page read
+        # now is cached under the new version, so it must not come from a lagging replica
+        self.client.force_authenticate(self.student)
+        self.assertEqual(self.reads('get', self.units_url() + '&page_size=5'), {'primary'})
+        cache.set(f"api:v:units:{self.server.id}", time.time_ns() - 60 * 1_000_000_000, timeout=None)
+        self.assertEqual(self.reads('get', self.units_url()), {'replica'})
+
+    @override_settings(DATABASE_REPLICAS=['default'], REPLICA_PIN_SECONDS=0)
+    def test_the_choice_ends_with_the_request(self):
+        self.reads('get', self.units_url())
+        self.assertIsNone(routers._read_alias.get())
+        self.assertEqual(routers.ReplicaRouter().db_for_write(Unit), 'default')
+
+
+@skipUnless(settings.DATABASE_REPLICAS, "Set DATABASE_REPLICA_URLS to run against real replica connections")
+class ReplicaConnectionTests(TransactionTestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.rep = User.objects.create_user(username='rep', password='pass12345', role=User.Role.CLASS_REP)
+        self.server = Server.objects.create(name='CS Year 2', created_by=self.rep)
+        self.client = APIClient()
+        self.client.force_authenticate(self.rep)
+
+    def queries_on(self, alias, url):
+        with CaptureQueriesContext(connections[alias]) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_reads_use_the_replica_until_the_user_writes(self):
+        url = reverse('unit-list-create') + f'?server_id={self.server.id}'
+        replica = settings.DATABASE_REPLICAS[0]
+        with override_settings(REPLICA_PIN_SECONDS=0):
+            self.assertGreater(self.queries_on(replica, url), 0)
+            self.assertEqual(self.queries_on('default', url), 0)
+        self.client.post(reverse('unit-list-create'), {'server': self.server.id, 'name': 'Networks', 'code': 'CS210'})
+        self.assertEqual(self.queries_on(replica, url), 0)
+
+
+# --- 24. Connection Pool Metrics ---
+class PoolMetricsTests(TestCase):
+
+    def setUp(self):
+        metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, metrics_dir, ignore_errors=True)
+        override = override_settings(METRICS_DIR=metrics_dir)
+        override.enable()
+        self.addCleanup(override.disable)
+        registry._pid = None
+
+    def test_pool_stats_are_exported(self):
+        pool = mock.Mock()
+        pool.pop_stats.return_value = {
+            'pool_min': 2, 'pool_max': 10, 'pool_size': 4, 'pool_available': 1, 'requests_waiting': 2,
+            'requests_num': 50, 'requests_queued': 5, 'requests_wait_ms': 1500,
+        }
+        with mock.patch('api.metrics.pooled_databases', return_value=[('default', pool)]):
+            render_metrics()
+            body = render_metrics()
+        self.assertIn('tasktide_db_pool_size{database="default"} 4', body)
+        self.assertIn('tasktide_db_pool_waiting{database="default"} 2', body)
+        # Counters add up what each pop_stats() reported since the previous one
+        self.assertIn('tasktide_db_pool_requests_total{database="default"} 100', body)
+        self.assertIn('tasktide_db_pool_wait_seconds_total{database="default"} 3.0', body)
+        self.assertNotIn('tasktide_db_pool_timeouts_total{', body)
+
+    def test_gauges_of_exited_processes_are_dropped(self):
+        registry.set('tasktide_db_pool_size', {'database': 'default'}, 3)
+        registry.flush(force=True)
+        mine, = os.listdir(settings.METRICS_DIR)
+        shutil.copy(os.path.join(settings.METRICS_DIR, mine), os.path.join(settings.METRICS_DIR, '999999999-gone.json'))
+        self.assertIn('tasktide_db_pool_size{database="default"} 3\n', render_metrics())
+
+    def test_no_pool_configured(self):
+        self.assertEqual(list(metrics.pooled_databases()), [])
+
+
+
+# --- 25. Admin on Large Tables ---
+class AdminChangelistTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.admin_user = User.objects.create_superuser(username='root', password='pass12345')
+        self.client.force_login(self.admin_user)
+        self.group = AssignmentGroup.objects.create(unit=self.unit, name='Team A', created_by=self.rep)
+
+    def add_rows(self, count, prefix):
+        students = self.make_students(count, prefix=prefix)
+        ServerMember.objects.bulk_create(ServerMember(server=self.server, user=s) for s in students)
+        GroupMember.objects.bulk_create(GroupMember(group=self.group, user=s) for s in students)
+        groups = AssignmentGroup.objects.bulk_create(
+            AssignmentGroup(unit=self.unit, name=f'{prefix}{i}', created_by=self.rep) for i in range(count)
+        )
+        Resource.objects.bulk_create(
+            Resource(unit=self.unit, title=f'{prefix}{i}', file='resources/x.pdf', uploaded_by=self.rep)
+            for i in range(count)
+        )
+        return students, groups
+
+    def test_changelists_do_not_query_per_row(self):
+        self.add_rows(2, 'a')
+        for model in ('servermember', 'groupmember', 'resource', 'assignmentgroup', 'unit', 'server', 'user'):
+            with self.subTest(model=model):
+                url = reverse(f'admin:api_{model}_changelist')
+                self.assertConstantQueries(
+                    lambda: self.assertEqual(self.client.get(url).status_code, 200),
+                    lambda: self.add_rows(15, f'{model}-'),
+                    budget=8,
+                )
+
+    def test_foreign_keys_use_autocomplete(self):
+        response = self.client.get(reverse('admin:api_groupmember_add'))
+        self.assertContains(response, 'admin-autocomplete')
+        self.assertNotContains(response, '<option value="{}">'.format(self.student.pk))
+
+        response = self.client.get(reverse('admin:autocomplete'), {
+            'app_label': 'api', 'model_name': 'groupmember', 'field_name': 'user', 'term': 'REG/0',
+        })
+        self.assertEqual([r['id'] for r in response.json()['results']], [str(self.student.pk)])
+
+    def test_search(self):
+        self.add_rows(3, 'b')
+        response = self.client.get(reverse('admin:api_servermember_changelist'), {'q': 'reg/001'})
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+    def test_count_stops_at_the_limit(self):
+        self.add_rows(5, 'c')
+        with mock.patch('api.admin.EXACT_COUNT_LIMIT', 3):
+            response = self.client.get(reverse('admin:api_resource_changelist'), {'resource_type__exact': 'DOCUMENT'})
+        self.assertEqual(response.context['cl'].result_count, 3)
+        self.assertIsNone(response.context['cl'].full_result_count)
+
+
+# --- 26. Server Membership Checks ---
+class ServerAccessTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.outsider = User.objects.create_user(username='outsider', password='pass12345')
+        self.group = AssignmentGroup.objects.create(unit=self.unit, name='Team A', created_by=self.rep)
+        self.resource = Resource.objects.create(unit=self.unit, title='Notes', file='resources/x.pdf', uploaded_by=self.rep)
+        self.client.force_authenticate(self.outsider)
+
+    def test_outsiders_cannot_tell_the_server_exists(self):
+        for method, url, data in (
+            ('get', reverse('unit-list-create') + f'?server_id={self.server.id}', None),
+            ('get', reverse('resource-list-create') + f'?unit_id={self.unit.id}', None),
+            ('get', reverse('group-list-create') + f'?unit_id={self.unit.id}', None),
+            ('get', reverse('resource-search', args=[self.server.id]) + '?q=notes', None),
+            ('get', reverse('resource-download', args=[self.resource.id]), None),
+            ('post', reverse('join-group', args=[self.group.id]), None),
+            ('post', reverse('unit-list-create'), {'server': self.server.id, 'name': 'X', 'code': 'X1'}),
+            ('post', reverse('group-list-create'), {'unit': self.unit.id, 'name': 'Sneaky'}),
+            ('post', reverse('generate-groups', args=[self.unit.id]), {'group_size': 2}),
+            ('post', reverse('roster-import', args=[self.server.id]), {'registration_numbers': []}),
+            ('post', reverse('upload-create'), {'unit': self.unit.id, 'title': 'X', 'filename': 'x.pdf', 'size': 1}),
+        ):
+            with self.subTest(url=url):
+                response = getattr(self.client, method)(url, data, format='json')
+                self.assertEqual(response.status_code, 404)
+        self.assertFalse(GroupMember.objects.filter(user=self.outsider).exists())
+
+    def test_members_creators_and_staff_get_in(self):
+        url = reverse('resource-list-create') + f'?unit_id={self.unit.id}'
+        for user in (self.student, self.rep, User.objects.create_user(username='staff', is_staff=True)):
+            self.client.force_authenticate(user)
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_async_views_check_membership(self):
+        access = self.client.post(
+            reverse('token_obtain_pair'), {'username': 'outsider', 'password': 'pass12345'}
+        ).data['access']
+        client = APIClient(headers={'Authorization': f'Bearer {access}'})
+        self.assertEqual(client.get(reverse('async-unit-list') + f'?server_id={self.server.id}').status_code, 404)
+        self.assertEqual(client.get(reverse('async-group-list') + f'?unit_id={self.unit.id}').status_code, 404)
+        ServerMember.objects.create(server=self.server, user=self.outsider)
+        self.assertEqual(client.get(reverse('async-group-list') + f'?unit_id={self.unit.id}').status_code, 200)
+
+    def test_check_is_one_cache_lookup_once_warm(self):
+        with self.assertNumQueries(0), mock.patch.object(cache, 'get_many', wraps=cache.get_many) as get_many:
+            self.assertTrue(has_server_access(self.student, 'unit', self.unit.pk))
+            self.assertTrue(has_server_access(self.rep, 'server', self.server.pk))
+        self.assertEqual(get_many.call_count, 2)
+        # A denial is confirmed in the database every time
+        with self.assertNumQueries(1):
+            self.assertFalse(has_server_access(self.outsider, 'server', self.server.pk))
+        with self.assertNumQueries(1):
+            self.assertFalse(has_server_access(self.outsider, 'server', self.server.pk))
+
+    def test_stale_cache_from_another_worker_does_not_lock_out_a_new_member(self):
+        # Another process handled the join: this process's cache never heard of it
+        self.assertFalse(has_server_access(self.outsider, 'server', self.server.pk))
+        with mock.patch('api.signals.forget_server_access'):
+            ServerMember.objects.create(server=self.server, user=self.outsider)
+        self.assertTrue(has_server_access(self.outsider, 'unit', self.unit.pk))
+        # ...and the refreshed entry serves the next check
+        with self.assertNumQueries(0):
+            self.assertTrue(has_server_access(self.outsider, 'server', self.server.pk))
+
+    def test_joining_and_leaving_take_effect_at_once(self):
+        url = reverse('unit-list-create') + f'?server_id={self.server.id}'
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.client.post(reverse('join-server'), {'join_code': self.server.join_code})
+        self.assertEqual(self.client.get(url).status_code, 200)
+        ServerMember.objects.filter(user=self.outsider).delete()
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_roster_import_grants_access(self):
+        self.outsider.registration_number = 'REG/777'
+        self.outsider.save()
+        self.assertFalse(has_server_access(self.outsider, 'server', self.server.pk))
+        import_client = APIClient()
+        import_client.force_authenticate(self.rep)
+        import_client.post(reverse('roster-import', args=[self.server.id]), {'registration_numbers': ['REG/777']}, format='json')
+        self.assertTrue(has_server_access(self.outsider, 'server', self.server.pk))
+
+    def test_moving_a_unit_or_handing_over_a_server(self):
+        own_server = Server.objects.create(name='Mine', created_by=self.outsider)
+        self.assertFalse(has_server_access(self.outsider, 'unit', self.unit.pk))
+        self.unit.server = own_server
+        self.unit.save()
+        self.assertTrue(has_server_access(self.outsider, 'unit', self.unit.pk))
+
+        own_server.created_by = self.rep
+        own_server.save()
+        self.assertFalse(has_server_access(self.outsider, 'server', own_server.pk))
+        self.assertTrue(has_server_access(self.rep, 'server', own_server.pk))
+
+
+# --- 27. Join Codes ---
+class JoinCodeTests(APITestCase):
+
+    def test_permutation_is_one_to_one(self):
+        codes = {encode(permute(n)) for n in range(5000)}
+        self.assertEqual(len(codes), 5000)
+        self.assertTrue(all(CODE_PATTERN.fullmatch(code) for code in codes))
+        self.assertLess(permute(CODE_SPACE - 1), CODE_SPACE)
+        with self.assertRaises(ValueError):
+            permute(CODE_SPACE)
+
+    def test_counter_hands_out_each_number_once(self):
+        self.assertEqual(list(take_numbers('test', 3)), [0, 1, 2])
+        self.assertEqual(list(take_numbers('test', 2)), [3, 4])
+
+    def test_new_servers_get_distinct_codes(self):
+        codes = {Server.objects.create(name=f'S{i}', created_by=self.rep).join_code for i in range(50)}
+        self.assertEqual(len(codes | {self.server.join_code}), 51)
+
+    def test_unsaved_servers_take_no_code(self):
+        # Admin add forms and serializer validation build Server() objects that may never be saved
+        with self.assertNumQueries(0):
+            server = Server(name='Draft', created_by=self.rep)
+        self.assertEqual(server.join_code, '')
+        server.save()
+        self.assertTrue(CODE_PATTERN.fullmatch(server.join_code))
+        code = server.join_code
+        server.save()
+        self.assertEqual(server.join_code, code)
+
+    def test_codes_already_taken_are_skipped(self):
+        with mock.patch('api.join_codes.take_numbers', side_effect=[range(100, 102), range(102, 103)]):
+            Server.objects.create(name='Legacy', join_code=encode(permute(101)), created_by=self.rep)
+            self.assertEqual(allocate_join_codes(2), [encode(permute(100)), encode(permute(102))])
+
+    def test_guesses_cost_no_queries_once_cached(self):
+        url = reverse('join-server')
+        self.client.post(url, {'join_code': 'ZZZZZZ'})
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.post(url, {'join_code': 'zzzzzz'}).status_code, 404)
+            self.assertEqual(self.client.post(url, {'join_code': 'not a code'}).status_code, 404)
+
+    def test_a_new_server_replaces_a_cached_miss(self):
+        self.assertIsNone(resolve_join_code('NEW123'))
+        server = Server.objects.create(name='New', join_code='NEW123', created_by=self.rep)
+        self.assertEqual(resolve_join_code(' new123 '), (str(server.pk), 'New'))
+        server.delete()
+        self.assertIsNone(resolve_join_code('NEW123'))
+
+    def test_join_is_one_insert_and_still_fires_signals(self):
+        other = Server.objects.create(name='Other', created_by=self.rep)
+        url = reverse('join-server')
+        self.client.get(reverse('server-list-create'))
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.post(url, {'join_code': other.join_code}).status_code, 201)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.post(url, {'join_code': other.join_code}).status_code, 200)
+        self.assertEqual(ServerMember.objects.filter(server=other, user=self.student).count(), 1)
+        # The cached server list and the membership check both see the join
+        names = [server['name'] for server in self.client.get(reverse('server-list-create')).data['results']]
+        self.assertIn('Other', names)
+        self.assertTrue(has_server_access(self.student, 'server', other.pk))
+
+    def test_bench_needs_the_campus(self):
+        with self.assertRaises(CommandError):
+            call_command('bench_joins', stdout=io.StringIO())
+
+
+# --- 28. Dashboard ---
+class DashboardTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('dashboard')
+
+    def test_tree_and_counts(self):
+        Resource.objects.bulk_create(
+            Resource(unit=self.unit, title=f'Paper {i}', file=f'resources/p{i}.pdf', uploaded_by=self.rep)
+            for i in range(3)
+        )
+        mine = AssignmentGroup.objects.create(unit=self.unit, name='Group A', created_by=self.rep)
+        AssignmentGroup.objects.create(unit=self.unit, name='Group B', created_by=self.rep)
+        GroupMember.objects.create(group=mine, user=self.student)
+        outside = Server.objects.create(name='Elsewhere', created_by=self.rep)
+        Unit.objects.create(server=outside, name='Other', code='XX100', created_by=self.rep)
+
+        servers = self.client.get(self.url).json()['servers']
+        self.assertEqual([server['name'] for server in servers], ['CS Year 2'])
+        server = servers[0]
+        self.assertEqual((server['member_count'], server['unit_count']), (1, 1))
+        unit = server['units'][0]
+        self.assertEqual((unit['code'], unit['resource_count'], unit['group_count']), ('CS201', 3, 2))
+        self.assertEqual([group['name'] for group in unit['groups']], ['Group A'])
+
+    def test_query_count_is_constant(self):
+        def grow():
+            servers = Server.objects.bulk_create(
+                Server(name=f'Class {i}', join_code=f'DASH{i:02d}', created_by=self.rep) for i in range(5)
+            )
+            ServerMember.objects.bulk_create(ServerMember(server=server, user=self.student) for server in servers)
+            units = Unit.objects.bulk_create(
+                Unit(server=server, name='Unit', code=f'U{i}', created_by=self.rep) for i, server in enumerate(servers)
+            )
+            groups = AssignmentGroup.objects.bulk_create(
+                AssignmentGroup(unit=unit, name='Group', created_by=self.rep) for unit in units
+            )
+            GroupMember.objects.bulk_create(GroupMember(group=group, user=self.student) for group in groups)
+
+        self.assertConstantQueries(lambda: self.client.get(self.url), grow, budget=3)
+
+    def test_fields_trim_the_payload_and_the_queries(self):
+        with self.assertNumQueries(1):
+            servers = self.client.get(self.url, {'fields': 'id,name'}).json()['servers']
+        self.assertEqual(servers, [{'id': str(self.server.id), 'name': 'CS Year 2'}])
+        with self.assertNumQueries(2):
+            servers = self.client.get(self.url, {'fields': 'name,units.code,units.resource_count'}).json()['servers']
+        self.assertEqual(servers, [{'name': 'CS Year 2', 'units': [{'code': 'CS201', 'resource_count': 0}]}])
+
+    def test_unknown_fields_are_rejected(self):
+        for fields in ('password', 'units.secret', 'name.length', 'units.groups.members'):
+            response = self.client.get(self.url, {'fields': fields})
+            self.assertEqual(response.status_code, 400, fields)
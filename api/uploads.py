@@ -0,0 +1,122 @@
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Blob, Resource, UploadSession, blob_path
+
+# Chunks are read from the request and from disk this many bytes at a time
+STREAM_BLOCK_SIZE = 64 * 1024
+# Largest chunk a client may send in one PATCH
+MAX_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+# --- 1. Content-Addressed Blobs ---
+def sha256_of(fileobj):
+    # Incremental hash: the file is read block by block, never loaded whole
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    for block in iter(lambda: fileobj.read(STREAM_BLOCK_SIZE), b''):
+        digest.update(block)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+def store_blob(fileobj, filename):
+    """
+    Returns the Blob holding `fileobj`'s content, writing it to storage
+    only if no identical file has been stored before.
+    """
+    sha256 = sha256_of(fileobj)
+    # The extracted text (api/processing.py) can be long and is not needed here
+    blob = Blob.objects.defer('text').filter(sha256=sha256).first()
+    if blob:
+        return blob
+
+    name = blob_path(sha256, os.path.splitext(filename)[1].lower())
+    if not default_storage.exists(name):
+        name = default_storage.save(name, File(fileobj))
+    try:
+        with transaction.atomic():
+            return Blob.objects.create(sha256=sha256, file=name, size=fileobj.size)
+    except IntegrityError:
+        # Someone stored the same content at the same moment; theirs wins
+        return Blob.objects.get(sha256=sha256)
+
+
+def create_resource_from_blob(blob, **fields):
+    # 'file' shares the blob's path, so the existing read path (ResourceSerializer.file) keeps working
+    return Resource.objects.create(blob=blob, file=blob.file.name, **fields)
+
+
+# --- 2. Resumable Chunked Uploads ---
+def part_path(session):
+    # Part files live next to the media they turn into, outside the blob tree
+    return os.path.join(settings.MEDIA_ROOT, 'upload_sessions', f"{session.id}.part")
+
+
+def start_upload(session):
+    # The part file exists from the start, so a missing one always means it was lost (and the
+    # client starts over), never that the first chunk is still being written
+    path = part_path(session)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, 'wb').close()
+
+
+def append_chunk(session, stream, length):
+    """
+    Streams `length` bytes from `stream` into the session's part file at the
+    session's current offset. Returns the number of bytes written.
+    """
+    path = part_path(session)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    written = 0
+    with open(path, 'r+b' if os.path.exists(path) else 'wb') as part:
+        # Discard any bytes past the offset left by an interrupted chunk
+        part.seek(session.offset)
+        part.truncate()
+        while written < length:
+            block = stream.read(min(STREAM_BLOCK_SIZE, length - written))
+            if not block:
+                break
+            part.write(block)
+            written += len(block)
+    return written
+
+
+def complete_upload(session):
+    # Turns a fully received part file into a (deduplicated) Blob and a Resource
+    path = part_path(session)
+    with open(path, 'rb') as part:
+        blob = store_blob(File(part, name=session.filename), session.filename)
+    resource = create_resource_from_blob(
+        blob,
+        unit_id=session.unit_id,
+        title=session.title,
+        resource_type=session.resource_type,
+        uploaded_by_id=session.uploaded_by_id,
+    )
+    session.delete()
+    os.remove(path)
+    return resource
+
+
+def discard_upload(session):
+    path = part_path(session)  # delete() clears the id the path is built from
+    session.delete()
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def prune_upload_sessions():
+    # Abandoned uploads: the rows and the part files they left on disk
+    expired = UploadSession.objects.filter(expires_at__lt=timezone.now()).only('id')
+    count = 0
+    for session in expired.iterator():
+        discard_upload(session)
+        count += 1
+    return count
@@ -1,5 +1,6 @@
 from django.urls import path
-from .views import RegisterView, ServerListCreateView, JoinServerView, UnitListCreateView, ResourceListCreateView, GroupListCreateView, JoinGroupView
+from . import async_views
+from .views import RegisterView, BulkRegisterView, ServerListCreateView, JoinServerView, RosterImportView, UnitListCreateView, ResourceListCreateView, ResourceDownloadView, ResourceSearchView, UploadSessionCreateView, UploadSessionDetailView, GroupListCreateView, GenerateGroupsView, JoinGroupView, SyncView, DashboardView, CacheStatsView
 
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
@@ -9,18 +10,42 @@ from rest_framework_simplejwt.views import (
 urlpatterns = [
     # Auth Routes
     path('auth/register/', RegisterView.as_view(), name='register'),
+    path('auth/register/bulk/', BulkRegisterView.as_view(), name='register-bulk'),
     path('auth/login/', TokenObtainPairView.as_view(), name='token_obtain_pair'),      
     path('auth/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),      
     
     # Server Routes
     path('servers/', ServerListCreateView.as_view(), name='server-list-create'),
     path('servers/join/', JoinServerView.as_view(), name='join-server'),
+    path('servers/<uuid:pk>/roster/', RosterImportView.as_view(), name='roster-import'),
+    path('servers/<uuid:pk>/events/', async_views.server_events, name='server-events'),
+    path('servers/<uuid:pk>/resources/search/', ResourceSearchView.as_view(), name='resource-search'),
     
     # Units & Resources
     path('units/', UnitListCreateView.as_view(), name='unit-list-create'),
     path('resources/', ResourceListCreateView.as_view(), name='resource-list-create'),
+    path('resources/<uuid:pk>/download/', ResourceDownloadView.as_view(), name='resource-download'),
+    path('uploads/', UploadSessionCreateView.as_view(), name='upload-create'),
+    path('uploads/<uuid:pk>/', UploadSessionDetailView.as_view(), name='upload-detail'),
     
     # Groups
     path('groups/', GroupListCreateView.as_view(), name='group-list-create'),
     path('groups/<uuid:pk>/join/', JoinGroupView.as_view(), name='join-group'),
+    path('units/<uuid:pk>/groups/generate/', GenerateGroupsView.as_view(), name='generate-groups'),
+
+    # Delta sync for mobile clients
+    path('sync/', SyncView.as_view(), name='sync'),
+
+    # Home screen: servers, units, counts and the user's groups in one call
+    path('me/dashboard/', DashboardView.as_view(), name='dashboard'),
+
+    # Async (ASGI) read endpoints, see api/async_views.py
+    path('async/servers/', async_views.server_list, name='async-server-list'),
+    path('async/servers/join/', async_views.join_server, name='async-join-server'),
+    path('async/units/', async_views.unit_list, name='async-unit-list'),
+    path('async/resources/', async_views.resource_list, name='async-resource-list'),
+    path('async/groups/', async_views.group_list, name='async-group-list'),
+
+    # Ops
+    path('cache/stats/', CacheStatsView.as_view(), name='cache-stats'),
 ]
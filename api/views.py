@@ -1,14 +1,43 @@
-from django.db import models
+import csv
+import hmac
+import os
+from collections import Counter
+
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.db.models import Prefetch
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from rest_framework import generics, permissions, status, views
 from rest_framework.response import Response
-from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
 from rest_framework.exceptions import PermissionDenied
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
-from .models import User, Server, ServerMember, Unit, Resource, AssignmentGroup, GroupMember
+from .metrics import render_metrics
+from .pagination import UploadedAtCursorPagination
+from .permissions import IsServerMember
+from .cache import VersionedListCacheMixin, cache_stats
+from .dashboard import build_dashboard, parse_fields
+from .readers import RowListMixin, reader_for
+from .routers import ReplicaReadMixin
+from .renderers import StreamingJSONResponse
+from .roster import import_roster, iter_csv_registration_numbers
+from .registration import read_users_csv, register_users
+from .grouping import allocate_groups, ungrouped_student_ids
+from .join_codes import add_member, resolve_join_code
+from .downloads import download_response
+from .search import search_resources
+from .sync import build_delta, decode_token
+from .uploads import (
+    MAX_CHUNK_SIZE, append_chunk, complete_upload, discard_upload, part_path, start_upload, store_blob
+)
+from .models import User, Server, Unit, Resource, UploadSession, AssignmentGroup, GroupMember, upload_session_expiry
 from .serializers import (
     UserSerializer, ServerSerializer, ServerMemberSerializer, 
-    UnitSerializer, ResourceSerializer, AssignmentGroupSerializer, GroupMemberInfoSerializer
+    UnitSerializer, ResourceSerializer, AssignmentGroupSerializer, GroupMemberInfoSerializer,
+    GroupGenerationSerializer, UploadSessionSerializer, ResourceSearchResultSerializer
 )
 
 # --- 1. User Registration View ---
@@ -17,16 +46,73 @@ class RegisterView(generics.CreateAPIView):
     serializer_class = UserSerializer
     permission_classes = [permissions.AllowAny]
 
+# --- 1b. Bulk Cohort Registration (Admins / Lecturers) ---
+class BulkRegisterView(views.APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = (JSONParser, MultiPartParser, FormParser)
+
+    def post(self, request):
+        # SECURITY: Only Admins and Lecturers enroll a whole intake
+        if request.user.role not in ('ADMIN', 'LECTURER') and not request.user.is_superuser:
+            raise PermissionDenied("Only Admins and Lecturers can register users in bulk.")
+
+        # Either a CSV upload ('file') or a JSON list ('users')
+        if 'file' in request.FILES:
+            try:
+                rows = read_users_csv(request.FILES['file'])
+            except (UnicodeDecodeError, csv.Error):
+                return Response({"error": "The file must be a UTF-8 encoded CSV file."},
+                                status=status.HTTP_400_BAD_REQUEST)
+        else:
+            rows = request.data.get('users')
+            if not isinstance(rows, list):
+                return Response(
+                    {"error": "Upload a CSV 'file' or send a 'users' list."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        if len(rows) > settings.BULK_REGISTRATION_MAX_ROWS:
+            return Response(
+                {"error": f"At most {settings.BULK_REGISTRATION_MAX_ROWS} users per request."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        # Hashing is the slow part: a web request does a bounded amount of it, in its own thread.
+        # Process pools belong to 'manage.py register_cohort', not to every web worker.
+        with_password = sum(1 for row in rows if isinstance(row, dict) and row.get('password'))
+        if with_password > settings.BULK_REGISTRATION_API_MAX_PASSWORDS:
+            return Response(
+                {"error": f"At most {settings.BULK_REGISTRATION_API_MAX_PASSWORDS} users with a password per request. "
+                          "Register bigger intakes with 'manage.py register_cohort', or leave passwords out."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Only superusers may hand out Admin accounts
+        allowed_roles = None if request.user.is_superuser else [r for r in User.Role.values if r != 'ADMIN']
+        report, timings = register_users(rows, workers=1, allowed_roles=allowed_roles)
+
+        summary = Counter(row['status'] for row in report)
+        return Response({
+            "total": len(report),
+            "summary": {key: summary.get(key, 0) for key in ('created', 'exists', 'duplicate', 'invalid')},
+            "timings": timings,
+            "rows": report,
+        }, status=status.HTTP_200_OK)
+
 # --- 2. Server List & Create View ---
-class ServerListCreateView(generics.ListCreateAPIView):
+class ServerListCreateView(ReplicaReadMixin, VersionedListCacheMixin, RowListMixin, generics.ListCreateAPIView):
     serializer_class = ServerSerializer
     permission_classes = [permissions.IsAuthenticated]
+    cache_scope = 'servers'
+
+    def get_cache_versions(self):
+        # The user's own joins/creations, plus edits to any server
+        return [('servers', self.request.user.pk), ('servers', 'all')]
 
     def get_queryset(self):
         # Show servers created by the user OR servers the user has joined
+        # Compare by pk: on reads request.user is a TokenUser, not a model instance
         return Server.objects.filter(
-            models.Q(created_by=self.request.user) | 
-            models.Q(members__user=self.request.user)
+            models.Q(created_by_id=self.request.user.pk) | 
+            models.Q(members__user_id=self.request.user.pk)
         ).distinct()
 
     def perform_create(self, serializer):
@@ -41,23 +127,64 @@ class JoinServerView(views.APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request):
-        code = request.data.get("join_code")
-        
-        try:
-            server = Server.objects.get(join_code=code)
-        except Server.DoesNotExist:
+        # CACHED: Valid and invalid codes alike, so guessing codes costs no queries
+        server = resolve_join_code(request.data.get("join_code"))
+        if server is None:
             return Response({"error": "Invalid join code"}, status=status.HTTP_404_NOT_FOUND)
+        server_id, name = server
 
-        if ServerMember.objects.filter(server=server, user=request.user).exists():
+        # One INSERT ... ON CONFLICT DO NOTHING: no exists() first, and no race between the two
+        if not add_member(server_id, request.user.pk):
             return Response({"message": "You are already in this server"}, status=status.HTTP_200_OK)
+        return Response({"message": f"Successfully joined {name}"}, status=status.HTTP_201_CREATED)
+
+# --- 3b. Bulk Roster Import (Class Reps / Lecturers) ---
+class RosterImportView(views.APIView):
+    permission_classes = [permissions.IsAuthenticated, IsServerMember]
+    server_lookup = 'server'
+    parser_classes = (JSONParser, MultiPartParser, FormParser)
+
+    def post(self, request, pk):
+        # SECURITY: Block Students from enrolling other people
+        if request.user.role == 'STUDENT':
+            raise PermissionDenied("Students cannot import a roster.")
 
-        ServerMember.objects.create(server=server, user=request.user)
-        return Response({"message": f"Successfully joined {server.name}"}, status=status.HTTP_201_CREATED)
+        server = get_object_or_404(Server, pk=pk)
+
+        # Either a CSV upload ('file') or a JSON list ('registration_numbers')
+        if 'file' in request.FILES:
+            registration_numbers = iter_csv_registration_numbers(request.FILES['file'])
+        else:
+            registration_numbers = request.data.get('registration_numbers')
+            if not isinstance(registration_numbers, list):
+                return Response(
+                    {"error": "Upload a CSV 'file' or send a 'registration_numbers' list."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        try:
+            with transaction.atomic():
+                report = import_roster(server, registration_numbers)
+        except (UnicodeDecodeError, csv.Error):
+            # The file is read while importing: a bad line rolls back the rows before it too
+            return Response({"error": "The roster must be a UTF-8 encoded CSV file."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        summary = Counter(row['status'] for row in report)
+        return Response({
+            "server": server.id,
+            "total": len(report),
+            "summary": {key: summary.get(key, 0) for key in ('added', 'already_member', 'not_found', 'duplicate', 'invalid')},
+            "rows": report,
+        }, status=status.HTTP_200_OK)
 
 # --- 4. Unit List & Create View ---
-class UnitListCreateView(generics.ListCreateAPIView):
+class UnitListCreateView(ReplicaReadMixin, VersionedListCacheMixin, RowListMixin, generics.ListCreateAPIView):
     serializer_class = UnitSerializer
-    permission_classes = [permissions.IsAuthenticated]
+    # SECURITY: Only the server's members (and its creator) see or add its units
+    permission_classes = [permissions.IsAuthenticated, IsServerMember]
+    server_lookup, server_lookup_param = 'server', 'server_id'
+    cache_scope, cache_parent_param = 'units', 'server_id'
 
     def get_queryset(self):
         server_id = self.request.query_params.get('server_id')
@@ -73,15 +200,20 @@ class UnitListCreateView(generics.ListCreateAPIView):
         serializer.save(created_by=self.request.user)
 
 # --- 5. Resource List & Create View (File Uploads) ---
-class ResourceListCreateView(generics.ListCreateAPIView):
+class ResourceListCreateView(ReplicaReadMixin, VersionedListCacheMixin, RowListMixin, generics.ListCreateAPIView):
     serializer_class = ResourceSerializer
-    permission_classes = [permissions.IsAuthenticated]
+    permission_classes = [permissions.IsAuthenticated, IsServerMember]
+    server_lookup, server_lookup_param = 'unit', 'unit_id'
+    cache_scope, cache_parent_param = 'resources', 'unit_id'
     parser_classes = (MultiPartParser, FormParser)
+    pagination_class = UploadedAtCursorPagination
 
     def get_queryset(self):
         unit_id = self.request.query_params.get('unit_id')
         if unit_id:
-            return Resource.objects.filter(unit_id=unit_id)
+            # select_related: 'uploaded_by_name' and the blob details would otherwise cost queries per row
+            # (lists read 'uploaded_by__username' and 'blob__*' from the same JOINs, see api/readers.py)
+            return Resource.objects.filter(unit_id=unit_id).select_related('uploaded_by', 'blob')
         return Resource.objects.none()
 
     def perform_create(self, serializer):
@@ -89,17 +221,159 @@ class ResourceListCreateView(generics.ListCreateAPIView):
         if self.request.user.role == 'STUDENT':
             raise PermissionDenied("Students cannot upload resources.")
 
-        serializer.save(uploaded_by=self.request.user)
+        # STORAGE: Identical files (e.g. the same past paper in ten units) share one blob
+        upload = serializer.validated_data['file']
+        blob = store_blob(upload, upload.name)
+        serializer.save(uploaded_by=self.request.user, blob=blob, file=blob.file.name)
+
+# --- 5a. Resource Download ---
+class ResourceDownloadView(views.APIView):
+    permission_classes = [permissions.IsAuthenticated, IsServerMember]
+
+    def get(self, request, pk):
+        resource = get_object_or_404(Resource.objects.select_related('unit'), pk=pk)
+        self.check_object_permissions(request, resource)
+        return download_response(request, resource)
+
+# --- 5c. Resource Search (whole server) ---
+class ResourceSearchView(views.APIView):
+    # Members, the creator and staff only; anyone else can't tell the server exists
+    permission_classes = [permissions.IsAuthenticated, IsServerMember]
+    server_lookup = 'server'
+    page_size = 20
+    max_page = 50  # Ranked results: nobody reads page 51, and deep OFFSETs are what get slow
+
+    def get(self, request, pk):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({"error": "Pass the search words as '?q='."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            page = min(max(int(request.query_params.get('page', 1)), 1), self.max_page)
+        except ValueError:
+            page = 1
+
+        # One extra id tells whether there is a next page, without counting every match
+        ids = search_resources(pk, query, limit=self.page_size + 1, offset=(page - 1) * self.page_size)
+        more, ids = len(ids) > self.page_size, ids[:self.page_size]
+
+        reader = reader_for(ResourceSearchResultSerializer)
+        rows = reader.rows(reader.values(Resource.objects.filter(pk__in=ids)), {'request': request})
+        rank = {str(resource_id): n for n, resource_id in enumerate(ids)}
+        rows.sort(key=lambda row: rank[row['id']])
+
+        url = request.build_absolute_uri()
+        return Response({
+            "next": replace_query_param(url, 'page', page + 1) if more and page < self.max_page else None,
+            "previous": (replace_query_param(url, 'page', page - 1) if page > 2 else remove_query_param(url, 'page'))
+                        if page > 1 else None,
+            "results": rows,
+        })
+
+# --- 5b. Resumable Chunked Uploads ---
+# 1. POST /uploads/ with the file's metadata opens a session.
+# 2. PATCH /uploads/<id>/ with raw bytes and an 'Upload-Offset' header appends a chunk.
+# 3. GET /uploads/<id>/ tells a reconnecting client where to resume.
+# The last chunk turns the upload into a Resource.
+class UploadSessionCreateView(generics.CreateAPIView):
+    serializer_class = UploadSessionSerializer
+    permission_classes = [permissions.IsAuthenticated, IsServerMember]
+    server_lookup = 'unit'
+
+    def create(self, request, *args, **kwargs):
+        # SECURITY: Block Students from uploading files
+        if request.user.role == 'STUDENT':
+            raise PermissionDenied("Students cannot upload resources.")
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        # No dedup here: a hash the client claims proves nothing. Identical content is
+        # deduplicated once the bytes have arrived and been hashed (complete_upload).
+        start_upload(serializer.save(uploaded_by=request.user))
+        return Response(
+            {**serializer.data, "chunk_size": MAX_CHUNK_SIZE},
+            status=status.HTTP_201_CREATED
+        )
+
+class UploadSessionDetailView(views.APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_session(self, request, pk):
+        # An expired session is left for prune_upload_sessions; the client starts a new one
+        return get_object_or_404(UploadSession, pk=pk, uploaded_by_id=request.user.pk, expires_at__gte=timezone.now())
+
+    def offset_response(self, session, code=status.HTTP_200_OK):
+        response = Response({"id": session.id, "offset": session.offset, "size": session.size}, status=code)
+        response['Upload-Offset'] = str(session.offset)
+        return response
+
+    def get(self, request, pk):
+        return self.offset_response(self.get_session(request, pk))
+
+    def patch(self, request, pk):
+        session = self.get_session(request, pk)
+        try:
+            offset = int(request.headers['Upload-Offset'])
+            length = int(request.headers['Content-Length'])
+        except (KeyError, ValueError):
+            return Response(
+                {"error": "Send the chunk as the raw body with 'Upload-Offset' and 'Content-Length' headers."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if session.offset and not os.path.exists(part_path(session)):
+            # The partial file is gone (e.g. cleaned up); the client has to start over
+            UploadSession.objects.filter(pk=session.pk).update(offset=0)
+            session.offset = 0
+        if offset != session.offset:
+            return self.offset_response(session, status.HTTP_409_CONFLICT)
+        if length <= 0 or length > MAX_CHUNK_SIZE or offset + length > session.size:
+            return Response({"error": f"Chunks must be 1 to {MAX_CHUNK_SIZE} bytes and fit the declared size."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # CONCURRENCY: Claim the byte range before writing it. A racing PATCH for the same offset
+        # waits on this row lock until the chunk is written, then finds the offset moved and gets
+        # a 409 without ever touching the part file.
+        with transaction.atomic():
+            claimed = UploadSession.objects.filter(pk=session.pk, offset=offset).update(
+                offset=offset + length, expires_at=upload_session_expiry()
+            )
+            if not claimed:
+                return self.offset_response(self.get_session(request, pk), status.HTTP_409_CONFLICT)
+            # STREAMING: Read straight from the socket into the part file (never request.body)
+            written = append_chunk(session, request.stream, length)
+            if written < length:
+                # The client dropped mid-chunk: it resumes from what actually arrived
+                UploadSession.objects.filter(pk=session.pk).update(offset=offset + written)
+        session.offset = offset + written
+
+        if session.offset < session.size:
+            return self.offset_response(session)
+
+        with transaction.atomic():
+            resource = complete_upload(session)
+        resource_data = ResourceSerializer(resource, context={'request': request}).data
+        return Response({"deduplicated": resource.blob.resources.count() > 1, "resource": resource_data},
+                        status=status.HTTP_201_CREATED)
+
+    def delete(self, request, pk):
+        discard_upload(self.get_session(request, pk))
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 # --- 6. Groups (Class Rep Logic) ---
-class GroupListCreateView(generics.ListCreateAPIView):
+class GroupListCreateView(ReplicaReadMixin, VersionedListCacheMixin, generics.ListCreateAPIView):
     serializer_class = AssignmentGroupSerializer
-    permission_classes = [permissions.IsAuthenticated]
+    permission_classes = [permissions.IsAuthenticated, IsServerMember]
+    server_lookup, server_lookup_param = 'unit', 'unit_id'
+    cache_scope, cache_parent_param = 'groups', 'unit_id'
 
     def get_queryset(self):
         unit_id = self.request.query_params.get('unit_id')
         if unit_id:
-            return AssignmentGroup.objects.filter(unit_id=unit_id)
+            # PERFORMANCE: Fetch every member (with their user) in one extra query,
+            # instead of 2 queries per group. 'member_count' is a stored column.
+            return AssignmentGroup.objects.filter(unit_id=unit_id).prefetch_related(
+                Prefetch('members', queryset=GroupMember.objects.select_related('user'))
+            )
         return AssignmentGroup.objects.none()
 
     def perform_create(self, serializer):
@@ -109,24 +383,111 @@ class GroupListCreateView(generics.ListCreateAPIView):
         
         serializer.save(created_by=self.request.user)
 
+# --- 6b. Bulk Group Generation (Class Rep Logic) ---
+class GenerateGroupsView(views.APIView):
+    permission_classes = [permissions.IsAuthenticated, IsServerMember]
+    server_lookup = 'unit'
+
+    def post(self, request, pk):
+        # SECURITY: Same rule as creating a single group
+        if request.user.role != 'CLASS_REP' and not request.user.is_superuser:
+            raise PermissionDenied("Only Class Representatives are allowed to create groups.")
+
+        serializer = GroupGenerationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        options = serializer.validated_data
+
+        with transaction.atomic():
+            # CONCURRENCY: A second generate for this unit waits here until the first commits, then
+            # sees its students as grouped. Without the lock both would place the same students.
+            unit = get_object_or_404(Unit.objects.select_for_update(), pk=pk)
+            user_ids, not_members = ungrouped_student_ids(unit, options.get('registration_numbers'))
+            if not_members:
+                # Only members of this unit's server can be grouped; nothing is created
+                return Response(
+                    {"error": "These registration numbers are not members of this server.", "not_members": not_members},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            groups = allocate_groups(
+                unit, user_ids, options['group_size'], request.user,
+                name_prefix=options['name_prefix'], shuffle=options['shuffle']
+            )
+
+        return Response({
+            "unit": unit.id,
+            "groups_created": len(groups),
+            "students_allocated": len(user_ids),
+            "groups": [
+                {"id": g.id, "name": g.name, "member_count": g.member_count, "max_members": g.max_members}
+                for g in groups
+            ],
+        }, status=status.HTTP_201_CREATED)
+
 class JoinGroupView(views.APIView):
-    permission_classes = [permissions.IsAuthenticated]
+    permission_classes = [permissions.IsAuthenticated, IsServerMember]
 
     def post(self, request, pk):
-        group = get_object_or_404(AssignmentGroup, pk=pk)
-        
-        # LOGIC: Check the specific limit set for THIS group
-        current_count = group.members.count()
+        # The unit rides along for the membership check and the change feed's server id (same single query)
+        group = get_object_or_404(AssignmentGroup.objects.select_related('unit'), pk=pk)
+        self.check_object_permissions(request, group)
         limit = group.max_members
 
-        if current_count >= limit:
+        # CONCURRENCY: Claim a seat with one conditional UPDATE. The row lock taken by the
+        # UPDATE serializes racing joins, and the WHERE clause is re-checked after the lock,
+        # so the group can never go over its limit (no COUNT, no check-then-insert race).
+        try:
+            with transaction.atomic():
+                claimed = AssignmentGroup.objects.filter(
+                    pk=group.pk, member_count__lt=models.F('max_members')
+                ).update(member_count=models.F('member_count') + 1, updated_at=timezone.now())
+                if claimed:
+                    GroupMember.objects.create(group=group, user=request.user)
+        except IntegrityError:
+            # Already a member: the unique constraint fired and the seat claim was rolled back
+            return Response({"message": "You are already in this group"}, status=status.HTTP_200_OK)
+
+        if not claimed:
             return Response(
                 {"error": f"This group is full (Max {limit} members reached)."}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        if GroupMember.objects.filter(group=group, user=request.user).exists():
-            return Response({"message": "You are already in this group"}, status=status.HTTP_200_OK)
+        return Response({"message": f"Successfully joined {group.name}"}, status=status.HTTP_201_CREATED)
+
+# --- 7. List Cache Stats (Admins) ---
+class CacheStatsView(views.APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(cache_stats())
+
+# --- 8. Delta Sync (Mobile Clients) ---
+class SyncView(views.APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        # No token (first launch) or an expired one: send everything, flagged 'full'
+        token = request.query_params.get('since')
+        since = decode_token(token) if token else None
+        # Streamed: a first sync can be thousands of rows
+        return StreamingJSONResponse(build_delta(request.user, since, {'request': request}))
+
+# --- 8b. Dashboard (App Home Screen) ---
+class DashboardView(ReplicaReadMixin, views.APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        try:
+            selection = parse_fields(request.query_params.get('fields'))
+        except ValueError as error:
+            return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(build_dashboard(request.user, selection, {'request': request}))
 
-        GroupMember.objects.create(group=group, user=request.user)
-        return Response({"message": f"Successfully joined {group.name}"}, status=status.HTTP_201_CREATED)
\ No newline at end of file
+# --- 9. Prometheus Metrics ---
+# A plain Django view: scrapers send a static bearer token, which JWT authentication would reject
+def metrics_view(request):
+    supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    token_ok = bool(settings.METRICS_TOKEN) and hmac.compare_digest(supplied, settings.METRICS_TOKEN)
+    if not token_ok and not request.user.is_staff:
+        return HttpResponse(status=status.HTTP_403_FORBIDDEN)
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -4,6 +4,7 @@ Django settings for tasktide project.
 
 from pathlib import Path
 import os
+import tempfile
 import dj_database_url  # <--- Added this import
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -39,12 +40,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost, so its total covers everything below (see api/middleware.py)
+    'api.middleware.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware', # <--- Good to have for deployment (optional for now)
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'api.middleware.ReadYourWritesMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -82,6 +86,61 @@ DATABASES = {
 db_from_env = dj_database_url.config(conn_max_age=600)
 DATABASES['default'].update(db_from_env)
 
+# Read replicas: comma-separated URLs. GET list requests read from one of them, everything else
+# uses 'default' (see api/routers.py). Tests run the replicas against the default test database.
+DATABASE_REPLICAS = []
+for number, url in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_URLS', '').split(','))):
+    DATABASES[f'replica_{number}'] = {
+        **dj_database_url.parse(url.strip(), conn_max_age=600), 'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica_{number}')
+DATABASE_ROUTERS = ['api.routers.ReplicaRouter']
+# How far replicas may lag: for this long after a write, the writer (and the written lists) read the primary
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 5))
+
+# Connection pooling (Postgres with psycopg 3). DB_POOL=1 gives every process a pool instead of
+# one persistent connection per thread: a thread borrows a connection for a request and returns
+# it. Keep (web + worker processes) * DB_POOL_MAX_SIZE under Postgres' max_connections.
+if os.environ.get('DB_POOL') == '1':
+    for database in DATABASES.values():
+        if database['ENGINE'] != 'django.db.backends.postgresql':
+            continue
+        database['CONN_MAX_AGE'] = 0            # Returned to the pool after each request, not kept
+        database['CONN_HEALTH_CHECKS'] = True   # The pool tests a connection before handing it out
+        database.setdefault('OPTIONS', {})['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+            'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),  # Wait this long for a free connection
+            'max_lifetime': float(os.environ.get('DB_POOL_MAX_LIFETIME', 1800)),  # Then reconnect
+            'max_idle': float(os.environ.get('DB_POOL_MAX_IDLE', 300)),  # Close idle extras above min_size
+        }
+
+
+# --- CACHE CONFIGURATION ---
+# Used for the versioned list cache (api/cache.py). Pick the backend with CACHE_URL:
+#   locmem://                     -> per-process memory (default; the list cache is off with it)
+#   file:///var/tmp/tasktide      -> shared by all workers on one machine
+#   redis://localhost:6379/0      -> shared by every machine (needs the 'redis' package)
+CACHE_URL = os.environ.get('CACHE_URL', 'locmem://')
+if CACHE_URL.startswith(('redis://', 'rediss://')):
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': CACHE_URL}}
+elif CACHE_URL.startswith('file://'):
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': CACHE_URL[len('file://'):]}}
+else:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'OPTIONS': {'MAX_ENTRIES': 10000}}}
+
+# The list cache (and its 304s) needs versions that every worker sees. With per-process locmem a
+# write moves the version in one worker only, and the others keep serving the old pages, so it is
+# off there unless API_LIST_CACHE=1 says one process serves all traffic (e.g. runserver).
+API_LIST_CACHE = os.environ.get('API_LIST_CACHE', '0' if CACHE_URL.startswith('locmem://') else '1') == '1'
+# Cached list pages are also invalidated on every write, this is just an upper bound
+API_LIST_CACHE_TIMEOUT = int(os.environ.get('API_LIST_CACHE_TIMEOUT', 300))
+# Each user's server ids for the membership checks (api/permissions.py); dropped on every join too
+SERVER_ACCESS_CACHE_TIMEOUT = int(os.environ.get('SERVER_ACCESS_CACHE_TIMEOUT', 3600))
+# join code -> server (api/join_codes.py). Invalid codes are cached too, for less time: a guess
+# costs no query, and a new server replaces the entry for its code anyway
+JOIN_CODE_CACHE_TIMEOUT = int(os.environ.get('JOIN_CODE_CACHE_TIMEOUT', 86400))
+JOIN_CODE_NEGATIVE_CACHE_TIMEOUT = int(os.environ.get('JOIN_CODE_NEGATIVE_CACHE_TIMEOUT', 300))
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -108,20 +167,84 @@ AUTH_USER_MODEL = 'api.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # JWT without a DB hit on reads (see api/authentication.py)
+        'api.authentication.CachedJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ),
+    # Keyset pagination for every list endpoint (see api/pagination.py)
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.CreatedAtCursorPagination',
+    'PAGE_SIZE': 50,
+    # Same JSON via orjson, timed for the Server-Timing header and /metrics
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.OrjsonRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
 }
 
 from datetime import timedelta
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
+    # Adds role/is_staff/is_superuser claims to every token
+    'TOKEN_OBTAIN_SERIALIZER': 'api.serializers.TaskTideTokenObtainPairSerializer',
 }
 
+# --- PERFORMANCE INSTRUMENTATION (see api/middleware.py and api/metrics.py) ---
+# The Server-Timing header tells any client how many queries a request ran: off in production
+# unless asked for. 'manage.py bench' turns it on for its in-process runs.
+SERVER_TIMING = os.environ.get('SERVER_TIMING', '1' if DEBUG else '0') == '1'
+SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS', 500))
+SLOW_REQUEST_MAX_QUERIES = 50  # SQL statements kept per request for the slow request log
+# Every gunicorn worker writes its totals here; all workers must share it
+METRICS_DIR = os.environ.get('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'tasktide-metrics'))
+METRICS_FLUSH_SECONDS = 1
+# Prometheus scrapes /metrics with 'Authorization: Bearer <METRICS_TOKEN>'; staff can always read it
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# --- CHANGE FEED (/api/servers/<id>/events/) ---
+# Served under ASGI only. The default broker lives in one process and only sees writes made in
+# that process, so the feed stays off (503) unless EVENT_FEED_SINGLE_PROCESS=1 says that one ASGI
+# process serves all traffic. Otherwise point EVENT_BROKER at a cross-process implementation
+# (same publish/replay/subscribe methods, and `shared = True`).
+EVENT_BROKER = os.environ.get('EVENT_BROKER', 'api.events.InProcessBroker')
+EVENT_FEED_SINGLE_PROCESS = os.environ.get('EVENT_FEED_SINGLE_PROCESS') == '1'
+EVENT_REPLAY_SIZE = 500            # Events kept per server for Last-Event-ID replay
+EVENT_SUBSCRIBER_QUEUE_SIZE = 100  # A stream further behind than this is closed and replays on reconnect
+EVENT_HEARTBEAT_SECONDS = 15
+EVENT_RETRY_MS = 3000
+
+# --- BACKGROUND JOBS ('manage.py runworker', see api/jobs.py) ---
+JOB_POLL_SECONDS = 1           # How often an idle worker looks for due jobs
+JOB_LEASE_SECONDS = 300        # A job running longer than this is presumed dead and run again
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_BASE_SECONDS = 10    # Doubles after every failed attempt...
+JOB_RETRY_MAX_SECONDS = 3600   # ...up to this
+# Most jobs of a kind running at once across all workers
+JOB_CONCURRENCY_LIMITS = {'process_resource': int(os.environ.get('RESOURCE_PROCESSING_CONCURRENCY', 4))}
+
+# --- BULK REGISTRATION ---
+# 'manage.py register_cohort' hashes passwords in this many low-priority worker processes.
+# Leave a core free for interactive traffic.
+BULK_REGISTRATION_WORKERS = int(os.environ.get('BULK_REGISTRATION_WORKERS', max(1, (os.cpu_count() or 2) - 1)))
+BULK_REGISTRATION_MAX_ROWS = 5000
+# /api/auth/register/bulk/ hashes in the request thread, and each hash takes about half a second:
+# this keeps a request well inside the worker timeout. Bigger intakes with passwords go through
+# register_cohort; rows without a password cost no hashing.
+BULK_REGISTRATION_API_MAX_PASSWORDS = int(os.environ.get('BULK_REGISTRATION_API_MAX_PASSWORDS', 20))
+
 # --- MEDIA CONFIGURATION (For File Uploads) ---
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Largest file a resumable upload (/api/uploads/) may declare
+MAX_UPLOAD_SIZE = int(os.environ.get('MAX_UPLOAD_SIZE', 200 * 1024 * 1024))
+# An upload that gets no chunk for this long expires; 'manage.py prune_upload_sessions' deletes it
+UPLOAD_SESSION_TTL = int(os.environ.get('UPLOAD_SESSION_TTL', 24 * 60 * 60))
+
+# Resource downloads (/api/resources/<id>/download/) are streamed by Django with sendfile by default.
+# Set to 'x-accel-redirect' (nginx) or 'x-sendfile' (Apache/lighttpd) to let the front proxy send the file.
+RESOURCE_DOWNLOAD_OFFLOAD = os.environ.get('RESOURCE_DOWNLOAD_OFFLOAD', '')
+# nginx 'internal' location that maps to MEDIA_ROOT
+RESOURCE_DOWNLOAD_ACCEL_PREFIX = os.environ.get('RESOURCE_DOWNLOAD_ACCEL_PREFIX', '/protected-media/')
 
 # Force "Log in" button to use the Human Page, not the Robot Page
 LOGIN_URL = '/api-auth/login/'
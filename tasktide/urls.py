@@ -22,6 +22,7 @@ from django.contrib.auth import views as auth_views
 from django.shortcuts import render
 from django.contrib.auth import get_user_model
 from django.http import HttpResponse
+from api.views import metrics_view
 
 def home_view(request):
     return render(request, 'index.html')
@@ -44,6 +45,7 @@ urlpatterns = [
     path('api/', include('api.urls')),
     path('api/auth/', include('rest_framework.urls')), # <--- Added for browsable API login/logout 
     path('api-auth/', include('rest_framework.urls')),
+    path('metrics', metrics_view, name='metrics'),
     
 ]
 # This allows you to see uploaded files while running on localhost